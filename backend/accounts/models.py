@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
 
+from core.snapshots import LoadSnapshotMixin
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -25,7 +27,10 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(LoadSnapshotMixin, AbstractBaseUser, PermissionsMixin):
+    # catalog.signals only reacts to a vendor's is_active actually changing
+    load_snapshots = {"_loaded_is_active": ({"is_active"}, lambda u: u.is_active)}
+
     class Roles(models.TextChoices):
         CUSTOMER = "customer", "Customer"
         ADMIN = "admin", "Admin"
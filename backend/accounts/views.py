@@ -14,6 +14,8 @@ from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from core.mail import dispatcher as mail_dispatcher
+
 from .tokens import CustomPasswordResetTokenGenerator
 from .serializers import (
     RegisterSerializer,
@@ -167,21 +169,16 @@ class ForgotPasswordView(APIView):
 """
         text_message = strip_tags(html_message)
 
-        try:
-            msg = EmailMultiAlternatives(
-                subject=subject,
-                body=text_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[email],
-            )
-            msg.attach_alternative(html_message, "text/html")
-            msg.send()
-        except Exception as e:
-            print("FORGOT PASSWORD EMAIL ERROR:", repr(e))
-            return Response(
-                {"detail": "If this email exists, a reset link has been sent."},
-                status=status.HTTP_200_OK,
-            )
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=text_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        msg.attach_alternative(html_message, "text/html")
+        # ✅ queued on the shared pooled connection; the response doesn't wait on SMTP
+        # (send failures are logged by the dispatcher)
+        mail_dispatcher.submit(msg)
 
         if getattr(settings, "DEBUG", False):
             ok_custom = reset_token_generator.check_token(user, token)
@@ -1,9 +1,10 @@
 from django.urls import path, include
-from .views import AdminMeView, AdminDashboardSummaryView
+from .views import AdminMeView, AdminDashboardSummaryView, AdminMailStatsView
 
 urlpatterns = [
     path("me/", AdminMeView.as_view()),
     path("dashboard/summary/", AdminDashboardSummaryView.as_view()),
+    path("mail/stats/", AdminMailStatsView.as_view()),
 
     # ✅ Orders admin routes ONLY under /api/admin/orders/
     path("orders/", include("orders.admin_urls")),
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
+from catalog import reservations
 from catalog.models import Product
 from catalog.serializers import ProductSerializer
 
@@ -31,7 +32,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         """
         Enforce:
         - qty >= 1
-        - qty <= product.stock
+        - qty <= product.stock - active reservations
         - product exists and is active (optional but recommended)
         """
         qty = attrs.get("qty")
@@ -56,8 +57,8 @@ class CartItemSerializer(serializers.ModelSerializer):
             except Product.DoesNotExist:
                 raise serializers.ValidationError({"productId": "Product not found."})
 
-        # Stock validation (this is the key fix)
-        stock = int(getattr(product, "stock", 0) or 0)
+        # Stock validation (this is the key fix): stock minus active reservations
+        stock = max(reservations.available_for([product.id]).get(product.id, 0), 0)
         if int(qty) > stock:
             raise serializers.ValidationError(
                 {"qty": f"Only {stock} item(s) available in stock."}
@@ -2,17 +2,38 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from django.db.models import F, Prefetch, prefetch_related_objects
 
+from catalog import reservations
+from catalog.models import ordered_images_prefetch
 from .models import Cart, CartItem
 from .serializers import CartSerializer
 
 
+def _cart_data(cart, request):
+    # Load items, products and ordered images in 3 queries (not N+1 per item)
+    prefetch_related_objects(
+        [cart],
+        Prefetch(
+            "items",
+            queryset=CartItem.objects.select_related("product")
+            .prefetch_related(ordered_images_prefetch("product__images"))
+            .annotate(product_available=F("product__stock") - reservations.held("product_id"))
+            .order_by("id"),
+        ),
+    )
+    # ✅ ProductSerializer.availableStock reads this (stock - active reservations)
+    for item in cart.items.all():
+        item.product.available_stock = item.product_available
+    return CartSerializer(cart, context={"request": request}).data
+
+
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         cart, _ = Cart.objects.get_or_create(user=request.user)
-        return Response(CartSerializer(cart, context={"request": request}).data)
+        return Response(_cart_data(cart, request))
 
 
 class CartItemUpsertView(APIView):
@@ -36,7 +57,7 @@ class CartItemUpsertView(APIView):
         item.save()
 
         cart.refresh_from_db()
-        return Response(CartSerializer(cart, context={"request": request}).data)
+        return Response(_cart_data(cart, request))
 
 
 class CartItemDeleteView(APIView):
@@ -75,4 +96,4 @@ class CartMergeView(APIView):
             item.save()
 
         cart.refresh_from_db()
-        return Response(CartSerializer(cart, context={"request": request}).data)
+        return Response(_cart_data(cart, request))
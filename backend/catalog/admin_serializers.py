@@ -1,6 +1,7 @@
 # catalog/admin_serializers.py
 from rest_framework import serializers
 from .models import Category, SubCategory, Product, ProductImage
+from .serializers import product_images
 
 
 # ---------- Category ----------
@@ -122,7 +123,7 @@ class AdminProductSerializer(serializers.ModelSerializer):
     def get_images(self, obj):
         request = self.context.get("request", None)
         out = []
-        for img in obj.images.all():
+        for img in product_images(obj):
             url = getattr(img.image, "url", str(img.image))
             if request and url and url.startswith("/"):
                 url = request.build_absolute_uri(url)
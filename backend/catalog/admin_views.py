@@ -1,11 +1,13 @@
-from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.permissions import BasePermission
 
-from .models import Product, Category, SubCategory
+from core.pagination import HybridPagination
+
+from . import stock, tags
+from .models import Product, Category, SubCategory, ordered_images_prefetch
 from .admin_serializers import (
     AdminProductSerializer,
     StockAdjustSerializer,
@@ -64,13 +66,14 @@ class AdminProductListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAdmin]
     serializer_class = AdminProductSerializer
 
-    queryset = Product.objects.all()
+    queryset = Product.objects.prefetch_related(ordered_images_prefetch())
+    pagination_class = HybridPagination
 
     filter_backends = [SearchFilter, OrderingFilter]
 
     # ✅ FIXED: Product has "name", NOT "title"
     search_fields = ["name", "slug", "sku", "brand"]
-    ordering_fields = ["created_at", "updated_at", "price", "stock", "name"]
+    ordering_fields = ["created_at", "updated_at", "price", "effective_price", "stock", "name"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
@@ -92,6 +95,10 @@ class AdminProductListCreateView(generics.ListCreateAPIView):
         if brand:
             qs = qs.filter(brand__iexact=brand)
 
+        # ✅ ?tag=a&tag=b (any) / &tag_mode=all (every tag) via the ProductTag index
+        params = self.request.query_params
+        qs = tags.filter_by_tags(qs, params.getlist("tag"), mode=tags.mode_param(params))
+
         return qs
 
 
@@ -105,28 +112,32 @@ class AdminProductUpdateView(generics.UpdateAPIView):
 class AdminProductStockAdjustView(APIView):
     permission_classes = [IsAdmin]
 
-    @transaction.atomic
     def patch(self, request, id):
-        product = Product.objects.select_for_update().get(id=id)
-
         ser = StockAdjustSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
 
+        if not Product.objects.filter(id=id).exists():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
         if "setTo" in ser.validated_data:
             new_stock = ser.validated_data["setTo"]
-        else:
-            new_stock = product.stock + ser.validated_data["delta"]
+            if new_stock < 0:
+                return Response({"detail": "Stock cannot be negative."}, status=status.HTTP_400_BAD_REQUEST)
+            product = Product.objects.get(id=id)
+            product.stock = new_stock
+            product.save(update_fields=["stock", "updated_at"])
+            return Response({"id": product.id, "stock": product.stock})
 
-        if new_stock < 0:
+        # ✅ delta goes through the same conditional UPDATE as checkout,
+        # so it can't race a concurrent order into negative stock
+        result = stock.apply_deltas({id: ser.validated_data["delta"]}, require_active=False, respect_holds=False)
+        if not result:
             return Response({"detail": "Stock cannot be negative."}, status=status.HTTP_400_BAD_REQUEST)
 
-        product.stock = new_stock
-        try:
-            product.save(update_fields=["stock", "updated_at"])
-        except Exception:
-            product.save()
-
-        return Response({"id": product.id, "stock": product.stock})
+        new_stock = result.stocks.get(id)
+        if new_stock is None:
+            new_stock = Product.objects.filter(id=id).values_list("stock", flat=True).first()
+        return Response({"id": id, "stock": new_stock})
 
 
 # =========================
@@ -0,0 +1,156 @@
+"""
+Response cache for the public (anonymous, read-heavy) catalog endpoints.
+
+- Backend: any Django cache (settings.CATALOG_CACHE_ALIAS -> CACHES),
+  so locmem / file / Redis all work without code changes.
+- Key: host + path + sorted query params.
+- Invalidation is per resource. Every cached response records the
+  versions of the resources it was built from and is only served while
+  they are unchanged:
+    "product:<id>"  one product's detail (stock, holds, images, prices)
+    "categories"    category / subcategory lists
+    "facets"        responses read from FacetCount (popular tags)
+    "all"           everything (e.g. a vendor being (de)activated)
+  A product write therefore doesn't drop the category responses, and one
+  checkout only drops the products it touched.
+- Versions are millisecond timestamps, so they double as Last-Modified.
+- Clients get ETag / Last-Modified and a 304 when nothing changed.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+ALL = "all"
+CATEGORIES = "categories"
+FACETS = "facets"
+
+
+def product(product_id):
+    return f"product:{product_id}"
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 60 * 15)
+
+
+def _version_key(resource):
+    return f"catalog:version:{resource}"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_versions(resources):
+    """
+    {resource: version}; resources never written yet start at "now".
+    """
+    c = _cache()
+    keys = {_version_key(r): r for r in resources}
+    found = c.get_many(list(keys))
+    missing = {k: _now_ms() for k in keys if k not in found}
+    for k, v in missing.items():
+        c.add(k, v, timeout=None)
+    if missing:
+        found.update(c.get_many(list(missing)))
+    return {keys[k]: found.get(k, missing.get(k)) for k in keys}
+
+
+def invalidate(*resources, **kwargs):
+    """
+    Drop the cached responses built from `resources` (everything when none
+    are given, which also makes it usable directly as a signal receiver).
+    """
+    resources = resources or (ALL,)
+    c = _cache()
+    now = _now_ms()
+    current = c.get_many([_version_key(r) for r in resources])
+    # strictly increasing even for two writes in the same millisecond
+    c.set_many(
+        {_version_key(r): max(now, current.get(_version_key(r), 0) + 1) for r in resources},
+        timeout=None,
+    )
+
+
+def invalidate_products(product_ids):
+    ids = {pid for pid in product_ids if pid is not None}
+    if ids:
+        invalidate(*[product(pid) for pid in sorted(ids)])
+
+
+def _response_key(request):
+    params = sorted(request.query_params.lists())
+    raw = f"{request.get_host()}|{request.path}|{params}"
+    return f"catalog:resp:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def _not_modified(request, etag, changed_at):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+    return since is not None and changed_at <= since
+
+
+def _with_validators(response, etag, changed_at):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(changed_at)
+    response["Cache-Control"] = "public, max-age=0, must-revalidate"
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of a DRF generic view (list or retrieve).
+
+    `cache_resources` names what the response is built from; views whose
+    resources depend on the URL (a detail's product) override
+    `get_cache_resources`, and `get_cache_timeout` can shorten the TTL.
+    """
+
+    cache_resources = ()
+
+    def get_cache_resources(self):
+        return list(self.cache_resources)
+
+    def get_cache_timeout(self, data):
+        return _timeout()
+
+    def get(self, request, *args, **kwargs):
+        key = _response_key(request)
+        c = _cache()
+
+        hit = c.get(key)
+        if hit is None or get_versions(hit["versions"]) != hit["versions"]:
+            # Versions are read BEFORE rendering: a write that lands while we
+            # render leaves this entry already stale rather than hiding it.
+            versions = get_versions([ALL, *self.get_cache_resources()])
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            body = json.dumps(response.data, sort_keys=True, default=str)
+            hit = {
+                "data": response.data,
+                "etag": quote_etag(hashlib.md5(body.encode("utf-8")).hexdigest()),
+                "versions": versions,
+            }
+            timeout = self.get_cache_timeout(response.data)
+            if timeout > 0:
+                c.set(key, hit, timeout=timeout)
+
+        etag = hit["etag"]
+        changed_at = max(hit["versions"].values()) // 1000
+        if _not_modified(request, etag, changed_at):
+            return _with_validators(Response(status=304), etag, changed_at)
+        return _with_validators(Response(hit["data"]), etag, changed_at)
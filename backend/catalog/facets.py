@@ -0,0 +1,170 @@
+"""
+Precomputed facet counts for the public product list sidebar.
+
+FacetCount holds one row per (scope, facet, value):
+- scope: "all", "c:<category_id>" or "s:<subcategory_id>"
+- facet: brand | price | in_stock | on_discount | tag
+
+Rows are adjusted by +1/-1 when a product's facet keys change (see
+catalog.signals and pricing.refresh_due), so reads never GROUP BY the
+product table. `manage.py rebuild_facet_counts` recomputes everything.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from . import cache, tags
+
+BRAND = "brand"
+PRICE = "price"
+IN_STOCK = "in_stock"
+ON_DISCOUNT = "on_discount"
+TAG = "tag"
+
+FACETS = [BRAND, PRICE, IN_STOCK, ON_DISCOUNT, TAG]
+
+# (key, low inclusive, high exclusive) on effective_price
+PRICE_BUCKETS = [
+    ("0-1000", Decimal("0"), Decimal("1000")),
+    ("1000-5000", Decimal("1000"), Decimal("5000")),
+    ("5000-20000", Decimal("5000"), Decimal("20000")),
+    ("20000-50000", Decimal("20000"), Decimal("50000")),
+    ("50000+", Decimal("50000"), None),
+]
+
+
+def price_bucket(amount):
+    amount = Decimal(str(amount or 0))
+    for key, low, high in PRICE_BUCKETS:
+        if amount >= low and (high is None or amount < high):
+            return key
+    return PRICE_BUCKETS[0][0]
+
+
+def price_bucket_q(key, field="effective_price"):
+    for k, low, high in PRICE_BUCKETS:
+        if k == key:
+            q = Q(**{f"{field}__gte": low})
+            if high is not None:
+                q &= Q(**{f"{field}__lt": high})
+            return q
+    return None
+
+
+# Product columns facet_keys() reads (attnames)
+SOURCE_FIELDS = {
+    "is_active", "stock", "brand", "tags", "effective_price",
+    "is_discount_active", "category_id", "subcategory_id",
+}
+
+
+def facet_keys(product, stock=None):
+    """
+    Set of (scope, facet, value) a product contributes to. Inactive -> empty.
+    `stock` overrides product.stock (e.g. when it holds an F() expression).
+    """
+    if not product.is_active:
+        return frozenset()
+
+    stock = product.stock if stock is None else stock
+
+    values = [(PRICE, price_bucket(product.effective_price))]
+    if product.brand:
+        values.append((BRAND, product.brand.strip()))
+    if stock and stock > 0:
+        values.append((IN_STOCK, "1"))
+    if product.is_discount_active:
+        values.append((ON_DISCOUNT, "1"))
+    values.extend((TAG, t) for t in tags.normalize_tags(product.tags))
+
+    scopes = ["all"]
+    if product.category_id:
+        scopes.append(f"c:{product.category_id}")
+    if product.subcategory_id:
+        scopes.append(f"s:{product.subcategory_id}")
+
+    return frozenset((scope, facet, value[:100]) for scope in scopes for facet, value in values)
+
+
+def _bump(key, delta):
+    from .models import FacetCount
+
+    scope, facet, value = key
+    qs = FacetCount.objects.filter(scope=scope, facet=facet, value=value)
+    if qs.update(count=F("count") + delta):
+        return
+    if delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            FacetCount.objects.create(scope=scope, facet=facet, value=value, count=delta)
+    except IntegrityError:
+        qs.update(count=F("count") + delta)
+
+
+def apply_change(old_keys, new_keys):
+    """
+    Move counts from a product's old facet keys to its new ones.
+    """
+    old_keys = old_keys or frozenset()
+    new_keys = new_keys or frozenset()
+    if old_keys == new_keys:
+        return
+    for key in old_keys - new_keys:
+        _bump(key, -1)
+    for key in new_keys - old_keys:
+        _bump(key, +1)
+    cache.invalidate(cache.FACETS)  # popular tags are read from these rows
+
+
+def counts_for_scopes(scopes, only=None):
+    """
+    {facet: [{"value", "count"}, ...]} summed over `scopes`, biggest first.
+    `only` limits the query to a list of facet names.
+    """
+    from .models import FacetCount
+
+    rows = FacetCount.objects.filter(scope__in=scopes, count__gt=0)
+    if only:
+        rows = rows.filter(facet__in=only)
+    rows = (
+        rows.values("facet", "value")
+        .annotate(total=Sum("count"))
+        .order_by("facet", "-total", "value")
+    )
+    out = {facet: [] for facet in FACETS}
+    for r in rows:
+        out.setdefault(r["facet"], []).append({"value": r["value"], "count": r["total"]})
+
+    # keep price buckets in range order rather than by count
+    order = {key: i for i, (key, _, _) in enumerate(PRICE_BUCKETS)}
+    out[PRICE].sort(key=lambda r: order.get(r["value"], len(order)))
+    return out
+
+
+def rebuild(product_model=None, facet_model=None):
+    """
+    Recompute every FacetCount row from scratch. Returns number of rows.
+    Models can be passed in so migrations can use historical models.
+    """
+    if product_model is None or facet_model is None:
+        from .models import Product, FacetCount
+        product_model, facet_model = product_model or Product, facet_model or FacetCount
+
+    counter = Counter()
+    fields = [
+        "id", "is_active", "stock", "brand", "tags", "effective_price",
+        "is_discount_active", "category", "subcategory",
+    ]
+    for p in product_model.objects.filter(is_active=True).only(*fields).iterator(chunk_size=1000):
+        counter.update(facet_keys(p))
+
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create(
+            [facet_model(scope=s, facet=f, value=v, count=c) for (s, f, v), c in counter.items()],
+            batch_size=1000,
+        )
+    return len(counter)
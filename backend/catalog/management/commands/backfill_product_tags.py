@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog import tags
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ProductTag index from Product.tags."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = tags.backfill(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} product tag(s)."))
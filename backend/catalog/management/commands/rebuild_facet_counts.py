@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from catalog import cache, facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the FacetCount table from the product catalog."
+
+    def handle(self, *args, **options):
+        rows = facets.rebuild()
+        cache.invalidate(cache.FACETS)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet count row(s)."))
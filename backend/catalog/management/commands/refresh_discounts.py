@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog import pricing
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh Product.effective_price / is_discount_active for products whose "
+        "discount window opened or closed. Use --watch to keep running and wake "
+        "up at the next discount_start / discount_end boundary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Run forever as a scheduler.")
+        parser.add_argument(
+            "--max-sleep",
+            type=int,
+            default=300,
+            help="Longest sleep between checks in watch mode (seconds).",
+        )
+
+    def handle(self, *args, **options):
+        if not options["watch"]:
+            updated = pricing.refresh_due()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} product(s)."))
+            return
+
+        max_sleep = max(1, options["max_sleep"])
+        while True:
+            updated = pricing.refresh_due()
+            if updated:
+                self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M:%S}] Refreshed {updated} product(s).")
+
+            # Sleep until just past the next boundary (discount_end is inclusive),
+            # capped so newly edited discounts are still picked up.
+            now = timezone.now()
+            boundary = pricing.next_boundary(now)
+            delay = max_sleep
+            if boundary:
+                delay = min(max_sleep, (boundary - now).total_seconds() + 1)
+            time.sleep(max(1, delay))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog import reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stock holds of online-payment orders whose payment was not "
+        "confirmed in time. Use --watch to keep sweeping every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Run forever as a sweeper.")
+        parser.add_argument("--interval", type=int, default=60, help="Seconds between sweeps in watch mode.")
+
+    def handle(self, *args, **options):
+        if not options["watch"]:
+            released = reservations.sweep()
+            self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
+            return
+
+        interval = max(1, options["interval"])
+        while True:
+            released = reservations.sweep()
+            if released:
+                self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M:%S}] Released {released} expired reservation(s).")
+            time.sleep(interval)
@@ -0,0 +1,39 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product, SHUFFLE_RANK_MAX
+
+
+class Command(BaseCommand):
+    help = "Regenerate Product.shuffle_rank for the public shuffled product feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Seed for a reproducible shuffle (default: random).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        updated = 0
+        batch = []
+        for p in Product.objects.only("id").order_by("id").iterator(chunk_size=batch_size):
+            p.shuffle_rank = rng.randint(0, SHUFFLE_RANK_MAX)
+            batch.append(p)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, ["shuffle_rank"])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Product.objects.bulk_update(batch, ["shuffle_rank"])
+            updated += len(batch)
+
+        # shuffle_rank only orders the (uncached) product list; cached responses stay valid
+        self.stdout.write(self.style.SUCCESS(f"Reshuffled {updated} product(s)."))
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-16 22:45
+
+import random
+
+import catalog.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_shuffle_ranks(apps, schema_editor):
+    # AddField evaluates the callable default once, so every existing row
+    # starts with the same rank. Give each product its own.
+    Product = apps.get_model("catalog", "Product")
+    products = list(Product.objects.only("id"))
+    for p in products:
+        p.shuffle_rank = random.randint(0, catalog.models.SHUFFLE_RANK_MAX)
+    Product.objects.bulk_update(products, ["shuffle_rank"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_productimage_sort_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='shuffle_rank',
+            field=models.PositiveIntegerField(default=catalog.models.random_shuffle_rank),
+        ),
+        migrations.RunPython(assign_shuffle_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'shuffle_rank', 'id'], name='product_shuffle_idx'),
+        ),
+    ]
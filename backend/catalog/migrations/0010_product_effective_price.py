@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-16 23:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from catalog import pricing
+
+
+def backfill_effective_price(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    products = list(Product.objects.all())
+    for p in products:
+        pricing.apply(p)
+    Product.objects.bulk_update(products, pricing.STORED_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_discount_active',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'effective_price'], name='product_eff_price_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+from catalog import facets
+
+
+def build_facet_counts(apps, schema_editor):
+    facets.rebuild(apps.get_model("catalog", "Product"), apps.get_model("catalog", "FacetCount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'facet', 'value'), name='facetcount_unique_key')],
+            },
+        ),
+        migrations.RunPython(build_facet_counts, migrations.RunPython.noop),
+    ]
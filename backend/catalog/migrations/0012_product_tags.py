@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-16 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_index', to='catalog.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'product'], name='producttag_tag_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'tag'), name='producttag_unique')],
+            },
+        ),
+    ]
@@ -1,11 +1,16 @@
+import random
 from decimal import Decimal
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
-from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator
 
+from core.snapshots import LoadSnapshotMixin
+
+from . import facets, pricing
+from .tags import normalize_tags
+
 
 class Category(models.Model):
     vendor = models.ForeignKey(
@@ -75,7 +80,21 @@ class SubCategory(models.Model):
         return f"{self.category.name} → {self.name}"
 
 
-class Product(models.Model):
+SHUFFLE_RANK_MAX = 2_147_483_647
+
+
+def random_shuffle_rank():
+    return random.randint(0, SHUFFLE_RANK_MAX)
+
+
+# Attempts at a fresh slug when a concurrent insert took ours
+SLUG_RETRIES = 3
+
+# Product columns that affect the category tree counts
+TREE_FIELDS = {"is_active", "category_id", "subcategory_id"}
+
+
+class Product(LoadSnapshotMixin, models.Model):
     DISCOUNT_PERCENT = "PERCENT"
     DISCOUNT_FIXED = "FIXED"
     DISCOUNT_CHOICES = [
@@ -109,83 +128,115 @@ class Product(models.Model):
     discount_start = models.DateTimeField(null=True, blank=True)
     discount_end = models.DateTimeField(null=True, blank=True)
 
+    # Materialized from price + discount window (see catalog/pricing.py)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    is_discount_active = models.BooleanField(default=False)
+
     brand = models.CharField(max_length=100, blank=True)
     tags = models.JSONField(default=list, blank=True)
 
     is_active = models.BooleanField(default=True)
 
+    # Random position in the public "shuffled" feed.
+    # Regenerated periodically by `manage.py reshuffle_products`.
+    shuffle_rank = models.PositiveIntegerField(default=random_shuffle_rank)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "shuffle_rank", "id"], name="product_shuffle_idx"),
+            models.Index(fields=["is_active", "effective_price"], name="product_eff_price_idx"),
+        ]
+
+    # Stored-row values catalog.signals diffs after save: facet keys, the
+    # tag set (ProductTag only changes on a diff) and the category tree key
+    load_snapshots = {
+        "_facet_keys": (facets.SOURCE_FIELDS, facets.facet_keys),
+        "_tag_set": ({"tags"}, lambda p: normalize_tags(p.tags)),
+        "_tree_key": (TREE_FIELDS, lambda p: p.tree_key()),
+    }
+
+    def tree_key(self):
+        return (self.is_active, self.category_id, self.subcategory_id)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name)[:230] or "product"
-            slug = base
-            i = 1
-            while Product.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                i += 1
-                slug = f"{base}-{i}"[:255]
-            self.slug = slug
-        super().save(*args, **kwargs)
+        auto_slug = not self.slug
+        if auto_slug:
+            self.slug = self._allocate_slug()
+
+        pricing.apply(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and pricing.INPUT_FIELDS & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | set(pricing.STORED_FIELDS)
+
+        if not auto_slug:
+            super().save(*args, **kwargs)
+            return
+
+        # ✅ Another request may take the same slug between allocate and insert
+        for attempt in range(SLUG_RETRIES):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if attempt == SLUG_RETRIES - 1:
+                    raise
+                if not Product.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
+                    raise  # some other constraint failed
+                self.slug = self._allocate_slug()
+
+    def _allocate_slug(self):
+        """
+        "<name>" or "<name>-<n>" past the highest suffix in use, in one query
+        (instead of probing -2, -3, ... one query at a time).
+        """
+        base = slugify(self.name)[:230] or "product"
+        taken = (
+            Product.objects.filter(slug__startswith=base)
+            .exclude(pk=self.pk)
+            .values_list("slug", flat=True)
+        )
+
+        highest = 0
+        for slug in taken:
+            if slug == base:
+                highest = max(highest, 1)
+            elif slug.startswith(base + "-") and slug[len(base) + 1:].isdigit():
+                highest = max(highest, int(slug[len(base) + 1:]))
+
+        return base if highest == 0 else f"{base}-{highest + 1}"[:255]
 
     def __str__(self):
         return self.name
 
     # =========================
     # ✅ DISCOUNT HELPERS (NEW)
+    # Rules live in catalog/pricing.py
     # =========================
     @property
     def discount_active(self) -> bool:
         """
-        Active when:
-        - discount_type exists
-        - discount_value > 0
-        - within optional start/end window
+        Live check against the discount window (see pricing.discount_is_live).
+        Lists should read the stored `is_discount_active` instead.
         """
-        if not self.discount_type or self.discount_value is None:
-            return False
-
-        try:
-            dv = Decimal(str(self.discount_value))
-        except Exception:
-            return False
-
-        if dv <= 0:
-            return False
-
-        # sanity checks (extra safety)
-        if self.discount_type == self.DISCOUNT_PERCENT and dv > 100:
-            return False
-
-        now = timezone.now()
-        if self.discount_start and now < self.discount_start:
-            return False
-        if self.discount_end and now > self.discount_end:
-            return False
-
-        return True
+        return pricing.discount_is_live(
+            self.discount_type,
+            self.discount_value,
+            self.discount_start,
+            self.discount_end,
+        )
 
     def get_final_price(self) -> Decimal:
         """
         Returns discounted price if discount is active, otherwise original price.
         Always >= 0.
         """
-        price = Decimal(str(self.price or "0"))
-
-        if not self.discount_active:
-            return price.quantize(Decimal("0.01"))
-
-        dv = Decimal(str(self.discount_value))
-
-        if self.discount_type == self.DISCOUNT_PERCENT:
-            final = price * (Decimal("100") - dv) / Decimal("100")
-        else:  # FIXED
-            final = price - dv
-
-        if final < 0:
-            final = Decimal("0")
-
-        return final.quantize(Decimal("0.01"))
+        return pricing.final_price(
+            self.price, self.discount_type, self.discount_value, self.discount_active
+        )
 
     def get_discount_amount(self) -> Decimal:
         price = Decimal(str(self.price or "0")).quantize(Decimal("0.01"))
@@ -209,3 +260,72 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+
+class FacetCount(models.Model):
+    """
+    Maintained product counts per facet value (see catalog/facets.py).
+    """
+    scope = models.CharField(max_length=32)
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "facet", "value"], name="facetcount_unique_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.facet}={self.value}: {self.count}"
+
+
+class ProductTag(models.Model):
+    """
+    One row per (product, tag): indexed mirror of Product.tags (see catalog/tags.py).
+    """
+    product = models.ForeignKey(Product, related_name="tag_index", on_delete=models.CASCADE)
+    tag = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "tag"], name="producttag_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["tag", "product"], name="producttag_tag_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.tag}"
+
+
+class StockReservation(models.Model):
+    """
+    Quantity held for an unpaid online-payment order until `expires_at`
+    (see catalog/reservations.py). Sellable stock = stock - active holds.
+    """
+    product = models.ForeignKey(Product, related_name="reservations", on_delete=models.CASCADE)
+    order = models.ForeignKey("orders.Order", related_name="stock_reservations", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "expires_at"], name="reservation_product_idx"),
+            models.Index(fields=["expires_at"], name="reservation_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+
+
+def ordered_images_prefetch(lookup="images"):
+    """
+    Prefetch for Product.images in display order.
+    Serializers read `obj.images.all()` straight from this cache.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=ProductImage.objects.order_by("sort_order", "id"),
+    )
@@ -0,0 +1,159 @@
+"""
+Discount / effective price rules.
+
+Product stores the result in `effective_price` + `is_discount_active` so
+lists can filter and sort on the price a customer actually pays.
+Those columns are refreshed on save and by `manage.py refresh_discounts`,
+which flips products when a discount_start / discount_end boundary passes.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache, facets
+
+PERCENT = "PERCENT"
+FIXED = "FIXED"
+
+CENT = Decimal("0.01")
+
+# Fields that feed the computed columns (used to extend update_fields).
+INPUT_FIELDS = {"price", "discount_type", "discount_value", "discount_start", "discount_end"}
+STORED_FIELDS = ["effective_price", "is_discount_active"]
+
+
+def discount_is_live(discount_type, discount_value, start, end, now=None) -> bool:
+    """
+    Active when:
+    - discount_type exists
+    - discount_value > 0
+    - within optional start/end window
+    """
+    if not discount_type or discount_value is None:
+        return False
+
+    try:
+        dv = Decimal(str(discount_value))
+    except Exception:
+        return False
+
+    if dv <= 0:
+        return False
+
+    # sanity checks (extra safety)
+    if discount_type == PERCENT and dv > 100:
+        return False
+
+    now = now or timezone.now()
+    if start and now < start:
+        return False
+    if end and now > end:
+        return False
+
+    return True
+
+
+def final_price(price, discount_type, discount_value, active) -> Decimal:
+    """
+    Discounted price if `active`, otherwise original price. Always >= 0.
+    """
+    price = Decimal(str(price or "0"))
+
+    if not active:
+        return price.quantize(CENT)
+
+    dv = Decimal(str(discount_value))
+
+    if discount_type == PERCENT:
+        final = price * (Decimal("100") - dv) / Decimal("100")
+    else:  # FIXED
+        final = price - dv
+
+    if final < 0:
+        final = Decimal("0")
+
+    return final.quantize(CENT)
+
+
+def apply(product, now=None):
+    """
+    Recompute the stored pricing columns on a Product instance (no save).
+    Returns True if anything changed.
+    """
+    active = discount_is_live(
+        product.discount_type,
+        product.discount_value,
+        product.discount_start,
+        product.discount_end,
+        now=now,
+    )
+    effective = final_price(product.price, product.discount_type, product.discount_value, active)
+
+    changed = (product.is_discount_active != active) or (product.effective_price != effective)
+    product.is_discount_active = active
+    product.effective_price = effective
+    return changed
+
+
+# =========================
+# Scheduler helpers
+# =========================
+def stale_q(now):
+    """
+    Products whose stored flag no longer matches the discount window.
+    Mirrors discount_is_live, so rows it rejects aren't rescanned every run.
+    """
+    in_window = (
+        Q(discount_type__isnull=False, discount_value__gt=0)
+        & ~Q(discount_type="")
+        & ~Q(discount_type=PERCENT, discount_value__gt=100)
+        & (Q(discount_start__isnull=True) | Q(discount_start__lte=now))
+        & (Q(discount_end__isnull=True) | Q(discount_end__gte=now))
+    )
+    return (Q(is_discount_active=False) & in_window) | (Q(is_discount_active=True) & ~in_window)
+
+
+def refresh_due(now=None, batch_size=500) -> int:
+    """
+    Flip every product that crossed a discount boundary. Returns rows updated.
+    """
+    from .models import Product
+
+    now = now or timezone.now()
+    qs = Product.objects.filter(stale_q(now)).only(
+        "id", "price", "discount_type", "discount_value", "discount_start", "discount_end",
+        "is_active", "stock", "brand", "tags", "category", "subcategory",
+        *STORED_FIELDS,
+    )
+
+    changed = []
+    for p in qs.iterator(chunk_size=batch_size):
+        old_keys = facets.facet_keys(p)
+        if apply(p, now=now):
+            changed.append((p, old_keys))
+
+    with transaction.atomic():
+        Product.objects.bulk_update([p for p, _ in changed], STORED_FIELDS, batch_size=batch_size)
+        # bulk_update sends no post_save: keep facet counts + cache in step here
+        for p, old_keys in changed:
+            facets.apply_change(old_keys, facets.facet_keys(p))
+
+    cache.invalidate_products([p.id for p, _ in changed])
+    return len(changed)
+
+
+def next_boundary(now=None):
+    """
+    Earliest discount_start / discount_end still in the future (or None).
+    """
+    from .models import Product
+
+    now = now or timezone.now()
+    qs = Product.objects.filter(discount_type__isnull=False)
+    starts = qs.filter(discount_start__gt=now).order_by("discount_start").values_list("discount_start", flat=True)
+    ends = qs.filter(discount_end__gte=now).order_by("discount_end").values_list("discount_end", flat=True)
+
+    candidates = [d for d in (starts.first(), ends.first()) if d]
+    return min(candidates) if candidates else None
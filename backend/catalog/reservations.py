@@ -0,0 +1,166 @@
+"""
+Time-bounded stock holds for online-payment (sslcommerz) orders.
+
+Checkout reserves the order's quantities instead of leaving stock free
+until the payment comes back. Holds expire after
+settings.STOCK_RESERVATION_MINUTES; `manage.py release_stock_reservations`
+sweeps expired rows. Expired rows already stop counting before the sweep,
+because every reader filters on expires_at.
+
+Sellable stock = Product.stock - SUM(active holds), read with one
+aggregate over the (product, expires_at) index.
+
+Cached product details (catalog.cache) are dropped for the held products
+when a hold is placed or released, and are never kept past the product's
+earliest active hold (next_expiry), so an expiring hold needs no sweep to
+show up in `availableStock`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache, stock
+
+
+def hold_minutes():
+    return getattr(settings, "STOCK_RESERVATION_MINUTES", 15)
+
+
+def held(outer="pk", now=None):
+    """
+    Active reserved quantity for the product referenced by OuterRef(outer).
+    """
+    from .models import StockReservation
+
+    now = now or timezone.now()
+    total = (
+        StockReservation.objects.filter(product_id=OuterRef(outer), expires_at__gt=now)
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def with_available(qs, now=None):
+    """
+    Annotate a Product queryset with `available_stock`.
+    """
+    return qs.annotate(available_stock=F("stock") - held(now=now))
+
+
+def available_for(product_ids, now=None):
+    """
+    {product_id: stock - active holds} in one query.
+    """
+    from .models import Product
+
+    qs = with_available(Product.objects.filter(id__in=list(product_ids)), now=now)
+    return dict(qs.values_list("id", "available_stock"))
+
+
+def next_expiry(product_id, now=None):
+    """
+    When the product's earliest active hold runs out (None without holds).
+    """
+    from .models import StockReservation
+
+    now = now or timezone.now()
+    return (
+        StockReservation.objects.filter(product_id=product_id, expires_at__gt=now)
+        .order_by("expires_at")
+        .values_list("expires_at", flat=True)
+        .first()
+    )
+
+
+def reserve(order, lines, now=None):
+    """
+    Hold [(product_id, qty), ...] for `order`, all or nothing.
+    Returns a stock.StockResult.
+    """
+    from .models import Product, StockReservation
+
+    now = now or timezone.now()
+    lines = stock.merge_lines(lines)
+
+    with transaction.atomic():
+        # No-op write first: row locks serialize concurrent holds on the
+        # same products until this transaction ends.
+        ids = sorted(lines)
+        Product.objects.filter(id__in=ids).update(stock=F("stock"))
+
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                product_id=pid, order=order, quantity=qty,
+                expires_at=now + timedelta(minutes=hold_minutes()),
+            )
+            for pid, qty in lines.items()
+        ])
+
+        rows = with_available(Product.objects.filter(id__in=ids), now=now).values_list(
+            "id", "name", "is_active", "available_stock"
+        )
+        failures = []
+        seen = set()
+        for pid, name, is_active, available in rows:
+            seen.add(pid)
+            if not is_active:
+                failures.append({"product_id": pid, "name": name, "requested": lines[pid], "available": None})
+            elif available < 0:
+                failures.append({"product_id": pid, "name": name, "requested": lines[pid],
+                                 "available": available + lines[pid]})
+        failures.extend(
+            {"product_id": pid, "name": "", "requested": qty, "available": None}
+            for pid, qty in lines.items() if pid not in seen
+        )
+
+        if failures:
+            transaction.set_rollback(True)
+            return stock.StockResult(False, failures=failures)
+
+    cache.invalidate_products(lines)
+    return stock.StockResult(True)
+
+
+def release(order):
+    """
+    Drop every hold of an order (instance or id): cancelled, or about to be fulfilled.
+    """
+    from .models import StockReservation
+
+    holds = StockReservation.objects.filter(order=order)
+    product_ids = set(holds.values_list("product_id", flat=True))
+    deleted, _ = holds.delete()
+    if deleted:
+        cache.invalidate_products(product_ids)
+    return deleted
+
+
+def commit(order, lines):
+    """
+    Payment confirmed: turn the order's holds into a real stock decrement.
+    """
+    with transaction.atomic():
+        release(order)
+        result = stock.decrement(lines)
+        if not result:
+            transaction.set_rollback(True)
+    return result
+
+
+def sweep(now=None):
+    """
+    Delete expired holds. Returns number of rows removed.
+    Expired holds already stopped counting (and no cached detail outlives
+    them), so nothing has to be invalidated.
+    """
+    from .models import StockReservation
+
+    now = now or timezone.now()
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=now).delete()
+    return deleted
@@ -0,0 +1,163 @@
+"""
+Product full-text search index.
+
+Backed by a side table kept in sync from catalog.signals:
+- SQLite:     FTS5 virtual table  (catalog_product_fts, rowid = product id)
+- PostgreSQL: tsvector table + GIN (catalog_product_search)
+
+Searches filter the product query by the index (`pk__in` subquery) and
+rank in SQL, so the paginator counts and pages over every match (no id
+list, no result cap).
+Any other database falls back to the old icontains lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = "catalog_product_fts"
+PG_TABLE = "catalog_product_search"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return [t.lower() for t in _TOKEN_RE.findall(text or "")][:10]
+
+
+def _vendor():
+    return connection.vendor
+
+
+def is_supported():
+    return _vendor() in ("sqlite", "postgresql")
+
+
+# =========================
+# DDL (used by migrations)
+# =========================
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+            f"USING fts5(name, brand, sku, slug, tokenize = 'unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, brand, sku, slug) "
+            f"SELECT id, name, brand, COALESCE(sku, ''), slug FROM catalog_product"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            f"product_id bigint PRIMARY KEY REFERENCES catalog_product(id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_gin ON {PG_TABLE} USING gin (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {PG_TABLE} (product_id, document) "
+            f"SELECT id, {_pg_document_sql('name', 'brand', 'sku', 'slug')} FROM catalog_product"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+def _pg_document_sql(name, brand, sku, slug):
+    return (
+        f"setweight(to_tsvector('simple', COALESCE({name}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', COALESCE({sku}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', COALESCE({brand}, '')), 'B') || "
+        f"setweight(to_tsvector('simple', replace(COALESCE({slug}, ''), '-', ' ')), 'C')"
+    )
+
+
+# =========================
+# Index maintenance
+# =========================
+def index_product(product):
+    vendor = _vendor()
+    values = [product.name or "", product.brand or "", product.sku or "", product.slug or ""]
+
+    with connection.cursor() as cur:
+        if vendor == "sqlite":
+            cur.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [product.pk])
+            cur.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, brand, sku, slug) VALUES (%s, %s, %s, %s, %s)",
+                [product.pk, *values],
+            )
+        elif vendor == "postgresql":
+            cur.execute(
+                f"INSERT INTO {PG_TABLE} (product_id, document) "
+                f"VALUES (%s, {_pg_document_sql('%s', '%s', '%s', '%s')}) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [product.pk, values[0], values[2], values[1], values[3]],
+            )
+
+
+def unindex_product(product_id):
+    vendor = _vendor()
+    with connection.cursor() as cur:
+        if vendor == "sqlite":
+            cur.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [product_id])
+        elif vendor == "postgresql":
+            cur.execute(f"DELETE FROM {PG_TABLE} WHERE product_id = %s", [product_id])
+
+
+# =========================
+# Query
+# =========================
+def _match(tokens):
+    """
+    (matching product ids SQL + params, rank SQL + params) for the current
+    database: prefix match on each term, lower rank = better match. The
+    rank is correlated on catalog_product.id, one index lookup per match.
+    """
+    if _vendor() == "sqlite":
+        match = " ".join(f'"{t}"*' for t in tokens)
+        ids = f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s"
+        rank = (
+            f"SELECT bm25({SQLITE_TABLE}, 10.0, 3.0, 10.0, 1.0) FROM {SQLITE_TABLE} "
+            f"WHERE {SQLITE_TABLE} MATCH %s AND {SQLITE_TABLE}.rowid = catalog_product.id"
+        )
+        return ids, [match], rank, [match]
+
+    tsquery = " & ".join(f"{t}:*" for t in tokens)
+    ids = f"SELECT product_id FROM {PG_TABLE} WHERE document @@ to_tsquery('simple', %s)"
+    rank = (
+        f"SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {PG_TABLE} "
+        f"WHERE {PG_TABLE}.product_id = catalog_product.id"
+    )
+    return ids, [tsquery], rank, [tsquery]
+
+
+def search_products(qs, query):
+    """
+    Narrow a Product queryset to search matches, annotated with
+    `search_rank` and ordered by it (best match first, then id).
+    """
+    if not is_supported():
+        q = Q()
+        for field in ("name", "brand", "slug", "sku"):
+            q |= Q(**{f"{field}__icontains": query})
+        return qs.filter(q)
+
+    tokens = tokenize(query)
+    if not tokens:
+        return qs.none()
+
+    ids, params, rank, rank_params = _match(tokens)
+    return (
+        qs.filter(pk__in=RawSQL(ids, params))
+        .annotate(search_rank=RawSQL(rank, rank_params, output_field=FloatField()))
+        .order_by("search_rank", "id")
+    )
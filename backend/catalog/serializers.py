@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Product, Category, SubCategory, ProductImage
 
@@ -78,6 +80,17 @@ def _to_url(request, value):
     return url
 
 
+def product_images(product):
+    """
+    Product images in display order.
+    Uses the `ordered_images_prefetch()` cache when the view set it up,
+    otherwise falls back to one ordered query.
+    """
+    if "images" in getattr(product, "_prefetched_objects_cache", {}):
+        return product.images.all()
+    return product.images.order_by("sort_order", "id")
+
+
 class ProductSerializer(serializers.ModelSerializer):
     title = serializers.CharField(source="name", read_only=True)
     isActive = serializers.BooleanField(source="is_active", read_only=True)
@@ -102,24 +115,29 @@ class ProductSerializer(serializers.ModelSerializer):
     # IMPORTANT: keep as URL list (don’t break existing frontend)
     images = serializers.SerializerMethodField()
 
+    # stock minus holds of unpaid online orders (views annotate `available_stock`)
+    availableStock = serializers.SerializerMethodField()
+
     def get_images(self, obj):
         request = self.context.get("request")
-        try:
-            imgs = obj.images.all().order_by("sort_order", "id")
-        except Exception:
-            imgs = obj.images.all().order_by("id")
-        return [_to_url(request, img.image) for img in imgs]
+        return [_to_url(request, img.image) for img in product_images(obj)]
+
+    def get_availableStock(self, obj):
+        available = getattr(obj, "available_stock", None)
+        if available is None:
+            return obj.stock
+        return max(available, 0)
 
+    # Read the materialized pricing columns (kept fresh by save + refresh_discounts)
     def get_hasDiscount(self, obj):
-        return bool(getattr(obj, "discount_active", False))
+        return bool(obj.is_discount_active)
 
     def get_finalPrice(self, obj):
-        fn = getattr(obj, "get_final_price", None)
-        return fn() if callable(fn) else obj.price
+        return obj.effective_price
 
     def get_discountAmount(self, obj):
-        fn = getattr(obj, "get_discount_amount", None)
-        return fn() if callable(fn) else 0
+        amt = (obj.price or 0) - (obj.effective_price or 0)
+        return amt if amt > 0 else Decimal("0.00")
 
     class Meta:
         model = Product
@@ -141,6 +159,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "discountAmount",
 
             "stock",
+            "availableStock",
             "sku",
             "brand",
             "tags",
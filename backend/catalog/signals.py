@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache, facets, search, tags, tree
+from .models import TREE_FIELDS
+from .models import Product, ProductImage, Category, SubCategory
+
+
+@receiver(post_save, sender=Product)
+def product_search_index(sender, instance, raw=False, **kwargs):
+    # Keep the full-text index in sync with name/brand/sku/slug
+    if raw:
+        return
+    search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_search_unindex(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+
+
+# =========================
+# Facet counts
+# =========================
+@receiver(pre_save, sender=Product)
+def product_facets_snapshot(sender, instance, raw=False, **kwargs):
+    # Normally Product.from_db already took the snapshot; only partially
+    # loaded instances need the stored row here.
+    if raw or instance._state.adding or hasattr(instance, "_facet_keys"):
+        return
+    old = Product.objects.filter(pk=instance.pk).first()
+    instance._facet_keys = facets.facet_keys(old) if old else frozenset()
+
+
+@receiver(post_save, sender=Product)
+def product_facets_update(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    stock = instance.stock
+    if not isinstance(stock, int):
+        # e.g. stock = F("stock") - qty
+        stock = Product.objects.filter(pk=instance.pk).values_list("stock", flat=True).first()
+
+    new_keys = facets.facet_keys(instance, stock=stock)
+    facets.apply_change(getattr(instance, "_facet_keys", frozenset()), new_keys)
+    instance._facet_keys = new_keys
+
+
+@receiver(pre_delete, sender=Product)
+def product_facets_stored(sender, instance, **kwargs):
+    # The instance may predate UPDATEs that skip save() (catalog.stock):
+    # count out what is stored, not what was loaded
+    stored = Product.objects.filter(pk=instance.pk).first()
+    if stored is not None:
+        instance._facet_keys = facets.facet_keys(stored)
+
+
+@receiver(post_delete, sender=Product)
+def product_facets_remove(sender, instance, **kwargs):
+    old_keys = getattr(instance, "_facet_keys", None)
+    if old_keys is None:
+        old_keys = facets.facet_keys(instance)
+    facets.apply_change(old_keys, frozenset())
+
+
+# =========================
+# Tag index
+# =========================
+@receiver(post_save, sender=Product)
+def product_tags_sync(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and "tags" not in update_fields:
+        return
+    old_tags = set() if created else getattr(instance, "_tag_set", None)
+    instance._tag_set = tags.sync_product_tags(instance, old_tags=old_tags)
+
+
+# =========================
+# Public response cache invalidation
+# =========================
+# Facet (popular tags) responses are invalidated by facets.apply_change itself
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_cache(sender, instance, **kwargs):
+    cache.invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_cache(sender, instance, **kwargs):
+    cache.invalidate_products([instance.product_id])
+
+
+def _categories_cache(sender, **kwargs):
+    cache.invalidate(cache.CATEGORIES)
+
+
+for _model in (Category, SubCategory):
+    post_save.connect(_categories_cache, sender=_model, dispatch_uid=f"catalog_cache_save_{_model.__name__}")
+    post_delete.connect(_categories_cache, sender=_model, dispatch_uid=f"catalog_cache_delete_{_model.__name__}")
+
+
+def _vendor_status_save(instance, update_fields):
+    if getattr(instance, "role", "") != "vendor":
+        return False
+    return update_fields is None or "is_active" in update_fields
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def vendor_status_snapshot(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Normally User.from_db already remembered is_active; only instances
+    # that were never loaded need the stored row here.
+    if raw or instance._state.adding or hasattr(instance, "_loaded_is_active"):
+        return
+    if _vendor_status_save(instance, update_fields):
+        instance._loaded_is_active = (
+            sender.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def vendor_status_cache(sender, instance, created=False, update_fields=None, **kwargs):
+    # Vendor (de)activation hides/shows their categories and products
+    if created or not _vendor_status_save(instance, update_fields):
+        return
+    was_active = getattr(instance, "_loaded_is_active", None)
+    instance._loaded_is_active = instance.is_active
+    if was_active == instance.is_active:
+        return  # e.g. a profile edit: nothing the catalog shows changed
+    cache.invalidate(cache.ALL)
+    tree.bump()
+
+
+# =========================
+# Category tree (/api/catalog/tree/)
+# =========================
+for _model in (Category, SubCategory):
+    post_save.connect(tree.bump, sender=_model, dispatch_uid=f"catalog_tree_save_{_model.__name__}")
+    post_delete.connect(tree.bump, sender=_model, dispatch_uid=f"catalog_tree_delete_{_model.__name__}")
+
+
+_TREE_UPDATE_FIELDS = TREE_FIELDS | {"category", "subcategory"}
+
+
+@receiver(post_save, sender=Product)
+def product_tree_counts(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Only activation / category moves change the tree's product counts
+    if raw:
+        return
+    if update_fields is not None and not _TREE_UPDATE_FIELDS & set(update_fields):
+        return
+    new_key = instance.tree_key()
+    if created or getattr(instance, "_tree_key", None) != new_key:
+        tree.bump()
+    instance._tree_key = new_key
+
+
+@receiver(post_delete, sender=Product)
+def product_tree_remove(sender, instance, **kwargs):
+    tree.bump()
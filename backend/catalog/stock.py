@@ -0,0 +1,153 @@
+"""
+Conditional stock updates shared by checkout, payment confirmation and
+admin adjustments.
+
+Every change is ONE statement for the whole order:
+
+    UPDATE catalog_product
+       SET stock = stock + CASE id WHEN 1 THEN -2 WHEN 7 THEN -1 END
+     WHERE id IN (1, 7) AND is_active
+       AND stock >= CASE id WHEN 1 THEN 2 WHEN 7 THEN 1 END
+
+The WHERE clause is the oversell guard (it also keeps quantities held by
+catalog.reservations out of reach), so no row has to be locked
+beforehand; it works the same on SQLite where select_for_update is a
+no-op. If fewer rows match than requested, the savepoint is rolled back
+and the result lists the lines that could not be served.
+
+A bulk UPDATE sends no post_save, so facet counts and the cached detail
+responses of the touched products are updated here (facets.apply_change
+also drops the facet responses when a product's stock crosses zero).
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import cache, facets
+
+
+class StockResult:
+    def __init__(self, ok, failures=None, stocks=None):
+        self.ok = ok
+        self.failures = failures or []  # [{"product_id", "name", "requested", "available"}]
+        self.stocks = stocks or {}  # product_id -> stock after the update
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def detail(self):
+        if not self.failures:
+            return ""
+        f = self.failures[0]
+        if f["available"] is None:
+            return f"Product not available (id={f['product_id']})."
+        return f"Not enough stock for {f['name']}. Available: {f['available']}"
+
+
+def merge_lines(lines):
+    merged = OrderedDict()
+    for product_id, qty in lines:
+        merged[product_id] = merged.get(product_id, 0) + int(qty)
+    return merged
+
+
+def _case(values):
+    return Case(
+        *[When(id=pid, then=Value(v)) for pid, v in values.items()],
+        output_field=IntegerField(),
+    )
+
+
+class _Shortfall(Exception):
+    pass
+
+
+def apply_deltas(deltas, require_active=True, respect_holds=True):
+    """
+    Add signed quantities to stock ({product_id: delta} or (id, delta) pairs),
+    all or nothing: no product may end below zero, or below the quantity
+    held for unpaid online orders when `respect_holds` is set.
+    """
+    from .models import Product
+
+    deltas = merge_lines(deltas.items() if isinstance(deltas, dict) else deltas)
+    deltas = OrderedDict((pid, d) for pid, d in deltas.items() if d)
+    if not deltas:
+        return StockResult(True)
+
+    qs = Product.objects.filter(id__in=list(deltas))
+    if require_active:
+        qs = qs.filter(is_active=True)
+
+    needed = _case({pid: -d for pid, d in deltas.items()})
+    if respect_holds and any(d < 0 for d in deltas.values()):
+        from .reservations import held
+        needed = needed + held()
+
+    try:
+        with transaction.atomic():
+            updated = qs.filter(stock__gte=needed).update(stock=F("stock") + _case(deltas))
+            if updated != len(deltas):
+                raise _Shortfall()
+    except _Shortfall:
+        return StockResult(False, failures=_failures(deltas, require_active, respect_holds))
+
+    stocks = _after_update(deltas)
+    return StockResult(True, stocks=stocks)
+
+
+def decrement(lines):
+    """
+    Take [(product_id, qty), ...] out of stock in one UPDATE.
+    """
+    return apply_deltas([(pid, -int(qty)) for pid, qty in lines])
+
+
+def increment(lines):
+    """
+    Put [(product_id, qty), ...] back (cancellations, restocks).
+    """
+    return apply_deltas([(pid, int(qty)) for pid, qty in lines], require_active=False)
+
+
+def _failures(deltas, require_active, respect_holds):
+    from .models import Product
+    from .reservations import with_available
+
+    qs = Product.objects.filter(id__in=list(deltas))
+    if respect_holds:
+        qs = with_available(qs)
+    rows = {p.id: p for p in qs.only("id", "name", "stock", "is_active")}
+
+    out = []
+    for pid, delta in deltas.items():
+        p = rows.get(pid)
+        if p is None or (require_active and not p.is_active):
+            out.append({"product_id": pid, "name": getattr(p, "name", ""), "requested": -delta, "available": None})
+            continue
+        available = getattr(p, "available_stock", p.stock)
+        if available + delta < 0:
+            out.append({"product_id": pid, "name": p.name, "requested": -delta, "available": available})
+    return out
+
+
+def _after_update(deltas):
+    """
+    Read the new stock back once; move facet counts for products whose
+    stock crossed zero and drop those products' cached responses.
+    """
+    from .models import Product
+
+    stocks = {}
+    fields = ["id", "is_active", "stock", "brand", "tags", "effective_price",
+              "is_discount_active", "category", "subcategory"]
+    for p in Product.objects.filter(id__in=list(deltas)).only(*fields):
+        stocks[p.id] = p.stock
+        old_stock = p.stock - deltas[p.id]
+        if (old_stock > 0) != (p.stock > 0):
+            facets.apply_change(facets.facet_keys(p, stock=old_stock), facets.facet_keys(p))
+
+    cache.invalidate_products(deltas)
+    return stocks
@@ -0,0 +1,89 @@
+"""
+Normalized tag index for Product.tags.
+
+Product.tags stays the source of truth (JSON list). ProductTag mirrors it
+one row per (product, tag) so tag filters are indexed joins instead of
+decoding JSON in every row. Kept in sync from catalog.signals;
+`manage.py backfill_product_tags` fills it for existing products.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+MAX_TAG_LENGTH = 50
+
+
+def normalize_tags(tags):
+    if not isinstance(tags, list):
+        return set()
+    out = set()
+    for t in tags:
+        t = str(t).strip().lower()[:MAX_TAG_LENGTH]
+        if t:
+            out.add(t)
+    return out
+
+
+def sync_product_tags(product, old_tags=None):
+    """
+    Make ProductTag rows match product.tags. `old_tags` (a set) skips the
+    read of the current rows when the caller already knows them.
+    """
+    from .models import ProductTag
+
+    new_tags = normalize_tags(product.tags)
+    if old_tags is None:
+        old_tags = set(ProductTag.objects.filter(product_id=product.pk).values_list("tag", flat=True))
+
+    removed = old_tags - new_tags
+    added = new_tags - old_tags
+    if removed:
+        ProductTag.objects.filter(product_id=product.pk, tag__in=removed).delete()
+    if added:
+        ProductTag.objects.bulk_create(
+            [ProductTag(product_id=product.pk, tag=t) for t in added],
+            ignore_conflicts=True,
+        )
+    return new_tags
+
+
+def mode_param(params):
+    # ?tag_mode=all -> every tag must match; anything else -> any tag
+    return "all" if (params.get("tag_mode") or "").strip().lower() == "all" else "any"
+
+
+def filter_by_tags(qs, tags, mode="any"):
+    """
+    Narrow a Product queryset to products tagged with any / all of `tags`.
+    """
+    from .models import ProductTag
+
+    tags = normalize_tags(list(tags))
+    if not tags:
+        return qs
+
+    if mode == "all":
+        matching = (
+            ProductTag.objects.filter(tag__in=tags)
+            .values("product_id")
+            .annotate(n=Count("tag"))
+            .filter(n=len(tags))
+            .values("product_id")
+        )
+        return qs.filter(id__in=matching)
+
+    return qs.filter(Exists(ProductTag.objects.filter(product_id=OuterRef("pk"), tag__in=tags)))
+
+
+def backfill(batch_size=1000):
+    """
+    Rebuild ProductTag from Product.tags for every product. Returns row count.
+    """
+    from .models import Product, ProductTag
+
+    rows = []
+    with transaction.atomic():
+        ProductTag.objects.all().delete()
+        for p in Product.objects.only("id", "tags").iterator(chunk_size=batch_size):
+            rows.extend(ProductTag(product_id=p.pk, tag=t) for t in normalize_tags(p.tags))
+        ProductTag.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -1,3 +1,669 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderStatusHistory
+from . import facets, pricing, reservations, search, stock, tags, tree
+from .models import Category, FacetCount, Product, ProductImage, ProductTag, StockReservation
+
+User = get_user_model()
+
+
+class ProductListQueryCountTests(TestCase):
+    """
+    Product lists must not issue a query per product (images are prefetched),
+    so the query count stays the same whatever the number of rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = User.objects.create_user(email="vendor@example.com", password="x", role="vendor")
+        cls.admin = User.objects.create_user(email="admin@example.com", password="x", is_staff=True)
+        cls.customer = User.objects.create_user(email="customer@example.com", password="x")
+        cls.cart = Cart.objects.create(user=cls.customer)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _add_products(self, n):
+        for _ in range(n):
+            p = Product.objects.create(name="Query Count Product", price=10, stock=5, vendor=self.vendor)
+            ProductImage.objects.create(product=p, image="products/test.webp", sort_order=2)
+            ProductImage.objects.create(product=p, image="products/test1.webp", sort_order=1)
+            CartItem.objects.create(cart=self.cart, product=p, qty=1)
+
+    def _count_queries(self, url, user=None):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def _assert_constant(self, url, user=None):
+        self._add_products(2)
+        small = self._count_queries(url, user)
+        self._add_products(6)
+        large = self._count_queries(url, user)
+        self.assertEqual(small, large, f"{url} issues queries per product")
+        return large
+
+    def test_public_product_list(self):
+        self.assertEqual(self._assert_constant("/api/catalog/products/"), 3)
+
+    def test_vendor_product_list(self):
+        self.assertEqual(self._assert_constant("/api/catalog/vendor/products/", self.vendor), 2)
+
+    def test_admin_product_list(self):
+        self.assertEqual(self._assert_constant("/api/admin/products/", self.admin), 3)
+
+    def test_cart(self):
+        self.assertEqual(self._assert_constant("/api/cart/", self.customer), 3)
+
+    def test_images_keep_sort_order(self):
+        self._add_products(1)
+        res = self.client.get("/api/catalog/products/")
+        images = res.json()["results"][0]["images"]
+        self.assertTrue(images[0].endswith("test1.webp"))
+
+
+class SlugAllocationTests(TestCase):
+    """
+    Auto slugs take one lookup whatever the number of existing duplicates.
+    """
+
+    def _create(self, name="Blue Shirt"):
+        with CaptureQueriesContext(connection) as ctx:
+            p = Product.objects.create(name=name, price=10, stock=1)
+        return p, len(ctx.captured_queries)
+
+    def test_suffixes(self):
+        slugs = [self._create()[0].slug for _ in range(3)]
+        self.assertEqual(slugs, ["blue-shirt", "blue-shirt-2", "blue-shirt-3"])
+        self.assertEqual(self._create("Blue Shirt Long")[0].slug, "blue-shirt-long")
+
+    def test_constant_queries_per_insert(self):
+        self._create()  # first insert also creates the facet count rows
+        _, second = self._create()
+        for _ in range(20):
+            self._create()
+        p, last = self._create()
+        self.assertEqual(p.slug, "blue-shirt-23")
+        self.assertEqual(second, last)
+
+    def test_retries_when_slug_taken_concurrently(self):
+        Product.objects.create(name="Blue Shirt", price=10, stock=1)
+        p = Product(name="Blue Shirt", price=10, stock=1)
+        calls = iter(["blue-shirt", "blue-shirt-2"])
+        p._allocate_slug = lambda: next(calls)  # first answer is already stale
+        p.save()
+        self.assertEqual(p.slug, "blue-shirt-2")
+
+
+class StockEngineTests(TestCase):
+    def setUp(self):
+        self.a = Product.objects.create(name="Stock A", price=10, stock=3)
+        self.b = Product.objects.create(name="Stock B", price=10, stock=1)
+
+    def test_decrement_is_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = stock.decrement([(self.a.id, 2), (self.b.id, 1)])
+        self.assertTrue(result)
+        self.assertEqual(result.stocks, {self.a.id: 1, self.b.id: 0})
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "catalog_product"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_shortfall_reports_lines_and_changes_nothing(self):
+        result = stock.decrement([(self.a.id, 1), (self.b.id, 2)])
+        self.assertFalse(result)
+        self.assertEqual(
+            result.failures,
+            [{"product_id": self.b.id, "name": "Stock B", "requested": 2, "available": 1}],
+        )
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 3)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.product = Product.objects.create(name="Cached Lamp", price=10, stock=5)
+        self.other = Product.objects.create(name="Other Lamp", price=10, stock=5)
+        Category.objects.create(name="Lamps")
+
+    def _get(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, headers=headers)
+        return response, len(ctx.captured_queries)
+
+    def test_etag_and_last_modified_revalidate_to_304(self):
+        url = f"/api/catalog/products/{self.product.pk}/"
+        first, _ = self._get(url)
+        self.assertEqual(first.status_code, 200)
+        etag, modified = first["ETag"], first["Last-Modified"]
+
+        response, queries = self._get(url, if_none_match=etag)
+        self.assertEqual((response.status_code, queries), (304, 0))
+        self.assertEqual(self._get(url, if_modified_since=modified)[0].status_code, 304)
+
+        time.sleep(1.1)  # Last-Modified has one-second resolution
+        self.product.name = "Renamed Lamp"
+        self.product.save()
+        response, _ = self._get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Renamed Lamp")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self._get(url, if_modified_since=modified)[0].status_code, 200)
+
+    def test_product_write_only_drops_that_product(self):
+        urls = [
+            f"/api/catalog/products/{self.product.pk}/",
+            f"/api/catalog/products/slug/{self.other.slug}/",
+            "/api/catalog/categories/",
+        ]
+        for url in urls:
+            self._get(url)
+
+        self.product.price = 12
+        self.product.save()
+
+        self.assertGreater(self._get(urls[0])[1], 0)
+        self.assertEqual(self._get(urls[1])[1], 0)
+        self.assertEqual(self._get(urls[2])[1], 0)
+
+        Category.objects.create(name="Rugs")
+        response, queries = self._get(urls[2])
+        self.assertGreater(queries, 0)
+        self.assertIn("Rugs", response.content.decode())
+
+    def test_stock_change_keeps_other_cached_responses(self):
+        mine = f"/api/catalog/products/{self.product.pk}/"
+        other = f"/api/catalog/products/{self.other.pk}/"
+        self._get(mine)
+        self._get(other)
+        self._get("/api/catalog/categories/")
+
+        self.assertTrue(stock.decrement([(self.product.pk, 2)]))
+
+        response, queries = self._get(mine)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.json()["stock"], 3)
+        self.assertEqual(self._get(other)[1], 0)
+        self.assertEqual(self._get("/api/catalog/categories/")[1], 0)
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.buyer = User.objects.create_user(email="buyer@example.com", password="x")
+        self.a = Product.objects.create(name="Held A", price=10, stock=5)
+        self.b = Product.objects.create(name="Held B", price=10, stock=1)
+
+    def _order(self):
+        return Order.objects.create(user=self.buyer, shipping_name="n", phone="1", address="a", city="c")
+
+    def test_reserve_holds_stock_and_shortfall_rolls_back(self):
+        first = self._order()
+        self.assertTrue(reservations.reserve(first, [(self.a.pk, 3)]))
+        self.assertEqual(reservations.available_for([self.a.pk, self.b.pk]), {self.a.pk: 2, self.b.pk: 1})
+        self.assertEqual(reservations.with_available(Product.objects.filter(pk=self.a.pk)).get().available_stock, 2)
+
+        second = self._order()
+        result = reservations.reserve(second, [(self.a.pk, 1), (self.b.pk, 1), (self.a.pk, 2)])
+        self.assertFalse(result)
+        self.assertEqual(result.failures, [{"product_id": self.a.pk, "name": "Held A", "requested": 3, "available": 2}])
+        self.assertFalse(StockReservation.objects.filter(order=second).exists())  # all or nothing
+        self.assertEqual(reservations.available_for([self.b.pk]), {self.b.pk: 1})
+
+    def test_stock_guard_keeps_held_quantity_out_of_reach(self):
+        reservations.reserve(self._order(), [(self.a.pk, 3)])
+
+        result = stock.decrement([(self.a.pk, 3)])
+        self.assertFalse(result)
+        self.assertEqual(result.failures[0]["available"], 2)
+        self.assertTrue(stock.decrement([(self.a.pk, 2)]))
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 3)
+
+    def test_expired_holds_stop_counting_and_are_swept(self):
+        stale = timezone.now() - timedelta(minutes=reservations.hold_minutes() + 1)
+        reservations.reserve(self._order(), [(self.a.pk, 4)], now=stale)
+        reservations.reserve(self._order(), [(self.a.pk, 1)])
+
+        self.assertEqual(reservations.available_for([self.a.pk]), {self.a.pk: 4})
+        self.assertEqual(reservations.sweep(), 1)
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+
+    def test_cancel_releases_and_payment_commits(self):
+        cancelled, paid = self._order(), self._order()
+        reservations.reserve(cancelled, [(self.a.pk, 2)])
+        reservations.reserve(paid, [(self.a.pk, 3)])
+
+        OrderStatusHistory.objects.create(order=cancelled, status=Order.Status.CANCELLED)
+        self.assertFalse(StockReservation.objects.filter(order=cancelled).exists())
+
+        self.assertTrue(reservations.commit(paid, [(self.a.pk, 3)]))
+        self.assertFalse(StockReservation.objects.exists())
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 2)
+
+    def test_failed_commit_keeps_the_hold(self):
+        order = self._order()
+        reservations.reserve(order, [(self.b.pk, 1)])
+        Product.objects.filter(pk=self.b.pk).update(stock=0)
+
+        self.assertFalse(reservations.commit(order, [(self.b.pk, 1)]))
+        self.assertTrue(StockReservation.objects.filter(order=order).exists())
+
+    def test_cached_detail_does_not_outlive_a_hold(self):
+        url = f"/api/catalog/products/{self.a.pk}/"
+        self.assertEqual(self.client.get(url).json()["availableStock"], 5)
+
+        # hold that runs out in about a second
+        almost = timezone.now() - timedelta(minutes=reservations.hold_minutes()) + timedelta(seconds=1.5)
+        reservations.reserve(self._order(), [(self.a.pk, 2)], now=almost)
+        self.assertEqual(self.client.get(url).json()["availableStock"], 3)
+
+        time.sleep(1.6)
+        self.assertEqual(self.client.get(url).json()["availableStock"], 5)
+
+
+class EffectivePriceTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.plain = Product.objects.create(name="Plain", price=40, stock=1)
+        self.sale = Product.objects.create(
+            name="Sale", price=100, stock=1, discount_type=pricing.PERCENT, discount_value=75
+        )
+        self.later = Product.objects.create(
+            name="Later", price=50, stock=1, discount_type=pricing.FIXED, discount_value=20,
+            discount_start=timezone.now() + timedelta(hours=1),
+        )
+
+    def _titles(self, query):
+        return [p["title"] for p in self.client.get(f"/api/catalog/products/?{query}").json()["results"]]
+
+    def test_price_range_filters_on_the_discounted_price(self):
+        self.assertEqual(self._titles("min_price=30&max_price=45&ordering=price"), ["Plain"])
+        self.assertEqual(self._titles("max_price=30"), ["Sale"])  # 100 at 75% off
+
+    def test_non_numeric_price_params_are_ignored(self):
+        for value in ("nan", "NaN", "inf", "-Infinity", "abc"):
+            response = self.client.get(f"/api/catalog/products/?min_price={value}")
+            self.assertEqual(response.status_code, 200, value)
+            self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_ordering_by_effective_price(self):
+        self.assertEqual(self._titles("ordering=effective_price"), ["Sale", "Plain", "Later"])
+        self.assertEqual(self._titles("ordering=-effective_price"), ["Later", "Plain", "Sale"])
+
+    def test_refresh_due_flips_products_at_the_boundary(self):
+        self.assertEqual(pricing.refresh_due(), 0)
+
+        detail = f"/api/catalog/products/{self.later.pk}/"
+        other = f"/api/catalog/products/{self.plain.pk}/"
+        self.assertFalse(self.client.get(detail).json()["hasDiscount"])
+        self.client.get(other)
+
+        self.assertEqual(pricing.next_boundary(), self.later.discount_start)
+        self.assertEqual(pricing.refresh_due(now=self.later.discount_start + timedelta(seconds=1)), 1)
+
+        self.later.refresh_from_db()
+        self.assertTrue(self.later.is_discount_active)
+        self.assertEqual(self.later.effective_price, Decimal("30.00"))
+        self.assertTrue(self.client.get(detail).json()["hasDiscount"])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(other)
+        self.assertEqual(len(ctx.captured_queries), 0)  # untouched product stays cached
+
+    def test_refresh_due_skips_discounts_that_can_never_be_live(self):
+        Product.objects.create(name="Blank", price=10, stock=1, discount_type="", discount_value=5)
+        Product.objects.create(
+            name="Overflow", price=10, stock=1, discount_type=pricing.PERCENT, discount_value=150
+        )
+        self.assertFalse(Product.objects.filter(pricing.stale_q(timezone.now())).exists())
+        self.assertEqual(pricing.refresh_due(), 0)
+
+        # a stored flag left on by a bulk update is still flipped off, once
+        Product.objects.filter(name="Overflow").update(is_discount_active=True)
+        self.assertEqual(pricing.refresh_due(), 1)
+        self.assertEqual(pricing.refresh_due(), 0)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.brand_only = Product.objects.create(name="Linen Trousers", brand="Shirtworks", price=10, stock=1)
+        self.by_name = Product.objects.create(name="Oxford Shirt", price=10, stock=1)
+        self.other = Product.objects.create(name="Wool Socks", price=10, stock=1)
+
+    def _search(self, query):
+        return self.client.get(f"/api/catalog/products/?{query}").json()
+
+    def test_prefix_match_on_every_term(self):
+        titles = [p["title"] for p in self._search("q=shir")["results"]]
+        self.assertCountEqual(titles, ["Oxford Shirt", "Linen Trousers"])
+        self.assertEqual([p["title"] for p in self._search("q=oxf+shi")["results"]], ["Oxford Shirt"])
+        self.assertEqual(self._search("q=shirtless")["results"], [])
+
+    def test_name_matches_rank_above_brand_matches(self):
+        self.assertEqual(
+            [p["title"] for p in self._search("q=shirt")["results"]], ["Oxford Shirt", "Linen Trousers"]
+        )
+
+    def test_every_match_is_counted_and_paged(self):
+        for i in range(5):
+            Product.objects.create(name=f"Plain Shirt {i}", price=10, stock=1)
+
+        first = self._search("q=shirt&page_size=3")
+        self.assertEqual(first["count"], 7)
+        seen = [p["id"] for p in first["results"]]
+        for page in (2, 3):
+            seen += [p["id"] for p in self._search(f"q=shirt&page_size=3&page={page}")["results"]]
+        self.assertEqual(len(set(seen)), 7)
+
+        cursor = self._search("q=shirt&page_size=3&cursor=")
+        cursor_ids = [p["id"] for p in cursor["results"]]
+        while cursor["next"]:
+            cursor = self.client.get(cursor["next"]).json()
+            cursor_ids += [p["id"] for p in cursor["results"]]
+        self.assertEqual(cursor_ids, seen)
+
+    def test_icontains_fallback_without_an_index(self):
+        with mock.patch.object(search, "is_supported", return_value=False):
+            titles = [p["title"] for p in self._search("q=irt")["results"]]
+        self.assertCountEqual(titles, ["Oxford Shirt", "Linen Trousers"])
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.home = Category.objects.create(name="Home")
+        self.lamp = Product.objects.create(
+            name="Lamp", brand="Acme", price=1500, stock=2, tags=["Home", "Light"], category=self.home
+        )
+        self.rug = Product.objects.create(
+            name="Rug", brand="Weave", price=100, stock=0, tags=["home"], category=self.home,
+            discount_type=pricing.PERCENT, discount_value=10,
+        )
+        self.vase = Product.objects.create(name="Vase", brand="Acme", price=30, stock=4, tags=["decor"])
+
+    def _counts(self):
+        return sorted(FacetCount.objects.filter(count__gt=0).values_list("scope", "facet", "value", "count"))
+
+    def _assert_matches_rebuild(self):
+        maintained = self._counts()
+        facets.rebuild()
+        self.assertEqual(maintained, self._counts())
+
+    def test_counts_follow_writes_like_a_rebuild(self):
+        self._assert_matches_rebuild()
+        self.assertIn(("c:%d" % self.home.pk, "tag", "home", 2), self._counts())
+
+        self.lamp.brand, self.lamp.tags, self.lamp.price = "Other", ["light"], 20
+        self.lamp.save()
+        self._assert_matches_rebuild()
+
+        partial = Product.objects.only("id", "stock").get(pk=self.rug.pk)
+        partial.stock = 3
+        partial.save(update_fields=["stock"])
+        self._assert_matches_rebuild()
+
+        self.assertTrue(stock.decrement([(self.vase.pk, 4)]))  # crosses zero: leaves in_stock
+        self._assert_matches_rebuild()
+
+        self.lamp.is_active = False
+        self.lamp.save()
+        self._assert_matches_rebuild()
+
+        self.rug.delete()
+        self._assert_matches_rebuild()
+        self.assertNotIn("Weave", [v for _, f, v, _ in self._counts() if f == "brand"])
+
+    def _titles(self, query):
+        return sorted(p["title"] for p in self.client.get(f"/api/catalog/products/?{query}").json()["results"])
+
+    def test_facet_params_narrow_the_list(self):
+        self.assertEqual(self._titles("brand=acme"), ["Lamp", "Vase"])
+        self.assertEqual(self._titles("brand=Weave&brand=acme"), ["Lamp", "Rug", "Vase"])
+        self.assertEqual(self._titles("price_range=0-1000"), ["Rug", "Vase"])
+        self.assertEqual(self._titles("price_range=1000-5000&price_range=50000%2B"), ["Lamp"])
+        self.assertEqual(self._titles("in_stock=1"), ["Lamp", "Vase"])
+        self.assertEqual(self._titles("on_discount=true"), ["Rug"])
+        self.assertEqual(self._titles("tag=HOME&tag=decor"), ["Lamp", "Rug", "Vase"])
+        self.assertEqual(self._titles("tag=home&tag=light&tag_mode=all"), ["Lamp"])
+        self.assertEqual(self._titles("category=%s&in_stock=1&brand=acme" % self.home.slug), ["Lamp"])
+
+        sidebar = self.client.get(f"/api/catalog/products/?facets=1&category={self.home.slug}").json()["facets"]
+        self.assertEqual(sidebar["brand"], [{"value": "Acme", "count": 1}, {"value": "Weave", "count": 1}])
+        self.assertEqual(sidebar["tag"][0], {"value": "home", "count": 2})
+
+
+class HybridPaginationTests(TestCase):
+    URL = "/api/catalog/products/"
+
+    def setUp(self):
+        for i in range(7):
+            Product.objects.create(name=f"Item {i}", price=10 + i % 3, stock=1, shuffle_rank=100 - 10 * i)
+        self.ids = list(Product.objects.order_by("shuffle_rank", "id").values_list("id", flat=True))
+
+    def _get(self, query):
+        response = self.client.get(f"{self.URL}?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _walk(self, data):
+        ids = [p["id"] for p in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            ids += [p["id"] for p in data["results"]]
+        return ids, data
+
+    def test_page_numbers_by_default(self):
+        first = self._get("page_size=3")
+        self.assertEqual(list(first), ["count", "next", "previous", "results"])
+        self.assertEqual((first["count"], first["previous"]), (7, None))
+        ids, last = self._walk(first)
+        self.assertEqual(ids, self.ids)
+        self.assertIn("page=2", last["previous"])
+        self.assertEqual(self.client.get(f"{self.URL}?page_size=3&page=9").status_code, 404)
+
+    def test_count_false_skips_the_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            first = self._get("page_size=3&count=false")
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+        self.assertEqual(list(first), ["count", "next", "previous", "results"])
+        self.assertIsNone(first["count"])
+
+        ids, last = self._walk(first)
+        self.assertEqual(ids, self.ids)
+        self.assertIsNone(last["next"])
+        self.assertEqual(len(last["results"]), 1)
+
+    def test_cursor_pages_have_no_gaps_or_duplicates(self):
+        first = self._get("page_size=3&cursor=")
+        self.assertEqual(list(first), ["next", "previous", "results"])
+        ids, last = self._walk(first)
+        self.assertEqual(ids, self.ids)
+        self.assertIsNone(last["next"])
+
+        back = self.client.get(last["previous"]).json()
+        self.assertEqual([p["id"] for p in back["results"]], self.ids[3:6])
+
+        by_price, _ = self._walk(self._get("page_size=2&cursor=&ordering=-price"))
+        expected = [p.id for p in Product.objects.order_by("-price", "-id")]
+        self.assertEqual(by_price, expected)
+
+        # a product added ahead of the cursor doesn't shift the next page
+        Product.objects.create(name="Late", price=1, stock=1, shuffle_rank=0)
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([p["id"] for p in second["results"]], self.ids[3:6])
+
+        self.assertEqual(self.client.get(f"{self.URL}?cursor=not-a-cursor").status_code, 404)
+
+
+class CategoryTreeTests(TestCase):
+    URL = "/api/catalog/tree/"
+
+    def setUp(self):
+        caches["default"].clear()
+        tree._built.update(version=None, tree=None)
+        self.home = Category.objects.create(name="Home")
+
+    def _get(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.URL, headers=headers)
+        return response, len(ctx.captured_queries)
+
+    def test_reads_between_bumps_are_query_free_and_revalidate(self):
+        first, queries = self._get()
+        self.assertGreater(queries, 0)
+        self.assertEqual([c["name"] for c in first.json()], ["Home"])
+
+        again, queries = self._get()
+        self.assertEqual((again.json(), again["ETag"], queries), (first.json(), first["ETag"], 0))
+        response, queries = self._get(if_none_match=first["ETag"])
+        self.assertEqual((response.status_code, queries), (304, 0))
+
+    def test_category_and_product_writes_rebuild_the_tree(self):
+        etag = self._get()[0]["ETag"]
+        version = tree.get_version()
+
+        Category.objects.create(name="Garden")
+        self.assertGreater(tree.get_version(), version)  # shared stamp: every process rebuilds
+        response, queries = self._get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertEqual([c["name"] for c in response.json()], ["Garden", "Home"])
+        etag = response["ETag"]
+
+        lamp = Product.objects.create(name="Lamp", price=10, stock=1, category=self.home)
+        response = self._get(if_none_match=etag)[0]
+        self.assertEqual(response.json()[1]["productCount"], 1)
+        etag = response["ETag"]
+
+        lamp.stock = 0  # doesn't move it in the tree
+        lamp.save()
+        self.assertEqual(self._get(if_none_match=etag)[0].status_code, 304)
+
+        Category.objects.filter(name="Garden").get().delete()
+        response = self._get(if_none_match=etag)[0]
+        self.assertEqual([c["name"] for c in response.json()], ["Home"])
+        self.assertEqual(tree.get_tree()[0], tree._built["version"])
+
+    def test_only_vendor_activation_changes_bump_the_tree(self):
+        User.objects.create_user(email="v@example.com", password="x", role="vendor")
+        vendor = User.objects.get(email="v@example.com")
+        version = tree.get_version()
+
+        vendor.first_name = "Vera"
+        vendor.save()
+        vendor.last_login = timezone.now()
+        vendor.save()
+        self.assertEqual(tree.get_version(), version)
+
+        vendor.is_active = False
+        vendor.save()
+        self.assertGreater(tree.get_version(), version)
+        version = tree.get_version()
+
+        vendor.save()
+        self.assertEqual(tree.get_version(), version)
+
+        partial = User.objects.only("id", "role").get(pk=vendor.pk)
+        partial.is_active = True
+        partial.save()  # is_active wasn't loaded: compared against the stored row
+        self.assertGreater(tree.get_version(), version)
+        version = tree.get_version()
+
+        partial = User.objects.only("id", "role").get(pk=vendor.pk)
+        partial.is_active = True
+        partial.save()
+        self.assertEqual(tree.get_version(), version)
+
+
+class ProductTagIndexTests(TestCase):
+    def setUp(self):
+        self.red = Product.objects.create(name="Red Shirt", price=10, stock=1, tags=["Red", " shirt "])
+        self.blue = Product.objects.create(name="Blue Shirt", price=10, stock=1, tags=["blue", "SHIRT"])
+        self.mug = Product.objects.create(name="Red Mug", price=10, stock=1, tags=["red", "", "kitchen"])
+
+    def _index(self):
+        return sorted(ProductTag.objects.values_list("product_id", "tag"))
+
+    def _names(self, tag_list, mode):
+        return sorted(tags.filter_by_tags(Product.objects.all(), tag_list, mode=mode).values_list("name", flat=True))
+
+    def test_any_and_all_matching(self):
+        self.assertEqual(self._names(["RED"], "any"), ["Red Mug", "Red Shirt"])
+        self.assertEqual(self._names(["red", "blue"], "any"), ["Blue Shirt", "Red Mug", "Red Shirt"])
+        self.assertEqual(self._names(["red", "shirt"], "all"), ["Red Shirt"])
+        self.assertEqual(self._names(["red", "Red ", "shirt"], "all"), ["Red Shirt"])  # duplicates count once
+        self.assertEqual(self._names(["red", "missing"], "all"), [])
+        self.assertEqual(len(self._names(["", "  "], "all")), 3)  # no usable tag: no filter
+        self.assertEqual(tags.mode_param({"tag_mode": " ALL "}), "all")
+        self.assertEqual(tags.mode_param({}), "any")
+
+    def test_index_follows_saves_and_backfill_reproduces_it(self):
+        self.red.tags = ["red", "sale"]
+        self.red.save()
+        self.blue.name = "Navy Shirt"
+        self.blue.save(update_fields=["name"])
+        maintained = self._index()
+        self.assertIn((self.red.pk, "sale"), maintained)
+        self.assertNotIn((self.red.pk, "shirt"), maintained)
+
+        ProductTag.objects.all().delete()
+        ProductTag.objects.create(product=self.mug, tag="stale")
+        out = io.StringIO()
+        call_command("backfill_product_tags", "--batch-size", "2", stdout=out)
+        self.assertEqual(self._index(), maintained)
+        self.assertIn(f"Indexed {len(maintained)} product tag(s).", out.getvalue())
+
+
+class ShuffledFeedTests(TestCase):
+    URL = "/api/catalog/products/"
+
+    def setUp(self):
+        for i in range(12):
+            Product.objects.create(name=f"Item {i}", price=10, stock=1)
+
+    def _feed(self, page_size=5):
+        ids, url = [], f"{self.URL}?page_size={page_size}"
+        while url:
+            data = self.client.get(url).json()
+            ids += [p["id"] for p in data["results"]]
+            url = data["next"]
+        return ids
+
+    def test_feed_is_stable_across_pages_until_reshuffled(self):
+        feed = self._feed()
+        self.assertEqual(sorted(feed), sorted(Product.objects.values_list("id", flat=True)))
+        self.assertEqual(feed, list(Product.objects.order_by("shuffle_rank", "id").values_list("id", flat=True)))
+        self.assertEqual(self._feed(page_size=4), feed)  # same order whatever the page size
+
+        call_command("reshuffle_products", "--seed", "7", "--batch-size", "5", stdout=io.StringIO())
+        reshuffled = self._feed()
+        self.assertNotEqual(reshuffled, feed)
+        self.assertEqual(sorted(reshuffled), sorted(feed))
+        self.assertEqual(self._feed(page_size=4), reshuffled)
+
+        call_command("reshuffle_products", "--seed", "7", stdout=io.StringIO())
+        self.assertEqual(self._feed(), reshuffled)  # a seed reproduces the shuffle
 
-# Create your tests here.
+    def test_category_listing_keeps_newest_first(self):
+        home = Category.objects.create(name="Home")
+        Product.objects.update(category=home)
+        ids = [p["id"] for p in self.client.get(f"{self.URL}?category={home.slug}&page_size=50").json()["results"]]
+        self.assertEqual(ids, list(Product.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
@@ -0,0 +1,96 @@
+"""
+Nested category -> subcategory tree with product counts (/api/catalog/tree/).
+
+Each process keeps the last built tree in memory together with the version
+stamp it was built from. The stamp lives in the shared Django cache, so a
+bump from any process (see catalog.signals) makes every process rebuild on
+its next request. Reads between bumps cost one cache get and no queries.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+VERSION_KEY = "catalog:tree:version"
+
+_lock = threading.Lock()
+_built = {"version": None, "tree": None}
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def get_version():
+    c = _cache()
+    version = c.get(VERSION_KEY)
+    if version is None:
+        c.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = c.get(VERSION_KEY)
+    return version
+
+
+def bump(**kwargs):
+    """
+    Mark the tree stale in every process (usable directly as a signal receiver).
+    """
+    c = _cache()
+    try:
+        c.incr(VERSION_KEY)
+    except ValueError:
+        c.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def build():
+    """
+    Query the visible categories / subcategories and active product counts.
+    """
+    from .models import Category, SubCategory, Product
+
+    visible = Q(is_active=True) & (Q(vendor__isnull=True) | Q(vendor__is_active=True))
+
+    active = Product.objects.filter(is_active=True)
+    by_category = dict(active.values_list("category_id").annotate(n=Count("id")))
+    by_subcategory = dict(
+        active.filter(subcategory__isnull=False).values_list("subcategory_id").annotate(n=Count("id"))
+    )
+
+    tree = []
+    nodes = {}
+    for c in Category.objects.filter(visible).order_by("sort_order", "name").values("id", "name", "slug"):
+        node = {**c, "productCount": by_category.get(c["id"], 0), "subcategories": []}
+        nodes[c["id"]] = node
+        tree.append(node)
+
+    subs = (
+        SubCategory.objects.filter(visible, category_id__in=nodes.keys())
+        .order_by("sort_order", "name")
+        .values("id", "category_id", "name", "slug")
+    )
+    for s in subs:
+        nodes[s["category_id"]]["subcategories"].append({
+            "id": s["id"],
+            "categoryId": s["category_id"],
+            "name": s["name"],
+            "slug": s["slug"],
+            "productCount": by_subcategory.get(s["id"], 0),
+        })
+
+    return tree
+
+
+def get_tree():
+    """
+    (version, tree) - rebuilt only when the shared version moved.
+    """
+    version = get_version()
+    if _built["version"] == version:
+        return version, _built["tree"]
+
+    with _lock:
+        if _built["version"] != version:
+            _built["tree"] = build()
+            _built["version"] = version
+        return version, _built["tree"]
@@ -7,6 +7,8 @@ from .views import (
     ProductDetailByIdView,
     CategoryListView,
     SubCategoryListView,
+    PopularTagsView,
+    CategoryTreeView,
 )
 
 # Vendor views
@@ -30,6 +32,8 @@ urlpatterns = [
     path("products/slug/<slug:slug>/", ProductDetailView.as_view()),
     path("categories/", CategoryListView.as_view()),
     path("subcategories/", SubCategoryListView.as_view()),
+    path("tags/popular/", PopularTagsView.as_view()),
+    path("tree/", CategoryTreeView.as_view()),
 
     # =====================
     # Vendor
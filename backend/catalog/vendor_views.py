@@ -4,7 +4,9 @@ from rest_framework.views import APIView
 
 from admin_api.permissions import RequireVendor
 
-from .models import Product, Category, SubCategory, ProductImage
+from . import cache
+
+from .models import Product, Category, SubCategory, ProductImage, ordered_images_prefetch
 from .serializers import (
     VendorProductWriteSerializer,
     ProductSerializer,
@@ -26,7 +28,7 @@ class VendorProductListCreateView(generics.ListCreateAPIView):
         return Product.objects.filter(
             vendor_id=self.request.user.id,
             is_active=True
-        ).order_by("-id")
+        ).prefetch_related(ordered_images_prefetch()).order_by("-id")
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -155,6 +157,7 @@ class VendorProductImageReorderView(APIView):
             img.sort_order = id_to_idx.get(img.id, 0)
 
         ProductImage.objects.bulk_update(imgs, ["sort_order"])
+        cache.invalidate_products([product.id])  # bulk_update sends no post_save
         return Response({"detail": "Reordered."}, status=200)
 
 
@@ -1,9 +1,17 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import generics, filters
 from rest_framework.permissions import AllowAny
-from django.db.models.functions import Random
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.utils import timezone
+from django.utils.http import quote_etag
 from django.db.models import Q
 
-from .models import Product, Category, SubCategory
+from .models import Product, Category, SubCategory, ordered_images_prefetch
+from . import cache, facets, reservations, search, tags, tree
+from .admin_views import parse_bool
+from .cache import CachedResponseMixin
 from .serializers import (
     ProductSerializer,
     VendorProductWriteSerializer,
@@ -14,6 +22,30 @@ from .serializers import (
 )
 
 from admin_api.permissions import RequireVendor
+from core.pagination import HybridPagination
+
+
+def facet_scopes(request):
+    # FacetCount scopes for the ?category= / ?subcategory= slug in the request
+    params = request.query_params
+    if params.get("subcategory"):
+        ids = SubCategory.objects.filter(slug=params["subcategory"]).values_list("id", flat=True)
+        return [f"s:{i}" for i in ids]
+    if params.get("category"):
+        ids = Category.objects.filter(slug=params["category"]).values_list("id", flat=True)
+        return [f"c:{i}" for i in ids]
+    return ["all"]
+
+
+def _parse_decimal(val):
+    if val in (None, ""):
+        return None
+    try:
+        d = Decimal(str(val).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    # NaN / Infinity parse fine but can't be compared against a column
+    return d if d.is_finite() else None
 
 
 # ======================
@@ -23,12 +55,69 @@ from admin_api.permissions import RequireVendor
 class ProductListView(generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["name", "brand", "slug", "sku"]
-    ordering_fields = ["price", "created_at"]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["price", "effective_price", "created_at"]
+    pagination_class = HybridPagination
+
+    def _search_query(self):
+        return (
+            self.request.query_params.get("q")
+            or self.request.query_params.get("search")
+            or ""
+        ).strip()
+
+    def get_cursor_ordering(self):
+        # Same order as get_queryset, in a form ?cursor= can seek on
+        params = self.request.query_params
+        if self._search_query():
+            return ("search_rank", "id")
+        if params.get("category") or params.get("subcategory"):
+            return ("-created_at", "-id")
+        return ("shuffle_rank", "id")
+
+    def _apply_facet_filters(self, qs):
+        """
+        Sidebar facets. Repeat a param to OR values (?brand=a&brand=b).
+        """
+        params = self.request.query_params
+
+        brands = [b.strip() for b in params.getlist("brand") if b.strip()]
+        if brands:
+            q = Q()
+            for b in brands:
+                q |= Q(brand__iexact=b)
+            qs = qs.filter(q)
+
+        buckets = [facets.price_bucket_q(k) for k in params.getlist("price_range")]
+        buckets = [b for b in buckets if b is not None]
+        if buckets:
+            q = Q()
+            for b in buckets:
+                q |= b
+            qs = qs.filter(q)
+
+        if parse_bool(params.get("in_stock")):
+            qs = qs.filter(stock__gt=0)
+        if parse_bool(params.get("on_discount")):
+            qs = qs.filter(is_discount_active=True)
+
+        # ?tag=a&tag=b matches any tag; add ?tag_mode=all to require every one
+        qs = tags.filter_by_tags(qs, params.getlist("tag"), mode=tags.mode_param(params))
+
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        # ✅ ?facets=1 adds sidebar counts (read from FacetCount, no GROUP BY on products)
+        if parse_bool(request.query_params.get("facets")) and isinstance(response.data, dict):
+            response.data["facets"] = facets.counts_for_scopes(facet_scopes(request))
+        return response
 
     def get_queryset(self):
-        qs = Product.objects.filter(is_active=True)
+        qs = reservations.with_available(
+            Product.objects.filter(is_active=True).prefetch_related(ordered_images_prefetch())
+        )
 
         category = self.request.query_params.get("category")
         subcategory = self.request.query_params.get("subcategory")
@@ -38,26 +127,65 @@ class ProductListView(generics.ListAPIView):
         if subcategory:
             qs = qs.filter(subcategory__slug=subcategory)
 
-        return qs.order_by(Random() if not category and not subcategory else "-created_at")
+        # ✅ Price range on the price customers actually pay
+        min_price = _parse_decimal(self.request.query_params.get("min_price"))
+        max_price = _parse_decimal(self.request.query_params.get("max_price"))
+        if min_price is not None:
+            qs = qs.filter(effective_price__gte=min_price)
+        if max_price is not None:
+            qs = qs.filter(effective_price__lte=max_price)
+
+        qs = self._apply_facet_filters(qs)
+
+        # ✅ Full-text search (?q=, ?search= kept for older clients), ranked by relevance
+        query = self._search_query()
+        if query:
+            return search.search_products(qs, query)
 
+        # ✅ Default feed is "shuffled": ordered by a precomputed random rank
+        # (see `manage.py reshuffle_products`) so it stays an index scan and
+        # pages don't repeat each other between reshuffles.
+        if not category and not subcategory:
+            return qs.order_by("shuffle_rank", "id")
+        return qs.order_by("-created_at", "-id")  # total order: pages never overlap
 
-class ProductDetailView(generics.RetrieveAPIView):
+
+class ProductDetailView(CachedResponseMixin, generics.RetrieveAPIView):
     permission_classes = [AllowAny]
-    queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     lookup_field = "slug"
 
+    def get_queryset(self):
+        # ✅ availableStock = stock - active reservations
+        return reservations.with_available(
+            Product.objects.filter(is_active=True).prefetch_related(ordered_images_prefetch())
+        )
+
+    def get_cache_resources(self):
+        # Cached until this product (its stock, holds or images) changes
+        pk = Product.objects.filter(slug=self.kwargs["slug"]).values_list("pk", flat=True).first()
+        return [cache.product(pk)] if pk else []
 
-class ProductDetailByIdView(generics.RetrieveAPIView):
-    permission_classes = [AllowAny]
-    queryset = Product.objects.filter(is_active=True)
-    serializer_class = ProductSerializer
+    def get_cache_timeout(self, data):
+        # availableStock changes when the earliest hold runs out: don't cache past it
+        timeout = super().get_cache_timeout(data)
+        expiry = reservations.next_expiry(data.get("id"))
+        if expiry is not None:
+            timeout = min(timeout, int((expiry - timezone.now()).total_seconds()))
+        return timeout
+
+
+class ProductDetailByIdView(ProductDetailView):
     lookup_field = "pk"
 
+    def get_cache_resources(self):
+        return [cache.product(self.kwargs["pk"])]
+
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedResponseMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = CategorySerializer
+    cache_resources = [cache.CATEGORIES]
 
     def get_queryset(self):
         # ✅ Show admin/global categories + vendor categories
@@ -70,9 +198,10 @@ class CategoryListView(generics.ListAPIView):
         )
 
 
-class SubCategoryListView(generics.ListAPIView):
+class SubCategoryListView(CachedResponseMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = SubCategorySerializer
+    cache_resources = [cache.CATEGORIES]
 
     def get_queryset(self):
         # ✅ Same rule for subcategories
@@ -83,6 +212,43 @@ class SubCategoryListView(generics.ListAPIView):
         )
 
 
+class PopularTagsView(CachedResponseMixin, generics.ListAPIView):
+    """
+    Most used tags among active products, read from the maintained
+    FacetCount rows (?category= / ?subcategory= slug narrows the scope).
+    """
+    permission_classes = [AllowAny]
+    pagination_class = None
+    cache_resources = [cache.FACETS, cache.CATEGORIES]  # ?category= slugs -> scopes
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+        except (TypeError, ValueError):
+            limit = 20
+        rows = facets.counts_for_scopes(facet_scopes(request), only=[facets.TAG])[facets.TAG]
+        return Response({"results": rows[:limit]})
+
+
+class CategoryTreeView(APIView):
+    """
+    Whole category -> subcategory tree with active product counts.
+    Served from the per-process copy in catalog/tree.py.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        version, data = tree.get_tree()
+        etag = quote_etag(f"tree-{version}")
+        if request.headers.get("If-None-Match") == etag:
+            response = Response(status=304)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, max-age=0, must-revalidate"
+        return response
+
+
 # ======================
 # VENDOR VIEWS (FIXED, minimal)
 # NOTE: Your urls.py uses vendor_views.py already,
@@ -94,7 +260,11 @@ class VendorProductListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # ✅ ONLY this vendor's active products
-        return Product.objects.filter(vendor=self.request.user, is_active=True).order_by("-id")
+        return (
+            Product.objects.filter(vendor=self.request.user, is_active=True)
+            .prefetch_related(ordered_images_prefetch())
+            .order_by("-id")
+        )
 
     def get_serializer_class(self):
         return VendorProductWriteSerializer if self.request.method == "POST" else ProductSerializer
@@ -0,0 +1,103 @@
+"""
+Single-pass conditional aggregation for dashboard / analytics endpoints.
+
+Instead of one query per number, an endpoint declares its numbers as
+Metrics -- what to aggregate, over which time Window, with which extra
+filter -- and `evaluate` turns the whole spec into ONE query of
+`Sum(..., filter=Q(...))` / `Count(..., filter=Q(...))` expressions:
+
+    windows = {"today": Window("day", today, tomorrow)}
+    spec = [
+        Metric("orders", "sum", "orders", window="today"),
+        Metric("paid", "sum", "revenue", window="today", filter=Q(payment_status="paid")),
+    ]
+    totals = evaluate(DailySalesRollup.objects.all(), spec, windows)
+
+With `group_by` the same query is grouped (e.g. a daily breakdown) and
+the totals are added up from the groups, still in one round trip; only
+additive aggregates (sum / count) are supported for that reason.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q, Sum
+
+AGGREGATES = {"sum": Sum, "count": Count}
+
+
+class Window:
+    """
+    Half-open [start, end) range on `field`; either side may be None.
+    """
+
+    def __init__(self, field, start=None, end=None):
+        self.field = field
+        self.start = start
+        self.end = end
+
+    def q(self):
+        q = Q()
+        if self.start is not None:
+            q &= Q(**{f"{self.field}__gte": self.start})
+        if self.end is not None:
+            q &= Q(**{f"{self.field}__lt": self.end})
+        return q
+
+
+class Metric:
+    """
+    One number: `aggregate` ("sum" | "count") of `field`, restricted to the
+    named window (None = all rows) and to `filter` (a Q, optional).
+    """
+
+    def __init__(self, name, aggregate, field="id", window=None, filter=None):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {aggregate!r}")
+        self.name = name
+        self.aggregate = aggregate
+        self.field = field
+        self.window = window
+        self.filter = filter
+
+    def expression(self, windows):
+        cond = Q()
+        if self.window is not None:
+            cond &= windows[self.window].q()
+        if self.filter is not None:
+            cond &= self.filter
+        return AGGREGATES[self.aggregate](self.field, filter=cond or None)
+
+
+def _scope(metrics, windows):
+    # Rows any metric can see: the union of the windows (all rows if one has none)
+    if any(m.window is None for m in metrics):
+        return Q()
+    return reduce(or_, (windows[name].q() for name in {m.window for m in metrics}))
+
+
+def _zero(value):
+    return value if value is not None else 0
+
+
+def evaluate(queryset, metrics, windows=None, group_by=None):
+    """
+    Compute every metric in one query.
+
+    Returns {name: value} (empty sums are 0), or with `group_by` a pair
+    (totals, rows): rows are dicts of the group_by fields plus every
+    metric, ordered by the group_by fields.
+    """
+    windows = windows or {}
+    qs = queryset.filter(_scope(metrics, windows))
+    exprs = {m.name: m.expression(windows) for m in metrics}
+
+    if not group_by:
+        return {name: _zero(value) for name, value in qs.aggregate(**exprs).items()}
+
+    rows = list(qs.values(*group_by).annotate(**exprs).order_by(*group_by))
+    totals = {m.name: 0 for m in metrics}
+    for row in rows:
+        for name in totals:
+            row[name] = _zero(row[name])
+            totals[name] += row[name]
+    return totals, rows
@@ -0,0 +1,222 @@
+"""
+Shared outbound mail dispatcher.
+
+Every email (OTP, password reset, order outbox) goes through one
+per-process `dispatcher`:
+
+- a background thread sends queued messages in batches
+  (MAIL_BATCH_SIZE, waiting at most MAIL_BATCH_WAIT_SECONDS to fill one)
+- over ONE long-lived backend connection, so the SMTP + TLS handshake is
+  paid once instead of per message. The connection is re-opened after
+  MAIL_IDLE_SECONDS without use (servers drop idle sessions) or when a
+  send fails on it.
+- `dispatcher.stats()` reports throughput / latency counters. They are
+  per process (GET /api/admin/mail/stats/ shows the web worker that
+  answered, tagged with its pid); failed sends are also logged.
+
+    dispatcher.submit(msg)  # fire and forget, returns a Future
+    dispatcher.send(msg)    # wait for the result, raises on failure
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class MailStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.sent = 0
+            self.failed = 0
+            self.batches = 0
+            self.connections_opened = 0
+            self.total_latency = 0.0  # submit -> delivered, seconds
+            self.max_latency = 0.0
+            self.total_send_time = 0.0  # time spent talking to the server
+
+    def record(self, ok, latency, send_time):
+        with self._lock:
+            if ok:
+                self.sent += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            else:
+                self.failed += 1
+            self.total_send_time += send_time
+
+    def incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            sent = self.sent
+            return {
+                "sent": sent,
+                "failed": self.failed,
+                "batches": self.batches,
+                "connectionsOpened": self.connections_opened,
+                "uptimeSeconds": round(uptime, 1),
+                "throughputPerMinute": round(sent * 60 / uptime, 2),
+                "avgLatencyMs": round(self.total_latency * 1000 / sent, 1) if sent else None,
+                "maxLatencyMs": round(self.max_latency * 1000, 1),
+                "avgSendMs": round(self.total_send_time * 1000 / (sent + self.failed), 1)
+                if (sent + self.failed) else None,
+            }
+
+
+class MailDispatcher:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+        self._last_used = 0.0
+        self._stats = MailStats()
+
+    # ---------- public API ----------
+    def submit(self, message):
+        """
+        Queue an EmailMessage; returns a Future resolved once it was sent.
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((message, future, time.monotonic()))
+        return future
+
+    def send(self, message, timeout=None):
+        """
+        Queue and wait (raises the send error, like message.send()).
+        """
+        timeout = timeout or _setting("MAIL_SEND_TIMEOUT", 30)
+        return self.submit(message).result(timeout=timeout)
+
+    def stats(self):
+        data = self._stats.snapshot()
+        data["queued"] = self._queue.qsize()
+        # counters live in memory: each worker process has its own
+        data["scope"] = "process"
+        data["pid"] = os.getpid()
+        return data
+
+    def flush(self, timeout=10):
+        """
+        Wait until everything queued so far has been handed to the server.
+        """
+        marker = Future()
+        if self._thread is None:
+            return True
+        self._queue.put((None, marker, time.monotonic()))
+        try:
+            marker.result(timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # forked (e.g. gunicorn preload): the parent's connection/queue aren't ours
+                self._queue = queue.Queue()
+                self._conn = None
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + _setting("MAIL_BATCH_WAIT_SECONDS", 0.05)
+            while len(batch) < _setting("MAIL_BATCH_SIZE", 50):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._send_batch(batch)
+
+    def _connection(self):
+        if self._conn is not None and time.monotonic() - self._last_used > _setting("MAIL_IDLE_SECONDS", 60):
+            self._close()
+        if self._conn is None:
+            conn = get_connection(fail_silently=False)
+            conn.open()
+            self._conn = conn
+            self._last_used = time.monotonic()
+            self._stats.incr("connections_opened")
+        return self._conn
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _deliver(self, message):
+        # One retry on a fresh connection: the pooled one may have been dropped
+        for attempt in (1, 2):
+            try:
+                self._connection().send_messages([message])
+                self._last_used = time.monotonic()
+                return
+            except Exception:
+                self._close()
+                if attempt == 2:
+                    raise
+
+    def _send_batch(self, batch):
+        self._stats.incr("batches")
+        for message, future, queued_at in batch:
+            if message is None:  # flush() marker
+                future.set_result(True)
+                continue
+
+            started = time.monotonic()
+            try:
+                self._deliver(message)
+            except Exception as e:
+                logger.warning("Mail to %s failed: %r", getattr(message, "to", ""), e)
+                self._stats.record(False, 0, time.monotonic() - started)
+                future.set_exception(e)
+            else:
+                now = time.monotonic()
+                self._stats.record(True, now - queued_at, now - started)
+                future.set_result(True)
+
+
+dispatcher = MailDispatcher()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Fire-and-forget messages still queued when a command / worker exits
+    dispatcher.flush(timeout=10)
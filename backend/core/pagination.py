@@ -0,0 +1,142 @@
+"""
+Shared pagination for large listings.
+
+HybridPagination keeps the existing page-number API and adds two opt-ins:
+- ?cursor=...   keyset (cursor) pagination: no COUNT(*), no OFFSET scan.
+                Pass an empty ?cursor= to get the first page.
+- ?count=false  page-number mode without the COUNT(*) query ("count": null).
+"""
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _count_disabled(request, param):
+    v = str(request.query_params.get(param, "")).strip().lower()
+    return v in ("false", "0", "no", "n")
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination ordered on `-id` by default.
+
+    Views can override the default with `get_cursor_ordering()`; an explicit
+    ?ordering= (OrderingFilter) still wins. `id` is always appended as a
+    tie-breaker so the order is total.
+    """
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        hook = getattr(view, "get_cursor_ordering", None)
+        if hook and not request.query_params.get("ordering"):
+            ordering = tuple(hook())
+        else:
+            ordering = super().get_ordering(request, queryset, view)
+
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            ordering += ("-id" if ordering[0].startswith("-") else "id",)
+        return ordering
+
+
+class OptionalCountPagination(PageNumberPagination):
+    """
+    PageNumberPagination that skips COUNT(*) when ?count=false.
+    Without a count, one extra row is fetched to know if a next page exists.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.skip_count = _count_disabled(request, self.count_query_param)
+        if not self.skip_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.skip_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.skip_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if not self.skip_count:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", None),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+
+class HybridPagination(BasePagination):
+    """
+    Page-number pagination by default, keyset pagination when ?cursor is sent.
+    Subclasses tune `page_size` / `max_page_size` like a normal paginator.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def _build(self, request):
+        cls = KeysetPagination if self.cursor_query_param in request.query_params else OptionalCountPagination
+        impl = cls()
+        impl.page_size = self.page_size
+        impl.page_size_query_param = self.page_size_query_param
+        impl.max_page_size = self.max_page_size
+        return impl
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.impl = self._build(request)
+        return self.impl.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.impl.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return OptionalCountPagination().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.impl.to_html()
+
+    @property
+    def display_page_controls(self):
+        return getattr(getattr(self, "impl", None), "display_page_controls", False)
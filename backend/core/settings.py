@@ -55,6 +55,7 @@ MIDDLEWARE = [
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "authorization",
+    "idempotency-key",
 ]
 
 CORS_ALLOW_METHODS = [
@@ -131,6 +132,27 @@ REST_FRAMEWORK = {
 }
 
 
+# Cache used by the public catalog response cache (catalog/cache.py).
+# Swap the backend without code changes, e.g.:
+#   "django.core.cache.backends.filebased.FileBasedCache" + "LOCATION": "/var/tmp/urbancart_cache"
+#   "django.core.cache.backends.redis.RedisCache" + "LOCATION": "redis://127.0.0.1:6379/1"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "urbancart-default",
+    }
+}
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
+# Online-payment orders hold their stock this long (see catalog/reservations.py;
+# run `manage.py release_stock_reservations --watch` to sweep expired holds)
+STOCK_RESERVATION_MINUTES = 15
+
+# Idempotency-Key handling for checkout / payment POSTs (orders/idempotency.py)
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -149,9 +171,21 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Email settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
-EMAIL_HOST = "smtp.gmail.com"
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# Env overrides let a local debugging server stand in, e.g.
+# EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0 + `python -m aiosmtpd -n -l localhost:1025`
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 587))
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "1") not in ("0", "false", "False")
+
+# Order emails are queued in orders.EmailOutbox and sent by
+# `manage.py send_outbox_emails --watch`
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Shared mail dispatcher (core/mail.py): one pooled SMTP connection per process
+MAIL_BATCH_SIZE = 50
+MAIL_BATCH_WAIT_SECONDS = 0.05
+MAIL_IDLE_SECONDS = 60
+MAIL_SEND_TIMEOUT = 30
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
@@ -160,6 +194,30 @@ FRONTEND_URL = "http://localhost:5173"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Rendered invoice PDFs (orders/invoices.py) live in this STORAGES alias
+# under invoices/<order id>/; "default" = MEDIA_ROOT
+INVOICE_STORAGE_ALIAS = "default"
+# Background pre-render pool for confirmed/shipped/delivered orders, and how
+# long a download waits for a pending render before rendering inline
+INVOICE_RENDER_WORKERS = 2
+INVOICE_WAIT_SECONDS = 5
+# Processes rendering missing PDFs for /api/admin/orders/export-invoices/
+# (0 = render in the request process)
+INVOICE_EXPORT_PROCESSES = 4
+
+# Background export jobs (orders/export_jobs.py): worker threads per process,
+# how long finished files are kept, total size cap (oldest evicted first) and
+# how long a signed download link stays valid. `manage.py run_export_jobs --watch`
+# restarts jobs orphaned by a dead worker and evicts.
+EXPORT_STORAGE_ALIAS = "default"
+EXPORT_WORKERS = 2
+EXPORT_TTL_HOURS = 24
+EXPORT_MAX_TOTAL_MB = 500
+EXPORT_LINK_MAX_AGE = 15 * 60
+# Longest ?wait= a status poll may hold a request worker for; keep it short
+# on sync (WSGI) workers, clients simply poll again
+EXPORT_POLL_MAX_WAIT_SECONDS = 2
+
 PAYMENTS_DEMO_MODE = True
 
 SSLCOMMERZ_STORE_ID = "testbox"
@@ -0,0 +1,41 @@
+"""
+Snapshot-on-load for models whose signal receivers diff "before" and
+"after" a save (facet counts, tag index, category tree, sales rollups).
+
+A model lists what to remember as
+
+    load_snapshots = {attr: (source fields, key function)}
+
+and every instance loaded from the database (or refreshed) gets
+`attr = key(instance)` when all of the source fields were loaded, so
+pre_save doesn't have to read the row again. Partially loaded instances
+simply lack the attribute; receivers fall back to reading the row.
+"""
+
+
+class LoadSnapshotMixin:
+    """
+    Put before models.Model in the bases.
+    """
+
+    load_snapshots = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.take_load_snapshots(field_names)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, *args, **kwargs):
+        super().refresh_from_db(using, fields, *args, **kwargs)
+        if fields is not None:
+            return  # a deferred field being loaded: in-memory edits aren't the stored row
+        # The row may have changed under us (e.g. bulk UPDATEs)
+        loaded = {f.attname for f in self._meta.concrete_fields} - self.get_deferred_fields()
+        self.take_load_snapshots(loaded)
+
+    def take_load_snapshots(self, field_names):
+        field_names = set(field_names)
+        for attr, (fields, key) in self.load_snapshots.items():
+            if set(fields) <= field_names:
+                setattr(self, attr, key(self))
@@ -0,0 +1,297 @@
+"""
+Streaming file builders for large downloads.
+
+Each `iter_*` function takes an iterable of rows and yields bytes chunks
+as it goes, so a StreamingHttpResponse can start sending at once and
+memory stays flat however many rows there are. Export endpoints take
+`?format=xlsx|csv|ndjson` and hand their rows (ideally straight from
+`values_list().iterator()`) to `export_response`:
+
+    fmt = export_format(request)
+    return export_response(fmt, "orders-report", headers, rows, keys=keys)
+
+ZipSink lets zipfile write to a plain generator (no seek/tell), which is
+what makes streaming a ZIP-based format like XLSX possible.
+"""
+import csv
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Rows serialized between two yields
+FLUSH_EVERY = 500
+
+
+class ZipSink:
+    """
+    Write-only file for zipfile: collects bytes until the stream takes them.
+    No seek/tell, so zipfile writes data descriptors and never goes back.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# ======================
+# XLSX
+# ======================
+# Characters XML 1.0 can't carry (control chars, lone surrogates, non-characters)
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+# ...plus the ones Excel refuses in a sheet name
+_ILLEGAL_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "</Types>"
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    "</Relationships>"
+)
+
+# Style 0 = default, 1 = bold (header row)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+
+def _column_letter(idx):
+    # 1 -> A, 27 -> AA
+    letters = ""
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _is_finite(value):
+    # NaN / Infinity have no spreadsheet number form: they are written as text
+    return value.is_finite() if isinstance(value, Decimal) else math.isfinite(value)
+
+
+def _sheet_name(name):
+    name = _ILLEGAL_SHEET_NAME.sub("", _ILLEGAL_XML.sub("", str(name or "")))[:31].strip("'")
+    return name or "Sheet1"
+
+
+def _cell(ref, value, style=0):
+    s = f' s="{style}"' if style else ""
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{s}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)) and _is_finite(value):
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(num, values, letters, style=0):
+    cells = "".join(_cell(f"{letters[i]}{num}", v, style) for i, v in enumerate(values))
+    return f'<row r="{num}">{cells}</row>'
+
+
+def iter_xlsx(headers, rows, sheet_name="Sheet1", widths=None):
+    """
+    Yield a one-sheet .xlsx: a bold header row, then `rows` (sequences of
+    str / numbers / dates / None) written with inline strings.
+    `widths` is one column width for all columns, or a list per column.
+    """
+    sink = ZipSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+    archive.writestr("_rels/.rels", _ROOT_RELS)
+    archive.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(_sheet_name(sheet_name), {'"': "&quot;"})))
+    archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+    archive.writestr("xl/styles.xml", _STYLES)
+    yield sink.take()
+
+    letters = [_column_letter(i) for i in range(1, len(headers) + 1)]
+    if widths is not None and not isinstance(widths, (list, tuple)):
+        widths = [widths] * len(headers)
+
+    with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+        head = [
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        ]
+        if widths:
+            head.append("<cols>")
+            head.extend(
+                f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>'
+                for i, w in enumerate(widths, start=1)
+            )
+            head.append("</cols>")
+        head.append("<sheetData>")
+        head.append(_row(1, headers, letters, style=1))
+        sheet.write("".join(head).encode("utf-8"))
+
+        buf = []
+        num = 1
+        for values in rows:
+            num += 1
+            buf.append(_row(num, values, letters))
+            if len(buf) >= FLUSH_EVERY:
+                sheet.write("".join(buf).encode("utf-8"))
+                buf.clear()
+                yield sink.take()
+        buf.append("</sheetData></worksheet>")
+        sheet.write("".join(buf).encode("utf-8"))
+
+    archive.close()
+    yield sink.take()
+
+
+# ======================
+# CSV / NDJSON
+# ======================
+class _Echo:
+    # csv.writer target that just hands the line back
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    buf = [writer.writerow(headers)]
+    for values in rows:
+        buf.append(writer.writerow(values))
+        if len(buf) >= FLUSH_EVERY:
+            yield "".join(buf).encode("utf-8")
+            buf.clear()
+    yield "".join(buf).encode("utf-8")
+
+
+def iter_ndjson(keys, rows):
+    """
+    One JSON object per line. Decimals become strings (exact amounts).
+    """
+    encode = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    buf = []
+    for values in rows:
+        buf.append(encode(dict(zip(keys, values))))
+        buf.append("\n")
+        if len(buf) >= FLUSH_EVERY * 2:
+            yield "".join(buf).encode("utf-8")
+            buf.clear()
+    yield "".join(buf).encode("utf-8")
+
+
+# ======================
+# Export endpoints
+# ======================
+FORMATS = ("xlsx", "csv", "ndjson")
+
+CONTENT_TYPES = {
+    "xlsx": XLSX_CONTENT_TYPE,
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    On export endpoints `?format=` picks the file type, not a DRF renderer
+    (DRF would 404 on ?format=csv). Errors still render as JSON.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
+
+
+def export_format(request, default="xlsx"):
+    """
+    The requested export format, or None when it isn't one we stream.
+    """
+    fmt = (request.query_params.get("format") or default).strip().lower()
+    return fmt if fmt in FORMATS else None
+
+
+def export_body(fmt, headers, rows, keys=None, sheet_name="Sheet1", widths=None):
+    if fmt == "csv":
+        return iter_csv(headers, rows)
+    if fmt == "ndjson":
+        return iter_ndjson(keys or headers, rows)
+    return iter_xlsx(headers, rows, sheet_name=sheet_name, widths=widths)
+
+
+def export_response(fmt, filename, headers, rows, keys=None, sheet_name="Sheet1", widths=None):
+    """
+    StreamingHttpResponse of `rows` as <filename>.<fmt>.
+    `keys` name the NDJSON fields (defaults to the headers).
+    """
+    resp = StreamingHttpResponse(
+        export_body(fmt, headers, rows, keys=keys, sheet_name=sheet_name, widths=widths),
+        content_type=CONTENT_TYPES[fmt],
+    )
+    resp["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return resp
@@ -1,199 +1,39 @@
-from io import BytesIO
 from decimal import Decimal
 import datetime
 
-from django.db.models import Q, Sum, Count
-from django.db.models.functions import TruncDate
-from django.http import HttpResponse
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 
 from rest_framework import status as drf_status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from core.analytics import Metric, Window, evaluate
+from core.pagination import HybridPagination
+from core.streaming import ExportContentNegotiation, export_format
 
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-
-from .models import Order, OrderStatusHistory
+from . import exports, invoices
+from .exports import range_from_query
+from .models import DailySalesRollup, Order, OrderStatusHistory
 from .admin_serializers import (
     AdminOrderListSerializer,
     AdminOrderDetailSerializer,
 )
 
 
-class AdminOrderPagination(PageNumberPagination):
+class AdminOrderPagination(HybridPagination):
+    # ?cursor= switches to keyset paging on -id, ?count=false skips COUNT(*)
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
 
 
-def _money(val):
-    try:
-        return f"{Decimal(val):,.2f}"
-    except Exception:
-        try:
-            return f"{Decimal(str(val)):,.2f}"
-        except Exception:
-            return "0.00"
-
-
-def _parse_date(s: str):
-    """
-    Parse YYYY-MM-DD safely.
-    Returns date or None.
-    """
-    if not s:
-        return None
-    s = str(s).strip()
-    try:
-        return datetime.date.fromisoformat(s)
-    except Exception:
-        return None
-
-
-def _range_from_query(params):
-    """
-    start/end are YYYY-MM-DD.
-    Returns (start_dt, end_dt_exclusive) in timezone-aware datetimes or (None, None) if invalid/missing.
-    """
-    start_d = _parse_date(params.get("start"))
-    end_d = _parse_date(params.get("end"))
-
-    if not start_d and not end_d:
-        return None, None
-
-    # If one side missing, make it a single-day range
-    if start_d and not end_d:
-        end_d = start_d
-    if end_d and not start_d:
-        start_d = end_d
-
-    # Normalize to [start, end+1day)
-    tz = timezone.get_current_timezone()
-    start_dt = timezone.make_aware(datetime.datetime.combine(start_d, datetime.time.min), tz)
-    end_dt = timezone.make_aware(datetime.datetime.combine(end_d + datetime.timedelta(days=1), datetime.time.min), tz)
-    return start_dt, end_dt
-
-
-def build_invoice_pdf(order: Order) -> bytes:
-    """
-    Generates a clean PDF invoice for an Order and returns raw PDF bytes.
-    """
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=36,
-        bottomMargin=36,
-        title=f"Invoice {order.order_number}",
-        author="Urban Cart",
-    )
-
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Header
-    story.append(Paragraph("<b>Urban Cart</b>", styles["Title"]))
-    story.append(Paragraph("Invoice", styles["Heading2"]))
-    story.append(Spacer(1, 10))
-
-    # Meta block
-    created = order.created_at.astimezone(timezone.get_current_timezone()).strftime("%Y-%m-%d %H:%M")
-    meta_lines = [
-        f"<b>Invoice for:</b> {order.order_number}",
-        f"<b>Order ID:</b> {order.id}",
-        f"<b>Order Date:</b> {created}",
-        f"<b>Status:</b> {order.status}",
-        f"<b>Payment:</b> {order.payment_method} ({order.payment_status})",
-    ]
-    for line in meta_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 12))
-
-    # Shipping / Customer info
-    story.append(Paragraph("<b>Shipping Details</b>", styles["Heading3"]))
-    ship_lines = [
-        f"<b>Name:</b> {order.shipping_name}",
-        f"<b>Phone:</b> {order.phone}",
-        f"<b>City:</b> {order.city}",
-        f"<b>Address:</b> {order.address}",
-    ]
-    if order.note:
-        ship_lines.append(f"<b>Note:</b> {order.note}")
-    for line in ship_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 14))
-
-    # Items table
-    story.append(Paragraph("<b>Items</b>", styles["Heading3"]))
-
-    data = [["#", "Product", "SKU", "Qty", "Unit Price", "Line Total"]]
-    items = list(order.items.all())
-    for idx, it in enumerate(items, start=1):
-        data.append([
-            str(idx),
-            (it.name or ""),
-            (it.sku or ""),
-            str(it.quantity),
-            _money(it.price),
-            _money(it.line_total),
-        ])
-
-    table = Table(data, colWidths=[24, 220, 90, 40, 80, 80])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 1), (-1, -1), 9),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 14))
-
-    # Totals table
-    totals = [
-        ["Subtotal", _money(order.subtotal)],
-        ["Discount", f"-{_money(order.discount_total)}"],
-        ["Shipping", _money(order.shipping_fee)],
-        ["Total", _money(order.total)],
-    ]
-    totals_table = Table(totals, colWidths=[120, 120])
-    totals_table.setStyle(TableStyle([
-        ("FONTNAME", (0, 0), (-1, -2), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -2), 10),
-
-        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-        ("FONTSIZE", (0, -1), (-1, -1), 11),
-
-        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-        ("LINEABOVE", (0, -1), (-1, -1), 0.75, colors.black),
-        ("TOPPADDING", (0, -1), (-1, -1), 8),
-    ]))
-    story.append(totals_table)
-    story.append(Spacer(1, 16))
-
-    # Footer
-    story.append(Paragraph("Thank you for shopping with Urban Cart.", styles["Italic"]))
-
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
+def _amount(val):
+    # SQLite sums of maintained decimals can come back as Decimal("15")
+    return Decimal(val or 0).quantize(Decimal("0.01"))
 
 
 class AdminOrderViewSet(ViewSet):
@@ -357,10 +197,36 @@ class AdminOrderViewSet(ViewSet):
         except Order.DoesNotExist:
             return Response({"detail": "Order not found."}, status=404)
 
-        pdf_bytes = build_invoice_pdf(order)
-        filename = f"invoice-{order.order_number}.pdf"
+        # ✅ rendered once per order version, then served from storage (ETag / 304)
+        return invoices.invoice_response(request, order)
 
-        resp = HttpResponse(pdf_bytes, content_type="application/pdf")
+    # ------------------------
+    # ✅ Bulk invoices as one streamed ZIP (ADMIN)
+    # GET /api/admin/orders/export-invoices/?start=YYYY-MM-DD&end=YYYY-MM-DD
+    # ------------------------
+    @action(detail=False, methods=["get"], url_path="export-invoices")
+    def export_invoices(self, request):
+        denied = self._ensure_admin(request)
+        if denied:
+            return denied
+
+        start_dt, end_dt = range_from_query(request.query_params)
+        if not (start_dt and end_dt):
+            return Response(
+                {"detail": "start and/or end (YYYY-MM-DD) are required."},
+                status=drf_status.HTTP_400_BAD_REQUEST,
+            )
+
+        orders = (
+            Order.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt)
+            .prefetch_related("items")
+            .order_by("id")
+            .iterator(chunk_size=200)
+        )
+
+        last_day = (end_dt - datetime.timedelta(days=1)).date()
+        filename = f"invoices-{start_dt.date()}-to-{last_day}.zip"
+        resp = StreamingHttpResponse(invoices.iter_invoice_zip(orders), content_type="application/zip")
         resp["Content-Disposition"] = f'attachment; filename="{filename}"'
         return resp
 
@@ -374,21 +240,16 @@ class AdminOrderViewSet(ViewSet):
         if denied:
             return denied
 
-        qs = Order.objects.all()
+        # ✅ Reads DailySalesRollup (orders/rollups.py): a few rows per day, no scan over orders
+        rollup = DailySalesRollup.objects.all()
 
         # Date range (optional)
-        start_dt, end_dt = _range_from_query(request.query_params)
-        if start_dt and end_dt:
-            qs_range = qs.filter(created_at__gte=start_dt, created_at__lt=end_dt)
-        else:
-            qs_range = qs.none()
+        start_dt, end_dt = range_from_query(request.query_params)
 
         # "Today" revenue/orders (based on server timezone)
         now = timezone.localtime()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        tomorrow_start = today_start + datetime.timedelta(days=1)
-
-        qs_today = qs.filter(created_at__gte=today_start, created_at__lt=tomorrow_start)
+        today = today_start.date()
 
         # "This month" revenue/orders
         month_start = today_start.replace(day=1)
@@ -397,59 +258,59 @@ class AdminOrderViewSet(ViewSet):
         else:
             next_month_start = month_start.replace(month=month_start.month + 1)
 
-        qs_month = qs.filter(created_at__gte=month_start, created_at__lt=next_month_start)
-
         # Revenue definitions:
         # - revenue_all: sum(total) for non-cancelled orders
         # - revenue_paid: sum(total) for payment_status=paid and non-cancelled
         non_cancelled = ~Q(status__in=[Order.Status.CANCELLED, Order.Status.REFUNDED])
+        paid = Q(payment_status=Order.PaymentStatus.PAID)
 
-        def _sum_total(qs_in):
-            return qs_in.aggregate(v=Sum("total"))["v"] or Decimal("0.00")
-
-        def _sum_total_paid(qs_in):
-            return (
-                qs_in.filter(payment_status=Order.PaymentStatus.PAID)
-                .aggregate(v=Sum("total"))["v"]
-                or Decimal("0.00")
-            )
-
-        # Today
-        today_orders = qs_today.count()
-        today_revenue_all = _sum_total(qs_today.filter(non_cancelled))
-        today_revenue_paid = _sum_total_paid(qs_today.filter(non_cancelled))
-
-        # Month
-        month_orders = qs_month.count()
-        month_revenue_all = _sum_total(qs_month.filter(non_cancelled))
-        month_revenue_paid = _sum_total_paid(qs_month.filter(non_cancelled))
+        windows = {
+            "today": Window("day", today, today + datetime.timedelta(days=1)),
+            "month": Window("day", month_start.date(), next_month_start.date()),
+        }
+        if start_dt and end_dt:
+            windows["range"] = Window("day", start_dt.date(), end_dt.date())
 
-        # Range totals (if provided)
-        range_orders = qs_range.count() if start_dt and end_dt else 0
-        range_revenue_all = _sum_total(qs_range.filter(non_cancelled)) if start_dt and end_dt else Decimal("0.00")
-        range_revenue_paid = _sum_total_paid(qs_range.filter(non_cancelled)) if start_dt and end_dt else Decimal("0.00")
+        spec = []
+        for w in windows:
+            spec += [
+                Metric(f"{w}_orders", "sum", "orders", window=w),
+                Metric(f"{w}_revenue_all", "sum", "revenue", window=w, filter=non_cancelled),
+                Metric(f"{w}_revenue_paid", "sum", "revenue", window=w, filter=non_cancelled & paid),
+            ]
 
-        # Daily breakdown inside range (if provided)
+        # ✅ One query: with a range it is grouped by day and also yields the daily breakdown
         daily = []
-        if start_dt and end_dt:
-            daily_rows = (
-                qs_range.filter(non_cancelled)
-                .annotate(day=TruncDate("created_at"))
-                .values("day")
-                .annotate(
-                    orders=Count("id"),
-                    revenue_all=Sum("total"),
-                    revenue_paid=Sum("total", filter=Q(payment_status=Order.PaymentStatus.PAID)),
-                )
-                .order_by("day")
-            )
-            for r in daily_rows:
+        if "range" in windows:
+            spec += [
+                Metric("daily_orders", "sum", "orders", window="range", filter=non_cancelled),
+                Metric("daily_revenue_paid", "sum", "revenue", window="range", filter=non_cancelled & paid),
+            ]
+            totals, rows = evaluate(rollup, spec, windows, group_by=["day"])
+            for r in rows:
+                if not r["daily_orders"]:
+                    continue
                 daily.append({
                     "date": r["day"].isoformat() if r["day"] else None,
-                    "orders": int(r["orders"] or 0),
-                    "revenue_all": str((r["revenue_all"] or Decimal("0.00"))),
-                    "revenue_paid": str((r["revenue_paid"] or Decimal("0.00"))),
+                    "orders": int(r["daily_orders"]),
+                    "revenue_all": str(_amount(r["range_revenue_all"])),
+                    "revenue_paid": str(_amount(r["daily_revenue_paid"])),
                 })
+        else:
+            totals = evaluate(rollup, spec, windows)
+
+        def _totals(w):
+            if w not in windows:
+                return 0, Decimal("0.00"), Decimal("0.00")
+            return (
+                int(totals[f"{w}_orders"]),
+                _amount(totals[f"{w}_revenue_all"]),
+                _amount(totals[f"{w}_revenue_paid"]),
+            )
+
+        today_orders, today_revenue_all, today_revenue_paid = _totals("today")
+        month_orders, month_revenue_all, month_revenue_paid = _totals("month")
+        range_orders, range_revenue_all, range_revenue_paid = _totals("range")
 
         return Response({
             "timezone": str(timezone.get_current_timezone()),
@@ -478,79 +339,20 @@ class AdminOrderViewSet(ViewSet):
     # ✅ NEW: Export Excel (ADMIN)
     # GET /api/admin/orders/export-excel/?start=YYYY-MM-DD&end=YYYY-MM-DD
     # ------------------------
-    @action(detail=False, methods=["get"], url_path="export-excel")
+    @action(
+        detail=False, methods=["get"], url_path="export-excel",
+        content_negotiation_class=ExportContentNegotiation,
+    )
     def export_excel(self, request):
+        """
+        ?format=xlsx (default) | csv | ndjson, all streamed.
+        """
         denied = self._ensure_admin(request)
         if denied:
             return denied
 
-        qs = (
-            Order.objects.select_related("user")
-            .order_by("-id")
-        )
+        fmt = export_format(request)
+        if fmt is None:
+            return Response({"detail": "format must be xlsx, csv or ndjson."}, status=400)
 
-        start_dt, end_dt = _range_from_query(request.query_params)
-        if start_dt and end_dt:
-            qs = qs.filter(created_at__gte=start_dt, created_at__lt=end_dt)
-
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Orders"
-
-        headers = [
-            "ID",
-            "Order Number",
-            "Created At",
-            "Customer",
-            "Email",
-            "Phone",
-            "City",
-            "Status",
-            "Payment Status",
-            "Payment Method",
-            "Subtotal",
-            "Discount",
-            "Shipping",
-            "Total",
-        ]
-        ws.append(headers)
-
-        tz = timezone.get_current_timezone()
-
-        for o in qs.iterator():
-            created = timezone.localtime(o.created_at, tz).strftime("%Y-%m-%d %H:%M:%S")
-            ws.append([
-                o.id,
-                o.order_number,
-                created,
-                o.shipping_name,
-                getattr(o.user, "email", "") if o.user_id else "",
-                o.phone,
-                o.city,
-                o.status,
-                o.payment_status,
-                o.payment_method,
-                float(o.subtotal or 0),
-                float(o.discount_total or 0),
-                float(o.shipping_fee or 0),
-                float(o.total or 0),
-            ])
-
-        # Basic column sizing
-        for col_idx in range(1, len(headers) + 1):
-            col_letter = get_column_letter(col_idx)
-            ws.column_dimensions[col_letter].width = 18
-
-        # Write to bytes
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
-
-        filename = "orders-report.xlsx"
-        resp = HttpResponse(
-            out.getvalue(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return resp
+        return exports.admin_orders(request.user, request.query_params).response(fmt)
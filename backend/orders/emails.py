@@ -1,5 +1,4 @@
-from django.conf import settings
-from django.core.mail import send_mail
+from . import outbox
 
 
 def _safe_email(order):
@@ -11,27 +10,28 @@ def _safe_email(order):
     )
 
 
+def _order_no(order):
+    # order_number is only filled by the second save() of a new order
+    return getattr(order, "order_number", "") or order._generate_order_number()
+
+
+# Both helpers queue the email in orders.outbox (same transaction as the
+# order change); `manage.py send_outbox_emails` delivers it.
 def send_order_placed_email(order):
     to_email = _safe_email(order)
     if not to_email:
         return
 
-    subject = f"Urban Cart — Order placed (#{getattr(order, 'order_number', order.id)})"
+    subject = f"Urban Cart — Order placed (#{_order_no(order)})"
     message = (
         f"Thanks for your order!\n\n"
-        f"Order: #{getattr(order, 'order_number', order.id)}\n"
+        f"Order: #{_order_no(order)}\n"
         f"Status: {getattr(order, 'status', 'pending')}\n"
         f"Total: {getattr(order, 'total', '')}\n\n"
         f"We’ll notify you as your order progresses."
     )
 
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-        recipient_list=[to_email],
-        fail_silently=True,
-    )
+    outbox.enqueue(to_email, subject, message)
 
 
 def send_order_status_email(order, status, note="", changed_by=None):
@@ -39,7 +39,7 @@ def send_order_status_email(order, status, note="", changed_by=None):
     if not to_email:
         return
 
-    order_no = getattr(order, "order_number", order.id)
+    order_no = _order_no(order)
     subject = f"Urban Cart — Order #{order_no} is now {status}"
 
     changer = ""
@@ -59,10 +59,4 @@ def send_order_status_email(order, status, note="", changed_by=None):
         f"Thank you for shopping with Urban Cart."
     )
 
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-        recipient_list=[to_email],
-        fail_silently=True,
-    )
+    outbox.enqueue(to_email, subject, message)
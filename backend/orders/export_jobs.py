@@ -0,0 +1,264 @@
+"""
+Background export jobs.
+
+Big exports can outlive a proxy timeout when streamed from the request,
+so clients can queue them instead:
+
+    POST /api/orders/exports/          {"kind": "admin_orders", "format": "csv", "start": ..., "end": ...}
+    GET  /api/orders/exports/<id>/?wait=2    status + progress, long-polls (up to
+                                             EXPORT_POLL_MAX_WAIT_SECONDS) until it changes
+    GET  <downloadUrl>                 signed link, valid EXPORT_LINK_MAX_AGE seconds
+
+A per-process pool of EXPORT_WORKERS threads picks jobs up right after
+the POST commits. A job is claimed with a conditional UPDATE and a lease
+that is extended with every progress write, so a job whose process died
+is picked up again by `manage.py run_export_jobs` (which also evicts).
+Every later write is conditional on the lease it last wrote: a worker
+that stalled past its lease stops (and drops its file) instead of
+overwriting the result of the worker that took the job over.
+
+Finished files live in the EXPORT_STORAGE_ALIAS storage under exports/
+for EXPORT_TTL_HOURS; past EXPORT_MAX_TOTAL_MB the oldest are dropped first.
+"""
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from core.streaming import export_body
+
+from . import exports
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=2)
+SIGNING_SALT = "orders.export-download"
+
+# Progress is written at most this often
+PROGRESS_EVERY_ROWS = 5000
+PROGRESS_EVERY_SECONDS = 1.0
+
+
+def storage():
+    return storages[getattr(settings, "EXPORT_STORAGE_ALIAS", "default")]
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, "EXPORT_TTL_HOURS", 24))
+
+
+def _max_total_bytes():
+    return int(getattr(settings, "EXPORT_MAX_TOTAL_MB", 500)) * 1024 * 1024
+
+
+# ======================
+# Queue
+# ======================
+def create(user, kind, fmt, params=None):
+    job = ExportJob.objects.create(user=user, kind=kind, format=fmt, params=params or {})
+    schedule(job.pk)
+    return job
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "EXPORT_WORKERS", 2),
+                thread_name_prefix="export-job",
+            )
+            _pool_pid = pid
+        return _pool
+
+
+def _task(job_id):
+    try:
+        run(job_id)
+    except Exception:
+        logger.exception("Export job %s crashed", job_id)
+    finally:
+        connection.close()  # this pool thread's own connection
+
+
+def schedule(job_id):
+    """
+    Start the job on the worker pool once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _executor().submit(_task, job_id))
+
+
+# ======================
+# Worker
+# ======================
+def _claim(job_id, now):
+    """
+    Take a pending job, or a running one whose worker stopped renewing its lease.
+    """
+    return ExportJob.objects.filter(
+        Q(status=ExportJob.Status.PENDING)
+        | Q(status=ExportJob.Status.RUNNING, lease_until__lt=now),
+        pk=job_id,
+    ).update(
+        status=ExportJob.Status.RUNNING, lease_until=now + LEASE, started_at=now, rows_done=0, error=""
+    )
+
+
+class LeaseLost(Exception):
+    """
+    Another worker took the job over (our lease ran out): stop writing to it.
+    """
+
+
+def _ours(job):
+    # Writes only land while we still hold the lease we last wrote
+    return ExportJob.objects.filter(pk=job.pk, status=ExportJob.Status.RUNNING, lease_until=job.lease_until)
+
+
+def _counted(job, rows):
+    done = 0
+    last = time.monotonic()
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_EVERY_ROWS == 0 or time.monotonic() - last >= PROGRESS_EVERY_SECONDS:
+            last = time.monotonic()
+            lease = timezone.now() + LEASE
+            if not _ours(job).update(rows_done=done, lease_until=lease):
+                raise LeaseLost
+            job.lease_until = lease
+    job.rows_done = done
+
+
+def run(job_id):
+    """
+    Build one job's file. Returns True when this call did the work.
+    """
+    if not _claim(job_id, timezone.now()):
+        return False  # another worker has it, or it already finished
+    job = ExportJob.objects.select_related("user").get(pk=job_id)
+
+    try:
+        spec = exports.build(job.kind, job.user, job.params)
+        job.rows_total = spec.count()
+        ExportJob.objects.filter(pk=job.pk).update(rows_total=job.rows_total)
+
+        body = export_body(
+            job.format, spec.headers, _counted(job, spec.rows()),
+            keys=spec.keys, sheet_name=spec.sheet_name, widths=spec.widths,
+        )
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in body:
+                tmp.write(chunk)
+            size = tmp.tell()
+            tmp.seek(0)
+            # random folder: MEDIA_ROOT may be publicly served; the basename is the download name
+            name = storage().save(
+                f"exports/{job.pk}-{secrets.token_hex(12)}/{spec.filename}.{job.format}", File(tmp)
+            )
+    except LeaseLost:
+        logger.warning("Export job %s was taken over by another worker", job.pk)
+        return False
+    except Exception as e:
+        logger.exception("Export job %s failed", job.pk)
+        _ours(job).update(
+            status=ExportJob.Status.FAILED, error=str(e)[:2000], finished_at=timezone.now(), lease_until=None
+        )
+        return True
+
+    now = timezone.now()
+    finished = _ours(job).update(
+        status=ExportJob.Status.DONE, file=name, size=size, rows_done=job.rows_done,
+        finished_at=now, expires_at=now + _ttl(), lease_until=None,
+    )
+    if not finished:
+        # lease ran out while we wrote: the job belongs to another worker now
+        logger.warning("Export job %s was taken over by another worker", job.pk)
+        storage().delete(name)
+        return False
+    evict(now, keep=job.pk)
+    return True
+
+
+def runnable_ids(now=None):
+    now = now or timezone.now()
+    return list(
+        ExportJob.objects.filter(
+            Q(status=ExportJob.Status.PENDING) | Q(status=ExportJob.Status.RUNNING, lease_until__lt=now)
+        ).order_by("id").values_list("id", flat=True)
+    )
+
+
+# ======================
+# Retention
+# ======================
+def _drop(job):
+    if job.file:
+        try:
+            storage().delete(job.file)
+        except Exception:
+            logger.warning("Could not delete export file %s", job.file)
+    ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.Status.EXPIRED, file="", size=0)
+
+
+def evict(now=None, keep=None):
+    """
+    Drop expired files, then the oldest ones while the total is over the cap
+    (never `keep`, the file that was just built). Returns how many were removed.
+    """
+    now = now or timezone.now()
+    done = ExportJob.objects.filter(status=ExportJob.Status.DONE)
+    removed = 0
+
+    for job in list(done.filter(expires_at__lt=now).only("id", "file")):
+        _drop(job)
+        removed += 1
+
+    total = done.aggregate(v=Sum("size"))["v"] or 0
+    cap = _max_total_bytes()
+    if total > cap:
+        for job in list(done.exclude(pk=keep).order_by("finished_at").only("id", "file", "size")):
+            if total <= cap:
+                break
+            _drop(job)
+            total -= job.size
+            removed += 1
+    return removed
+
+
+# ======================
+# Download links
+# ======================
+def download_token(job):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(job.pk))
+
+
+def job_for_token(token):
+    """
+    The finished job a download token points to, or None (bad / expired link).
+    """
+    max_age = getattr(settings, "EXPORT_LINK_MAX_AGE", 15 * 60)
+    try:
+        job_id = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    return ExportJob.objects.filter(pk=job_id, status=ExportJob.Status.DONE).first()
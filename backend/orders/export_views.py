@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.http import FileResponse
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.streaming import CONTENT_TYPES, FORMATS
+
+from . import export_jobs, exports
+from .models import ExportJob
+
+POLL_INTERVAL = 0.5
+
+
+def _max_wait_seconds():
+    # Long-poll: GET .../<id>/?wait=N holds a worker at most this long
+    return float(getattr(settings, "EXPORT_POLL_MAX_WAIT_SECONDS", 2))
+
+
+def _job_data(request, job):
+    data = {
+        "id": job.id,
+        "kind": job.kind,
+        "format": job.format,
+        "status": job.status,
+        "progress": job.progress,
+        "rowsDone": job.rows_done,
+        "rowsTotal": job.rows_total,
+        "size": job.size,
+        "error": job.error,
+        "createdAt": job.created_at,
+        "finishedAt": job.finished_at,
+        "expiresAt": job.expires_at,
+        "downloadUrl": None,
+    }
+    if job.status == ExportJob.Status.DONE:
+        token = export_jobs.download_token(job)
+        data["downloadUrl"] = request.build_absolute_uri(f"/api/orders/exports/download/{token}/")
+    return data
+
+
+class ExportJobListCreateView(APIView):
+    """
+    POST {"kind": "admin_orders" | "vendor_sales" | "vendor_sales_monthly",
+          "format": "xlsx" | "csv" | "ndjson", "start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}
+    -> 202 with the job; GET lists your recent jobs.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        jobs = ExportJob.objects.filter(user=request.user).order_by("-created_at")[:20]
+        return Response({"results": [_job_data(request, j) for j in jobs]})
+
+    def post(self, request):
+        kind = str(request.data.get("kind") or "").strip()
+        fmt = str(request.data.get("format") or "xlsx").strip().lower()
+
+        if kind not in exports.KINDS:
+            return Response(
+                {"detail": f"kind must be one of: {', '.join(exports.KINDS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if fmt not in FORMATS:
+            return Response({"detail": "format must be xlsx, csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        if not exports.allowed(kind, request.user):
+            return Response({"detail": "You can't run this export."}, status=status.HTTP_403_FORBIDDEN)
+
+        params = {k: str(request.data[k]) for k in ("start", "end") if request.data.get(k)}
+        job = export_jobs.create(request.user, kind, fmt, params)
+        return Response(_job_data(request, job), status=status.HTTP_202_ACCEPTED)
+
+
+class ExportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = ExportJob.objects.filter(pk=pk, user=request.user).first()
+        if job is None:
+            return Response({"detail": "Export not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            wait = min(max(float(request.query_params.get("wait") or 0), 0), _max_wait_seconds())
+        except ValueError:
+            wait = 0
+
+        # ✅ long-poll: answer as soon as status / progress moves, or when the wait is over
+        deadline = time.monotonic() + wait
+        seen = (job.status, job.rows_done)
+        while job.status in (ExportJob.Status.PENDING, ExportJob.Status.RUNNING) and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            job.refresh_from_db()
+            if (job.status, job.rows_done) != seen:
+                break
+
+        return Response(_job_data(request, job))
+
+
+class ExportDownloadView(APIView):
+    """
+    The signed token is the credential, so the link works in a new tab.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        job = export_jobs.job_for_token(token)
+        if job is None or not job.file:
+            return Response({"detail": "Link expired or invalid."}, status=status.HTTP_404_NOT_FOUND)
+
+        resp = FileResponse(
+            export_jobs.storage().open(job.file, "rb"),
+            content_type=CONTENT_TYPES.get(job.format, "application/octet-stream"),
+            as_attachment=True,
+            filename=job.file.rsplit("/", 1)[-1],
+        )
+        resp["Access-Control-Expose-Headers"] = "Content-Disposition"
+        return resp
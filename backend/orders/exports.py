@@ -0,0 +1,219 @@
+"""
+Export definitions shared by the streamed download endpoints and the
+background export jobs (orders/export_jobs.py).
+
+Each builder takes (user, params) and returns an ExportSpec: columns plus
+a values()/values_list() queryset read in chunks, so the same rows come
+out whether the file is streamed to the browser or written by a worker.
+"""
+import datetime
+from decimal import Decimal
+
+from django.utils import timezone
+
+from core.streaming import export_response
+
+from . import vendor_rollups, vendor_scope
+from .models import Order
+
+CHUNK_SIZE = 2000
+
+
+def parse_date(s):
+    """
+    Parse YYYY-MM-DD safely.
+    Returns date or None.
+    """
+    if not s:
+        return None
+    s = str(s).strip()
+    try:
+        return datetime.date.fromisoformat(s)
+    except Exception:
+        return None
+
+
+def range_from_query(params):
+    """
+    start/end are YYYY-MM-DD.
+    Returns (start_dt, end_dt_exclusive) in timezone-aware datetimes or (None, None) if invalid/missing.
+    """
+    start_d = parse_date(params.get("start"))
+    end_d = parse_date(params.get("end"))
+
+    if not start_d and not end_d:
+        return None, None
+
+    # If one side missing, make it a single-day range
+    if start_d and not end_d:
+        end_d = start_d
+    if end_d and not start_d:
+        start_d = end_d
+
+    # Normalize to [start, end+1day)
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.datetime.combine(start_d, datetime.time.min), tz)
+    end_dt = timezone.make_aware(datetime.datetime.combine(end_d + datetime.timedelta(days=1), datetime.time.min), tz)
+    return start_dt, end_dt
+
+
+class ExportSpec:
+    def __init__(self, filename, columns, values, transform=None, sheet_name="Sheet1", widths=None):
+        self.filename = filename
+        self.columns = columns  # [(header, NDJSON key)]
+        self.values = values  # queryset of tuples / dicts
+        self.transform = transform
+        self.sheet_name = sheet_name
+        self.widths = widths
+
+    @property
+    def headers(self):
+        return [c[0] for c in self.columns]
+
+    @property
+    def keys(self):
+        return [c[1] for c in self.columns]
+
+    def count(self):
+        return self.values.count()
+
+    def rows(self):
+        for row in self.values.iterator(chunk_size=CHUNK_SIZE):
+            yield self.transform(row) if self.transform else row
+
+    def response(self, fmt):
+        return export_response(
+            fmt, self.filename, self.headers, self.rows(),
+            keys=self.keys, sheet_name=self.sheet_name, widths=self.widths,
+        )
+
+
+# ======================
+# Builders
+# ======================
+def admin_orders(user, params):
+    qs = Order.objects.order_by("-id")
+    start_dt, end_dt = range_from_query(params)
+    if start_dt and end_dt:
+        qs = qs.filter(created_at__gte=start_dt, created_at__lt=end_dt)
+
+    # (header, NDJSON key, column) -- values_list: plain tuples, no model instances
+    columns = [
+        ("ID", "id", "id"),
+        ("Order Number", "order_number", "order_number"),
+        ("Created At", "created_at", "created_at"),
+        ("Customer", "customer", "shipping_name"),
+        ("Email", "email", "user__email"),
+        ("Phone", "phone", "phone"),
+        ("City", "city", "city"),
+        ("Status", "status", "status"),
+        ("Payment Status", "payment_status", "payment_status"),
+        ("Payment Method", "payment_method", "payment_method"),
+        ("Subtotal", "subtotal", "subtotal"),
+        ("Discount", "discount", "discount_total"),
+        ("Shipping", "shipping", "shipping_fee"),
+        ("Total", "total", "total"),
+    ]
+    tz = timezone.get_current_timezone()
+
+    def transform(row):
+        row = list(row)
+        row[2] = timezone.localtime(row[2], tz).strftime("%Y-%m-%d %H:%M:%S")
+        row[4] = row[4] or ""
+        return row
+
+    return ExportSpec(
+        "orders-report",
+        [c[:2] for c in columns],
+        qs.values_list(*[c[2] for c in columns]),
+        transform=transform,
+        sheet_name="Orders",
+        widths=18,
+    )
+
+
+def vendor_sales(user, params):
+    columns = [
+        ("Order #", "order_number", "order__order_number"),
+        ("Date", "date", "order__created_at"),
+        ("Product ID", "product_id", "product_id"),
+        ("Product", "product", "product__name"),
+        ("Qty", "quantity", "quantity"),
+        ("Unit Price", "unit_price", "price"),
+        ("Line Total", "line_total", "line_total"),
+        ("Order Status", "order_status", "order__status"),
+        ("Payment Method", "payment_method", "order__payment_method"),
+        ("Payment Status", "payment_status", "order__payment_status"),
+    ]
+    # newest first straight off the (vendor, created_at) index
+    items = vendor_scope.vendor_items(user)
+    start_dt, end_dt = range_from_query(params)
+    if start_dt and end_dt:
+        # same dates as the "Date" column
+        items = items.filter(order__created_at__gte=start_dt, order__created_at__lt=end_dt)
+    values = items.order_by("-created_at", "-id").values_list(*[c[2] for c in columns])
+
+    def transform(row):
+        row = list(row)
+        row[1] = row[1].strftime("%Y-%m-%d %H:%M")
+        return row
+
+    return ExportSpec(
+        "vendor_sales_overall",
+        [c[:2] for c in columns],
+        values,
+        transform=transform,
+        sheet_name="Overall Sales",
+        widths=[14, 18, 12, 40, 8, 12, 12, 14, 16, 16],
+    )
+
+
+def vendor_sales_monthly(user, params):
+    now = timezone.now()
+    start = (now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(days=365))
+
+    # maintained per-vendor rollup: one row per month, however many sales
+    monthly = vendor_rollups.monthly(user, vendor_rollups.month_start(start))
+
+    def transform(r):
+        return [
+            r["month"].strftime("%Y-%m") if r["month"] else "",
+            int(r["orders"] or 0),
+            int(r["units"] or 0),
+            r["revenue"] or Decimal("0.00"),
+        ]
+
+    return ExportSpec(
+        "vendor_sales_monthly",
+        [("Month", "month"), ("Orders", "orders"), ("Units Sold", "units_sold"), ("Revenue", "revenue")],
+        monthly,
+        transform=transform,
+        sheet_name="Monthly Sales",
+        widths=[12, 12, 12, 14],
+    )
+
+
+def _is_admin(user):
+    return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
+
+
+def _is_vendor(user):
+    return bool(user and user.is_authenticated and getattr(user, "role", "") == "vendor")
+
+
+# kind -> (builder, who may run it)
+KINDS = {
+    "admin_orders": (admin_orders, _is_admin),
+    "vendor_sales": (vendor_sales, _is_vendor),
+    "vendor_sales_monthly": (vendor_sales_monthly, _is_vendor),
+}
+
+
+def build(kind, user, params):
+    builder, _ = KINDS[kind]
+    return builder(user, params or {})
+
+
+def allowed(kind, user):
+    entry = KINDS.get(kind)
+    return bool(entry) and entry[1](user)
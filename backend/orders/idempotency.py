@@ -0,0 +1,168 @@
+"""
+Idempotency-Key support for POST endpoints that create orders / payments.
+
+    @idempotent
+    @transaction.atomic
+    def post(self, request): ...
+
+A client (or the load balancer) sends the same `Idempotency-Key` header on
+every retry of one logical request:
+
+- first request: a row is claimed in its own short autocommit transaction
+  (no lock is held while the view runs), the view runs, and a 2xx response
+  is stored
+- retry after success: the stored response is replayed (header
+  `Idempotent-Replayed: true`), the view does not run again
+- retry while the first is still running: 409, try again shortly
+- same key, different body or endpoint: 422
+- non-2xx responses are not stored, so the client can fix and retry
+
+Claims expire after IDEMPOTENCY_LOCK_SECONDS (a crashed request does not
+block the key forever) and rows after IDEMPOTENCY_KEY_TTL_HOURS
+(`manage.py purge_idempotency_keys` deletes them).
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def _lock_seconds():
+    return getattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 60)
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    raw = f"{request.method} {request.path}\n{body}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _error(detail, code, retry_after=None):
+    response = Response({"detail": detail}, status=code)
+    if retry_after:
+        response["Retry-After"] = str(retry_after)
+    return response
+
+
+def _in_progress():
+    return _error(
+        "A request with this Idempotency-Key is still being processed.",
+        status.HTTP_409_CONFLICT,
+        retry_after=1,
+    )
+
+
+def _claim(user, key, path, fp):
+    """
+    (record, None) when this request now owns the key,
+    (None, response) when the caller should return `response` instead.
+    """
+    now = timezone.now()
+    lock_until = now + timedelta(seconds=_lock_seconds())
+
+    try:
+        with transaction.atomic():
+            rec = IdempotencyKey.objects.create(
+                user=user, key=key, path=path, fingerprint=fp, locked_until=lock_until, created_at=now
+            )
+        return rec, None
+    except IntegrityError:
+        pass
+
+    rec = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if rec is None:
+        # deleted between our insert and read (a failed first attempt)
+        return None, _in_progress()
+
+    if rec.created_at < now - _ttl():
+        # Old key reused: start over as a fresh request
+        taken = IdempotencyKey.objects.filter(pk=rec.pk, created_at=rec.created_at).update(
+            path=path, fingerprint=fp, locked_until=lock_until, created_at=now,
+            status_code=None, response_body=None,
+        )
+        return (rec, None) if taken else (None, _in_progress())
+
+    if rec.fingerprint != fp:
+        return None, _error(
+            "This Idempotency-Key was already used for a different request.",
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    if rec.status_code is not None:
+        response = Response(rec.response_body, status=rec.status_code)
+        response["Idempotent-Replayed"] = "true"
+        return None, response
+
+    if rec.locked_until and rec.locked_until > now:
+        return None, _in_progress()
+
+    # The first request died without finishing: take the key over
+    taken = IdempotencyKey.objects.filter(
+        pk=rec.pk, status_code__isnull=True, locked_until=rec.locked_until
+    ).update(locked_until=lock_until)
+    return (rec, None) if taken else (None, _in_progress())
+
+
+def _finish(rec, response):
+    if 200 <= response.status_code < 300:
+        body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+        IdempotencyKey.objects.filter(pk=rec.pk).update(
+            status_code=response.status_code, response_body=body, locked_until=None
+        )
+    else:
+        IdempotencyKey.objects.filter(pk=rec.pk).delete()
+
+
+def idempotent(view_func):
+    """
+    Wrap an APIView method (self, request, ...) or an @api_view function
+    (request, ...). Must sit outside @transaction.atomic.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = args[0] if isinstance(args[0], Request) else args[1]
+
+        key = (request.headers.get(HEADER) or "").strip()
+        if not key:
+            return view_func(*args, **kwargs)
+        if len(key) > 255:
+            return _error("Idempotency-Key is too long (max 255).", status.HTTP_400_BAD_REQUEST)
+
+        user = request.user if request.user.is_authenticated else None
+        rec, early = _claim(user, key, request.path, fingerprint(request))
+        if early is not None:
+            return early
+
+        try:
+            response = view_func(*args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=rec.pk).delete()
+            raise
+
+        _finish(rec, response)
+        return response
+
+    return wrapper
+
+
+def purge_expired(now=None):
+    now = now or timezone.now()
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=now - _ttl()).delete()
+    return deleted
@@ -0,0 +1,503 @@
+"""
+Invoice PDFs, rendered once per order state.
+
+The PDF only depends on the order row and its items. Order.save() bumps
+`updated_at` (auto_now) and so does every OrderItem save()/delete()
+(orders.signals), so `order.id` + `updated_at` is a version key:
+
+    invoices/<order id>/<updated_at in µs>-<hmac>.pdf
+
+in the INVOICE_STORAGE_ALIAS storage (MEDIA_ROOT by default). A download
+serves the stored file (rendering it first if this version isn't there
+yet) with an ETag, so repeat clicks cost a file read or a 304. Rendering a
+new version deletes the older files of that order. Queryset update()s
+and bulk writes of items bypass the signals; touch the order after them.
+
+Orders moving to confirmed / shipped / delivered are pre-rendered in the
+background (`schedule`, a small per-process thread pool of
+INVOICE_RENDER_WORKERS) so the first download usually finds the file ready.
+A download that races a pending render waits up to INVOICE_WAIT_SECONDS
+for it, then renders inline.
+
+`iter_invoice_zip` streams many invoices as one ZIP (admin bulk export):
+cached PDFs are copied straight in, missing ones are rendered across a
+process pool of INVOICE_EXPORT_PROCESSES and stored on the way. The pool is
+started on the first export and shared by every export of the process
+(0 processes renders in-process).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date, quote_etag
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+from core.streaming import ZipSink
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "invoices"
+
+
+def _money(val):
+    try:
+        return f"{Decimal(val):,.2f}"
+    except Exception:
+        try:
+            return f"{Decimal(str(val)):,.2f}"
+        except Exception:
+            return "0.00"
+
+
+def build_invoice_pdf(order) -> bytes:
+    """
+    Generates a clean PDF invoice for an Order and returns raw PDF bytes.
+    Long product names wrap inside their column.
+    """
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36,
+        title=f"Invoice {order.order_number}",
+        author="Urban Cart",
+    )
+
+    styles = getSampleStyleSheet()
+
+    # ✅ Wrap style for long product names
+    item_name_style = ParagraphStyle(
+        "ItemName",
+        parent=styles["BodyText"],
+        fontName="Helvetica",
+        fontSize=9,
+        leading=11,
+        wordWrap="CJK",
+    )
+
+    story = []
+
+    # Header
+    story.append(Paragraph("<b>Urban Cart</b>", styles["Title"]))
+    story.append(Paragraph(f"<b>Invoice:</b> {order.order_number}", styles["BodyText"]))
+    story.append(Spacer(1, 10))
+
+    # Order meta
+    created = (
+        timezone.localtime(order.created_at).strftime("%Y-%m-%d %H:%M")
+        if getattr(order, "created_at", None) else ""
+    )
+    meta_lines = [
+        f"<b>Order ID:</b> {order.id}",
+        f"<b>Date:</b> {created}",
+        f"<b>Status:</b> {order.status}",
+        f"<b>Payment:</b> {order.payment_method} ({order.payment_status})",
+    ]
+    for line in meta_lines:
+        story.append(Paragraph(line, styles["BodyText"]))
+    story.append(Spacer(1, 12))
+
+    # Shipping / Customer info
+    story.append(Paragraph("<b>Shipping Details</b>", styles["Heading3"]))
+    ship_lines = [
+        f"<b>Name:</b> {escape(order.shipping_name or '')}",
+        f"<b>Phone:</b> {escape(order.phone or '')}",
+        f"<b>City:</b> {escape(order.city or '')}",
+        f"<b>Address:</b> {escape(order.address or '')}",
+    ]
+    if order.note:
+        ship_lines.append(f"<b>Note:</b> {escape(order.note)}")
+    for line in ship_lines:
+        story.append(Paragraph(line, styles["BodyText"]))
+    story.append(Spacer(1, 14))
+
+    # Items table
+    story.append(Paragraph("<b>Items</b>", styles["Heading3"]))
+    data = [["#", "Product", "SKU", "Qty", "Unit Price", "Line Total"]]
+
+    for idx, it in enumerate(order.items.all(), start=1):
+        data.append([
+            str(idx),
+            Paragraph(escape(it.name or "Item"), item_name_style),  # ✅ wraps
+            it.sku or "",
+            str(it.quantity),
+            _money(it.price),
+            _money(it.line_total),
+        ])
+
+    table = Table(data, colWidths=[24, 220, 90, 40, 80, 80])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 10),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 1), (-1, -1), 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
+
+        # ✅ TOP alignment looks best when product wraps into multiple lines
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("TOPPADDING", (0, 1), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 1), (-1, -1), 6),
+    ]))
+    story.append(table)
+    story.append(Spacer(1, 14))
+
+    # Totals table
+    totals = [
+        ["Subtotal", _money(order.subtotal)],
+        ["Discount", f"-{_money(order.discount_total)}"],
+        ["Shipping", _money(order.shipping_fee)],
+        ["Total", _money(order.total)],
+    ]
+    totals_table = Table(totals, colWidths=[120, 120])
+    totals_table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -2), "Helvetica"),
+        ("FONTSIZE", (0, 0), (-1, -2), 10),
+        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+        ("FONTSIZE", (0, -1), (-1, -1), 11),
+        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.whitesmoke),
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]))
+    story.append(totals_table)
+    story.append(Spacer(1, 16))
+
+    # Footer
+    story.append(Paragraph("Thank you for shopping with Urban Cart.", styles["Italic"]))
+
+    doc.build(story)
+    pdf = buf.getvalue()
+    buf.close()
+    return pdf
+
+
+# ======================
+# Stored copies
+# ======================
+def storage():
+    return storages[getattr(settings, "INVOICE_STORAGE_ALIAS", "default")]
+
+
+def version(order):
+    return int(order.updated_at.timestamp() * 1_000_000)
+
+
+def invoice_name(order):
+    # MEDIA_ROOT may be publicly served: the HMAC keeps file names unguessable
+    v = version(order)
+    sig = salted_hmac("orders.invoice", f"{order.id}:{v}").hexdigest()[:20]
+    return f"{PREFIX}/{order.id}/{v}-{sig}.pdf"
+
+
+def _write(store, name, pdf):
+    try:
+        path = store.path(name)
+    except NotImplementedError:
+        # remote storage: a plain save is enough, readers only see finished objects
+        saved = store.save(name, ContentFile(pdf))
+        if saved != name:  # another worker stored the same version first
+            store.delete(saved)
+        return
+
+    # local disk: write aside and rename, so nobody streams a half-written file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(pdf)
+    os.replace(tmp, path)
+
+
+def _drop_stale(store, order_id, keep):
+    folder = f"{PREFIX}/{order_id}"
+    try:
+        _, files = store.listdir(folder)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for fname in files:
+        if fname != keep and fname.endswith(".pdf"):
+            store.delete(f"{folder}/{fname}")
+
+
+def is_rendered(order):
+    return storage().exists(invoice_name(order))
+
+
+def render(order, force=False):
+    """
+    Make sure this order version is stored. Returns the storage name.
+    """
+    store = storage()
+    name = invoice_name(order)
+    if force or not store.exists(name):
+        _store(store, order, build_invoice_pdf(order))
+    return name
+
+
+def _store(store, order, pdf):
+    name = invoice_name(order)
+    _write(store, name, pdf)
+    _drop_stale(store, order.id, keep=name.rsplit("/", 1)[-1])
+
+
+def delete(order_id):
+    _drop_stale(storage(), order_id, keep=None)
+
+
+# ======================
+# Background pre-rendering
+# ======================
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = {}  # order id -> Future of a queued / running render
+
+
+def _executor():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        # forked workers must not share the parent's pool threads
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, "INVOICE_RENDER_WORKERS", 2),
+            thread_name_prefix="invoice-render",
+        )
+        _pool_pid = pid
+        _pending.clear()
+    return _pool
+
+
+def _prerender(order_id):
+    order = Order.objects.prefetch_related("items").filter(pk=order_id).first()
+    if order is not None:
+        render(order)
+
+
+def _task(order_id):
+    try:
+        _prerender(order_id)
+    except Exception:
+        logger.exception("Pre-rendering invoice for order %s failed", order_id)
+    finally:
+        with _pool_lock:
+            _pending.pop(order_id, None)
+        connection.close()  # this pool thread's own connection
+
+
+def _submit(order_id):
+    with _pool_lock:
+        queued = _pending.get(order_id)
+        if queued is not None and not queued.running():
+            # not started yet: it will read the latest order version anyway
+            return queued
+        future = _executor().submit(_task, order_id)
+        _pending[order_id] = future
+        return future
+
+
+def schedule(order_id):
+    """
+    Pre-render this order's invoice once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _submit(order_id))
+
+
+def _wait_for_pending(order_id):
+    with _pool_lock:
+        future = _pending.get(order_id)
+    if future is None:
+        return
+    try:
+        future.result(timeout=getattr(settings, "INVOICE_WAIT_SECONDS", 5))
+    except Exception:
+        pass  # timed out / failed: render inline
+
+
+def invoice_response(request, order):
+    """
+    File response for the stored invoice, or 304 when the client has it.
+    `order` should come with `items` prefetched.
+    """
+    etag = quote_etag(f"invoice-{order.id}-{version(order)}")
+    if_none_match = request.headers.get("If-None-Match") or ""
+    if etag in [t.strip() for t in if_none_match.split(",")]:
+        response = HttpResponseNotModified()
+    else:
+        if not is_rendered(order):
+            _wait_for_pending(order.id)
+        name = render(order)  # no-op when the file is ready
+        response = FileResponse(
+            storage().open(name, "rb"),
+            content_type="application/pdf",
+            as_attachment=True,
+            filename=f"invoice-{order.order_number}.pdf",
+        )
+        response["Last-Modified"] = http_date(order.updated_at.timestamp())
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=0, must-revalidate"
+    return response
+
+
+# ======================
+# Bulk export (streamed ZIP)
+# ======================
+def _export_processes():
+    default = min(4, os.cpu_count() or 1)
+    return max(int(getattr(settings, "INVOICE_EXPORT_PROCESSES", default)), 0)
+
+
+_render_pool = None
+_render_pool_pid = None
+
+
+def _render_executor(workers):
+    """
+    The process pool exports render on, started once and then reused.
+    """
+    global _render_pool, _render_pool_pid
+    pid = os.getpid()
+    with _pool_lock:
+        if _render_pool is None or _render_pool_pid != pid:
+            # spawn: children start clean (no inherited DB connections); django.setup
+            # only loads settings for them, `_submit_render` sends every order
+            # with its items already loaded so they never run a query
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+            _render_pool_pid = pid
+        return _render_pool
+
+
+def _drop_render_pool(pool):
+    # a worker died: the pool can't be used again, the next export starts a new one
+    global _render_pool
+    with _pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_render(pool, order):
+    """
+    Future rendering `order` on the shared pool, or None to render it
+    in-process (no pool configured, or the pool broke).
+    """
+    if pool is None or _render_pool is not pool:
+        return None
+    if "items" not in getattr(order, "_prefetched_objects_cache", {}):
+        # a child would query its own (settings) database for them
+        prefetch_related_objects([order], "items")
+    try:
+        return pool.submit(build_invoice_pdf, order)
+    except BrokenProcessPool:
+        _drop_render_pool(pool)
+        return None
+
+
+def iter_invoice_zip(orders):
+    """
+    Yield a ZIP of invoice-<order number>.pdf for `orders` (items prefetched),
+    one chunk per finished entry. Only a bounded window of PDFs is in memory.
+    """
+    store = storage()
+    sink = ZipSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)  # PDFs are compressed already
+    failed = []
+
+    def entry(order, pdf):
+        info = zipfile.ZipInfo(
+            f"invoice-{order.order_number or order.id}.pdf",
+            date_time=timezone.localtime(order.updated_at).timetuple()[:6],
+        )
+        archive.writestr(info, pdf)
+        return sink.take()
+
+    workers = _export_processes()
+    pool = _render_executor(workers) if workers else None
+    pending = {}
+
+    def finished(futures):
+        for future in futures:
+            order = pending.pop(future)
+            try:
+                pdf = future.result()
+            except BrokenProcessPool:
+                logger.exception("Invoice render pool broke on order %s", order.id)
+                _drop_render_pool(pool)
+                failed.append(order)
+                continue
+            except Exception:
+                logger.exception("Rendering invoice for order %s failed", order.id)
+                failed.append(order)
+                continue
+            _store(store, order, pdf)
+            yield entry(order, pdf)
+
+    try:
+        for order in orders:
+            name = invoice_name(order)
+            if store.exists(name):
+                with store.open(name, "rb") as fh:
+                    yield entry(order, fh.read())
+                continue
+
+            future = _submit_render(pool, order)
+            if future is None:
+                pdf = build_invoice_pdf(order)
+                _store(store, order, pdf)
+                yield entry(order, pdf)
+                continue
+
+            pending[future] = order
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+
+        if failed:
+            archive.writestr(
+                "errors.txt",
+                "Invoices that could not be rendered:\n"
+                + "".join(f"{o.order_number or o.id}\n" for o in failed),
+            )
+        archive.close()
+        yield sink.take()
+    finally:
+        # client went away mid-download: don't render the rest of this export
+        # (the pool itself stays up for the next one)
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from orders import vendor_rollups, vendor_scope
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill OrderItem.vendor from the product's vendor on legacy rows, "
+        "then rebuild the vendor rollups if anything changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=vendor_scope.BACKFILL_BATCH_SIZE,
+            help="Order items updated per UPDATE statement.",
+        )
+
+    def handle(self, *args, **options):
+        updated = vendor_scope.backfill(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Backfilled vendor on {updated} order item(s)."))
+        if updated:
+            rows = vendor_rollups.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} vendor sales rollup row(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders import idempotency
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL_HOURS."
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} idempotency key(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute DailySalesRollup (admin analytics) from the orders table. "
+        "Needed after bulk edits that bypass Order.save()."
+    )
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily sales rollup row(s)."))
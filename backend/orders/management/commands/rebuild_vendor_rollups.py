@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders import vendor_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute VendorSalesRollup / VendorOrderRollup (vendor dashboards) from order items. "
+        "Needed after bulk edits that bypass save()/delete() or after moving products between vendors."
+    )
+
+    def handle(self, *args, **options):
+        rows = vendor_rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} vendor sales rollup row(s)."))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import export_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run export jobs that are still pending or whose worker died (lease "
+        "expired), then evict expired / over-quota export files. Jobs normally "
+        "start in the web process; use --watch to keep this running as a safety net."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Run forever.")
+        parser.add_argument("--interval", type=int, default=30, help="Seconds between passes in watch mode.")
+
+    def _pass(self):
+        ran = sum(1 for job_id in export_jobs.runnable_ids() if export_jobs.run(job_id))
+        evicted = export_jobs.evict()
+        return ran, evicted
+
+    def handle(self, *args, **options):
+        if not options["watch"]:
+            ran, evicted = self._pass()
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} export job(s), evicted {evicted} file(s)."))
+            return
+
+        interval = max(1, options["interval"])
+        while True:
+            ran, evicted = self._pass()
+            if ran or evicted:
+                self.stdout.write(
+                    f"[{timezone.now():%Y-%m-%d %H:%M:%S}] Ran {ran} export job(s), evicted {evicted} file(s)."
+                )
+            time.sleep(interval)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.mail import dispatcher
+from orders import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued order emails (EmailOutbox) in batches over the pooled "
+        "SMTP connection of core.mail. Use --watch to keep polling. For local testing "
+        "point EMAIL_HOST/EMAIL_PORT at a debugging server, e.g. "
+        "`python -m aiosmtpd -n -l localhost:1025`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--watch", action="store_true", help="Run forever as a worker.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        if not options["watch"]:
+            total_sent, total_failed = 0, 0
+            while True:
+                sent, failed = outbox.drain(batch_size)
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} email(s), {total_failed} failed."))
+            self.stdout.write(f"Mail stats: {dispatcher.stats()}")
+            return
+
+        while True:
+            sent, failed = outbox.drain(batch_size)
+            if sent or failed:
+                stats = dispatcher.stats()
+                self.stdout.write(
+                    f"[{timezone.now():%Y-%m-%d %H:%M:%S}] Sent {sent} email(s), {failed} failed. "
+                    f"({stats['throughputPerMinute']}/min, avg latency {stats['avgLatencyMs']} ms, "
+                    f"{stats['connectionsOpened']} connection(s) opened)"
+                )
+                continue
+            time.sleep(max(0.1, options["interval"]))
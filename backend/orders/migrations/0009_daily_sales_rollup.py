@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+from orders import rollups
+
+
+def build_sales_rollups(apps, schema_editor):
+    rollups.rebuild(apps.get_model("orders", "Order"), apps.get_model("orders", "DailySalesRollup"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('unpaid', 'Unpaid'), ('paid', 'Paid'), ('refunded', 'Refunded')], max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'payment_status'), name='dailysales_unique_key')],
+            },
+        ),
+        migrations.RunPython(build_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-17 14:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from orders import vendor_rollups
+
+
+def build_vendor_rollups(apps, schema_editor):
+    vendor_rollups.rebuild(
+        apps.get_model("orders", "OrderItem"),
+        apps.get_model("orders", "VendorSalesRollup"),
+        apps.get_model("orders", "VendorOrderRollup"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_stock_reservations'),
+        ('orders', '0009_daily_sales_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'month', 'status'), name='vendororders_unique_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], max_length=20)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'month', 'status', 'product'), name='vendorsales_unique_key')],
+            },
+        ),
+        migrations.RunPython(build_vendor_rollups, migrations.RunPython.noop),
+    ]
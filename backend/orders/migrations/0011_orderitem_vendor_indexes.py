@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 15:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+from orders import vendor_rollups, vendor_scope
+
+
+def backfill_item_vendors(apps, schema_editor):
+    item_model = apps.get_model("orders", "OrderItem")
+    if vendor_scope.backfill(item_model=item_model, product_model=apps.get_model("catalog", "Product")):
+        vendor_rollups.rebuild(
+            item_model,
+            apps.get_model("orders", "VendorSalesRollup"),
+            apps.get_model("orders", "VendorOrderRollup"),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_stock_reservations'),
+        ('orders', '0010_vendor_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['vendor', 'created_at'], name='orderitem_vendor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['vendor', 'order'], name='orderitem_vendor_order_idx'),
+        ),
+        migrations.RunPython(backfill_item_vendors, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,12 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from core.snapshots import LoadSnapshotMixin
 
-class Order(models.Model):
+from . import rollups, vendor_rollups
+
+
+class Order(LoadSnapshotMixin, models.Model):
     class Status(models.TextChoices):
         PENDING = "pending", "Pending"
         CONFIRMED = "confirmed", "Confirmed"
@@ -61,6 +65,12 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Sales buckets as stored, so orders.signals can move them in the rollups
+    load_snapshots = {
+        "_sales_key": (rollups.SOURCE_FIELDS, rollups.sales_key),
+        "_vendor_key": (vendor_rollups.ORDER_FIELDS, vendor_rollups.order_key),
+    }
+
     def _generate_order_number(self):
         return f"UC-{self.id:06d}"
 
@@ -72,7 +82,69 @@ class Order(models.Model):
             super().save(update_fields=["order_number"])
 
 
-class OrderItem(models.Model):
+class DailySalesRollup(models.Model):
+    """
+    Orders and revenue per local day / status / payment status,
+    maintained on every Order save (see orders/rollups.py).
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    payment_status = models.CharField(max_length=20, choices=Order.PaymentStatus.choices)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status", "payment_status"], name="dailysales_unique_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}/{self.payment_status}: {self.orders} ({self.revenue})"
+
+
+class VendorSalesRollup(models.Model):
+    """
+    Units and revenue per vendor / local month / order status / product,
+    maintained on order item and order writes (see orders/vendor_rollups.py).
+    """
+    vendor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    month = models.DateField()  # first day of the month
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    product = models.ForeignKey("catalog.Product", on_delete=models.CASCADE, related_name="+")
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["vendor", "month", "status", "product"], name="vendorsales_unique_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} {self.month:%Y-%m} {self.status} #{self.product_id}: {self.units} ({self.revenue})"
+
+
+class VendorOrderRollup(models.Model):
+    """
+    Orders containing at least one of the vendor's products, per vendor /
+    local month / order status (see orders/vendor_rollups.py).
+    """
+    vendor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    month = models.DateField()  # first day of the month
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "month", "status"], name="vendororders_unique_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} {self.month:%Y-%m} {self.status}: {self.orders}"
+
+
+class OrderItem(LoadSnapshotMixin, models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
 
     product = models.ForeignKey("catalog.Product", on_delete=models.PROTECT)
@@ -92,6 +164,16 @@ class OrderItem(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Vendor scoping goes through OrderItem.vendor (see orders/vendor_scope.py)
+        indexes = [
+            models.Index(fields=["vendor", "created_at"], name="orderitem_vendor_created_idx"),
+            models.Index(fields=["vendor", "order"], name="orderitem_vendor_order_idx"),
+        ]
+
+    # The line as stored, so orders.signals can move it in VendorSalesRollup
+    load_snapshots = {"_line_key": (vendor_rollups.ITEM_FIELDS, vendor_rollups.line_key)}
+
 
 class OrderStatusHistory(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="status_history")
@@ -104,3 +186,109 @@ class OrderStatusHistory(models.Model):
 
     class Meta:
         ordering = ["-changed_at"]
+
+
+class IdempotencyKey(models.Model):
+    """
+    One row per client Idempotency-Key (see orders/idempotency.py).
+    `locked_until` is set while the first request runs; the stored response
+    is replayed to retries once it finished.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
+    )
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+
+    locked_until = models.DateTimeField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_user_key"),
+        ]
+        indexes = [models.Index(fields=["created_at"], name="idempotency_created_idx")]
+
+
+class EmailOutbox(models.Model):
+    """
+    Order emails queued in the same transaction as the change that caused
+    them; `manage.py send_outbox_emails` delivers them (see orders/outbox.py).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default="")
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx")]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} ({self.status})"
+
+
+class ExportJob(models.Model):
+    """
+    A large export built in the background (see orders/export_jobs.py);
+    the finished file is kept in storage until `expires_at`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+        EXPIRED = "expired", "Expired"
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="export_jobs")
+    kind = models.CharField(max_length=40)
+    format = models.CharField(max_length=10, default="xlsx")
+    params = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file = models.CharField(max_length=255, blank=True, default="")  # storage name
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "finished_at"], name="exportjob_status_idx"),
+            models.Index(fields=["user", "created_at"], name="exportjob_user_idx"),
+        ]
+
+    @property
+    def progress(self):
+        if self.status in (self.Status.DONE, self.Status.EXPIRED):
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+    def __str__(self):
+        return f"{self.kind}.{self.format} #{self.pk} ({self.status})"
@@ -0,0 +1,107 @@
+"""
+Transactional outbox for order emails.
+
+Signals only INSERT an EmailOutbox row, inside the transaction that
+created the order / status change, so a rollback drops the email too and
+no request waits on SMTP. `manage.py send_outbox_emails` drains due rows
+in batches through core.mail (one pooled SMTP connection), retrying
+failures with exponential backoff until OUTBOX_MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import F
+from django.utils import timezone
+
+from core.mail import dispatcher
+
+from .models import EmailOutbox
+
+# Rows claimed by a worker are hidden from other workers this long
+LEASE = timedelta(minutes=5)
+
+
+def _max_attempts():
+    return getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(30 * (2 ** max(attempts - 1, 0)), 3600))
+
+
+def enqueue(to_email, subject, body, html_body=""):
+    if not to_email:
+        return None
+    return EmailOutbox.objects.create(
+        to_email=to_email, subject=subject[:255], body=body, html_body=html_body or ""
+    )
+
+
+def _claim(batch_size, now):
+    """
+    Lease up to `batch_size` due rows for this worker.
+    """
+    due = list(
+        EmailOutbox.objects.filter(status=EmailOutbox.Status.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+
+    lease_until = now + LEASE
+    EmailOutbox.objects.filter(id__in=due, next_attempt_at__lte=now).update(
+        next_attempt_at=lease_until, attempts=F("attempts") + 1
+    )
+    # Rows another worker leased first keep their own lease timestamp
+    return list(EmailOutbox.objects.filter(id__in=due, next_attempt_at=lease_until).order_by("id"))
+
+
+def _message(row):
+    msg = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        to=[row.to_email],
+    )
+    if row.html_body:
+        msg.attach_alternative(row.html_body, "text/html")
+    return msg
+
+
+def _failed(row, error, now):
+    give_up = row.attempts >= _max_attempts()
+    EmailOutbox.objects.filter(pk=row.pk).update(
+        status=EmailOutbox.Status.FAILED if give_up else EmailOutbox.Status.PENDING,
+        next_attempt_at=now + _backoff(row.attempts),
+        last_error=str(error)[:2000],
+    )
+
+
+def drain(batch_size=50):
+    """
+    Send one batch. Returns (sent, failed).
+    """
+    now = timezone.now()
+    rows = _claim(batch_size, now)
+    if not rows:
+        return 0, 0
+
+    # Hand the whole batch to the dispatcher at once, then collect results
+    futures = [(row, dispatcher.submit(_message(row))) for row in rows]
+
+    sent, failed = 0, 0
+    for row, future in futures:
+        try:
+            future.result(timeout=getattr(settings, "MAIL_SEND_TIMEOUT", 30))
+        except Exception as e:
+            _failed(row, e, now)
+            failed += 1
+        else:
+            EmailOutbox.objects.filter(pk=row.pk).update(
+                status=EmailOutbox.Status.SENT, sent_at=timezone.now(), last_error=""
+            )
+            sent += 1
+
+    return sent, failed
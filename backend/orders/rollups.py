@@ -0,0 +1,96 @@
+"""
+Maintained sales totals for admin analytics.
+
+DailySalesRollup keeps one row per (day, status, payment_status) with the
+number of orders and the sum of their totals. Every Order save moves the
+order from its old bucket to its new one (orders.signals), so "today",
+"this month" or any date range is a handful of rollup rows instead of a
+scan over orders. Days are local dates in the default TIME_ZONE, the same
+boundaries the analytics windows use.
+
+Only changes made through Order.save()/delete() are tracked; after bulk
+edits run `manage.py rebuild_sales_rollups`.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Fields that decide an order's bucket and weight
+SOURCE_FIELDS = {"created_at", "status", "payment_status", "total"}
+
+
+def _day(dt):
+    return timezone.localtime(dt, timezone.get_default_timezone()).date()
+
+
+def sales_key(order):
+    """
+    (day, status, payment_status, total) of an order, or None before it was saved.
+    """
+    if not order.created_at:
+        return None
+    return (_day(order.created_at), order.status, order.payment_status, Decimal(str(order.total or 0)))
+
+
+def _bump(day, status, payment_status, orders, revenue):
+    from .models import DailySalesRollup
+
+    qs = DailySalesRollup.objects.filter(day=day, status=status, payment_status=payment_status)
+    if qs.update(orders=F("orders") + orders, revenue=F("revenue") + revenue):
+        return
+    if orders < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(
+                day=day, status=status, payment_status=payment_status, orders=orders, revenue=revenue
+            )
+    except IntegrityError:
+        qs.update(orders=F("orders") + orders, revenue=F("revenue") + revenue)
+
+
+def apply_change(old_key, new_key):
+    """
+    Move one order from its old bucket to its new one.
+    """
+    if old_key == new_key:
+        return
+    if old_key:
+        day, status, payment_status, total = old_key
+        _bump(day, status, payment_status, -1, -total)
+    if new_key:
+        day, status, payment_status, total = new_key
+        _bump(day, status, payment_status, +1, total)
+
+
+def rebuild(order_model=None, rollup_model=None):
+    """
+    Recompute every DailySalesRollup row from orders. Returns number of rows.
+    """
+    if order_model is None or rollup_model is None:
+        from .models import DailySalesRollup, Order
+
+        order_model = order_model or Order
+        rollup_model = rollup_model or DailySalesRollup
+
+    grouped = (
+        order_model.objects
+        .annotate(day=TruncDate("created_at", tzinfo=timezone.get_default_timezone()))
+        .values("day", "status", "payment_status")
+        .annotate(n=Count("id"), revenue=Sum("total"))
+        .order_by()
+    )
+    rows = [
+        rollup_model(
+            day=r["day"], status=r["status"], payment_status=r["payment_status"],
+            orders=r["n"], revenue=r["revenue"] or Decimal("0.00"),
+        )
+        for r in grouped
+    ]
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -98,12 +98,15 @@ class VendorOrderSerializer(serializers.ModelSerializer):
         ]
 
     def get_items(self, obj):
-        request = self.context.get("request")
-        vendor = getattr(request, "user", None) if request else None
-
-        qs = obj.items.all().select_related("product")
-        if vendor and getattr(vendor, "is_authenticated", False):
-            qs = qs.filter(product__vendor=vendor)
+        # Prefetched by vendor_scope.with_vendor_items (no query per order)
+        qs = getattr(obj, "vendor_items", None)
+        if qs is None:
+            request = self.context.get("request")
+            vendor = getattr(request, "user", None) if request else None
+
+            qs = obj.items.all().select_related("product")
+            if vendor and getattr(vendor, "is_authenticated", False):
+                qs = qs.filter(vendor=vendor)
 
         return VendorOrderItemSerializer(qs, many=True, context=self.context).data
 
@@ -1,8 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
+from catalog import reservations
+
+from . import invoices, rollups, vendor_rollups
 from .emails import send_order_placed_email, send_order_status_email
-from .models import Order
+from .models import Order, OrderItem
 
 # If you have a different model name, adjust this import:
 # Example: OrderStatusHistory, StatusHistory, OrderHistory, etc.
@@ -19,6 +23,105 @@ def order_created_email(sender, instance, created, **kwargs):
         send_order_placed_email(instance)
 
 
+# =========================
+# Daily sales rollup
+# =========================
+@receiver(pre_save, sender=Order)
+def order_sales_snapshot(sender, instance, raw=False, **kwargs):
+    # Normally Order.from_db already took the snapshots; only partially
+    # loaded instances need the stored row here.
+    if raw or instance._state.adding:
+        return
+    if hasattr(instance, "_sales_key") and hasattr(instance, "_vendor_key"):
+        return
+    old = Order.objects.filter(pk=instance.pk).first()
+    instance._sales_key = rollups.sales_key(old) if old else None
+    instance._vendor_key = vendor_rollups.order_key(old) if old else None
+
+
+@receiver(post_save, sender=Order)
+def order_sales_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_key = rollups.sales_key(instance)
+    rollups.apply_change(None if created else getattr(instance, "_sales_key", None), new_key)
+    instance._sales_key = new_key
+
+
+@receiver(post_delete, sender=Order)
+def order_sales_remove(sender, instance, **kwargs):
+    old_key = getattr(instance, "_sales_key", None)
+    if old_key is None:
+        old_key = rollups.sales_key(instance)
+    rollups.apply_change(old_key, None)
+
+
+# =========================
+# Vendor sales rollups
+# =========================
+@receiver(post_save, sender=Order)
+def order_vendor_rollup(sender, instance, created, raw=False, **kwargs):
+    # A new order has no items yet; later saves move its lines when month/status change
+    if raw:
+        return
+    new_key = vendor_rollups.order_key(instance)
+    if not created:
+        vendor_rollups.move_order(instance.pk, getattr(instance, "_vendor_key", None), new_key)
+    instance._vendor_key = new_key
+
+
+@receiver(pre_delete, sender=Order)
+def order_vendor_remove(sender, instance, **kwargs):
+    # Before the cascade: the items are still there to be counted out
+    old_key = getattr(instance, "_vendor_key", None) or vendor_rollups.order_key(instance)
+    vendor_rollups.move_order(instance.pk, old_key, None)
+
+
+@receiver(pre_save, sender=OrderItem)
+def item_line_snapshot(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or hasattr(instance, "_line_key"):
+        return
+    old = OrderItem.objects.filter(pk=instance.pk).first()
+    instance._line_key = vendor_rollups.line_key(old) if old else None
+
+
+@receiver(post_save, sender=OrderItem)
+def item_vendor_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_line = vendor_rollups.line_key(instance)
+    vendor_rollups.apply_change(
+        instance.order_id, None if created else getattr(instance, "_line_key", None), new_line
+    )
+    instance._line_key = new_line
+
+
+@receiver(post_delete, sender=OrderItem)
+def item_vendor_remove(sender, instance, origin=None, **kwargs):
+    # Items deleted along with their order were already taken out by
+    # order_vendor_remove; queryset deletes need rebuild_vendor_rollups.
+    if origin is not instance:
+        return
+    old_line = getattr(instance, "_line_key", None) or vendor_rollups.line_key(instance)
+    vendor_rollups.apply_change(instance.order_id, old_line, None)
+
+
+@receiver(post_delete, sender=Order)
+def order_invoice_cleanup(sender, instance, **kwargs):
+    # Stored invoice PDFs are keyed by order id; drop them with the order
+    invoices.delete(instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def item_touch_order(sender, instance, raw=False, origin=None, **kwargs):
+    # Invoices are versioned by Order.updated_at: an item edit is an order change.
+    # update() keeps the Order signals (rollups, emails) out of it.
+    if raw or (origin is not None and origin is not instance):
+        return
+    Order.objects.filter(pk=instance.order_id).update(updated_at=timezone.now())
+
+
 if OrderStatusHistory:
     @receiver(post_save, sender=OrderStatusHistory)
     def status_history_email(sender, instance, created, **kwargs):
@@ -40,3 +143,21 @@ if OrderStatusHistory:
             return
 
         send_order_status_email(order, status=status, note=note, changed_by=changed_by)
+
+
+if OrderStatusHistory:
+    @receiver(post_save, sender=OrderStatusHistory)
+    def status_history_release_stock(sender, instance, created, **kwargs):
+        # Cancelled / refunded before payment: give held stock back right away
+        if created and instance.status in (Order.Status.CANCELLED, Order.Status.REFUNDED):
+            reservations.release(instance.order_id)
+
+
+if OrderStatusHistory:
+    @receiver(post_save, sender=OrderStatusHistory)
+    def status_history_prerender_invoice(sender, instance, created, **kwargs):
+        # Customers download invoices from here on: have the PDF ready before they click
+        if created and instance.status in (
+            Order.Status.CONFIRMED, Order.Status.SHIPPED, Order.Status.DELIVERED
+        ):
+            invoices.schedule(instance.order_id)
@@ -1,3 +1,546 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from catalog.models import Product
+from core import streaming
+from core.mail import dispatcher
+
+from .models import (
+    DailySalesRollup, EmailOutbox, ExportJob, IdempotencyKey, Order, OrderItem, OrderStatusHistory,
+    VendorOrderRollup, VendorSalesRollup,
+)
+from . import export_jobs, invoices, outbox, rollups, vendor_rollups, vendor_scope
+from .idempotency import HEADER, idempotent
+
+User = get_user_model()
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com", password="x")
+
+    def _order(self):
+        return Order.objects.create(
+            user=self.user, shipping_name="n", phone="1", address="a", city="c", total=10
+        )
+
+    def test_order_changes_queue_instead_of_sending(self):
+        order = self._order()
+        OrderStatusHistory.objects.create(order=order, status=Order.Status.CONFIRMED)
+
+        self.assertEqual(len(mail.outbox), 0)
+        subjects = list(EmailOutbox.objects.order_by("id").values_list("subject", flat=True))
+        self.assertEqual(len(subjects), 2)
+        self.assertIn(order._generate_order_number(), subjects[0])
+
+    def test_drain_reuses_pooled_connection(self):
+        for _ in range(3):
+            self._order()
+        opened = dispatcher.stats()["connectionsOpened"]
+
+        self.assertEqual(outbox.drain(batch_size=2), (2, 0))
+        self.assertEqual(outbox.drain(batch_size=2), (1, 0))
+        self.assertLessEqual(dispatcher.stats()["connectionsOpened"] - opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_failed_send_is_retried_later(self):
+        self._order()
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            self.assertEqual(outbox.drain(), (0, 1))
+
+        row = EmailOutbox.objects.get()
+        self.assertEqual(row.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(row.attempts, 1)
+        self.assertIn("down", row.last_error)
+        self.assertEqual(outbox.drain(), (0, 0))  # backing off
+
+    def test_admin_mail_stats_say_they_are_per_process(self):
+        self.client.force_login(User.objects.create_user(email="admin@example.com", password="x", is_staff=True))
+        data = self.client.get("/api/admin/mail/stats/").json()
+        self.assertEqual((data["scope"], data["pid"]), ("process", os.getpid()))
+
+
+class InvoiceCacheTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(email="buyer@example.com", password="x")
+        self.order = Order.objects.create(
+            user=self.user, shipping_name="n", phone="1", address="a", city="c", total=10
+        )
+        token = AccessToken.for_user(self.user)
+        self.url = f"/api/orders/my/{self.order.id}/invoice/?token={token}"
+
+    def test_rendered_once_per_order_version(self):
+        with mock.patch("orders.invoices.build_invoice_pdf", wraps=invoices.build_invoice_pdf) as build:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            self.assertEqual(build.call_count, 1)
+
+            etag = first["ETag"]
+            self.assertEqual(second["ETag"], etag)
+            self.assertTrue(b"".join(first.streaming_content).startswith(b"%PDF"))
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            self.order.status = Order.Status.CONFIRMED
+            self.order.save()
+            changed = self.client.get(self.url)
+            self.assertEqual(build.call_count, 2)
+            self.assertNotEqual(changed["ETag"], etag)
+
+        _, files = invoices.storage().listdir(f"invoices/{self.order.id}")
+        self.assertEqual(len(files), 1)  # the stale version was dropped
+
+    def test_item_edits_start_a_new_invoice_version(self):
+        product = Product.objects.create(name="Lamp", price=10, stock=5)
+        item = OrderItem.objects.create(order=self.order, product=product, name="Lamp", price=10,
+                                        quantity=1, line_total=10)
+        etag = self.client.get(self.url)["ETag"]
+
+        item.quantity, item.line_total = 2, 20
+        item.save()
+        edited = self.client.get(self.url)["ETag"]
+        self.assertNotEqual(edited, etag)
+
+        item.delete()
+        self.assertNotEqual(self.client.get(self.url)["ETag"], edited)
+
+
+    def test_confirmation_prerenders_invoice(self):
+        with mock.patch("orders.invoices._submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderStatusHistory.objects.create(order=self.order, status=Order.Status.CONFIRMED)
+        submit.assert_called_once_with(self.order.id)
+
+        invoices._prerender(self.order.id)
+        self.assertTrue(invoices.is_rendered(self.order))
+        with mock.patch("orders.invoices.build_invoice_pdf") as build:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        build.assert_not_called()
+
+    @override_settings(INVOICE_EXPORT_PROCESSES=0)
+    def test_bulk_export_streams_zip(self):
+        Order.objects.create(user=self.user, shipping_name="n", phone="1", address="a", city="c", total=5)
+        invoices.render(self.order)  # one cached, one rendered during the export
+        admin = User.objects.create_user(email="admin@example.com", password="x", is_staff=True)
+        self.client.force_login(admin)
+
+        day = self.order.created_at.date().isoformat()
+        resp = self.client.get(f"/api/admin/orders/export-invoices/?start={day}&end={day}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(self.client.get("/api/admin/orders/export-invoices/").status_code, 400)
+
+
+    @override_settings(INVOICE_EXPORT_PROCESSES=2)
+    def test_bulk_export_reuses_one_process_pool(self):
+        for total in (5, 6, 7, 8):
+            Order.objects.create(user=self.user, shipping_name="n", phone="1", address="a", city="c", total=total)
+        orders = list(Order.objects.order_by("id").prefetch_related("items"))
+        self.addCleanup(invoices._drop_render_pool, invoices._render_executor(2))
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(invoices.iter_invoice_zip(orders))))
+        self.assertEqual(len(archive.namelist()), 5)
+        self.assertTrue(all(archive.read(n).startswith(b"%PDF") for n in archive.namelist()))
+        self.assertTrue(all(invoices.is_rendered(o) for o in orders))
+
+        pool = invoices._render_pool
+        for order in orders:
+            invoices.delete(order.id)
+        # not prefetched: loaded here before pickling, children never query
+        unprefetched = list(Order.objects.order_by("id")[:2])
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(invoices.iter_invoice_zip(unprefetched))))
+        self.assertEqual(len(archive.namelist()), 2)
+        self.assertNotIn("errors.txt", archive.namelist())
+        self.assertIs(invoices._render_pool, pool)  # no new pool per export
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="buyer@example.com", password="x")
+        for total in (10, 20):
+            Order.objects.create(
+                user=user, shipping_name="n, \"q\"", phone="1", address="a", city="c", total=total
+            )
+        self.client.force_login(User.objects.create_user(email="admin@example.com", password="x", is_staff=True))
+
+    def _get(self, fmt):
+        resp = self.client.get(f"/api/admin/orders/export-excel/?format={fmt}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return b"".join(resp.streaming_content)
+
+    def test_formats(self):
+        lines = self._get("csv").decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("ID,Order Number,"))
+        self.assertIn('"n, ""q"""', lines[1])
+
+        rows = [json.loads(line) for line in self._get("ndjson").decode().splitlines()]
+        self.assertEqual([r["total"] for r in rows], ["20.00", "10.00"])
+
+        sheet = load_workbook(io.BytesIO(self._get("xlsx"))).active
+        self.assertEqual(sheet.max_row, 3)
+        self.assertEqual(sheet["N2"].value, 20)
+
+        self.assertEqual(self.client.get("/api/admin/orders/export-excel/?format=pdf").status_code, 400)
+
+    def test_xlsx_round_trips_through_openpyxl(self):
+        rows = [
+            ["plain", 3, 2.5, Decimal("10.10"), True, date(2026, 3, 5), None],
+            ["bell\x07 and \ud800 tab\tnl\n", float("nan"), float("inf"), Decimal("NaN"), False, "", "<&>"],
+        ]
+        body = b"".join(streaming.iter_xlsx(["Name", "N", "F", "D", "B", "Date", "X"], rows,
+                                            sheet_name="Sales: [Q1]/2026?", widths=[20, 8]))
+
+        book = load_workbook(io.BytesIO(body))
+        sheet = book.active
+        self.assertEqual(sheet.title, "Sales Q12026")
+        self.assertEqual([c.value for c in sheet[1]], ["Name", "N", "F", "D", "B", "Date", "X"])
+        self.assertEqual([c.value for c in sheet[2]], ["plain", 3, 2.5, 10.1, True, "2026-03-05", None])
+        self.assertEqual([c.value for c in sheet[3]], ["bell and  tab\tnl\n", "nan", "inf", "NaN", False, None, "<&>"])
+        self.assertTrue(sheet["A1"].font.b)
+
+
+    def test_background_job_and_signed_download(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            resp = self.client.post(
+                "/api/orders/exports/", {"kind": "admin_orders", "format": "csv"}, content_type="application/json"
+            )
+            self.assertEqual(resp.status_code, 202)
+            job_id = resp.json()["id"]
+
+            self.assertTrue(export_jobs.run(job_id))
+            self.assertFalse(export_jobs.run(job_id))  # already done
+            data = self.client.get(f"/api/orders/exports/{job_id}/").json()
+            self.assertEqual((data["status"], data["progress"], data["rowsTotal"]), ("done", 100, 2))
+
+            download = self.client_class().get(data["downloadUrl"])
+            self.assertEqual(download.status_code, 200)
+            self.assertEqual(len(b"".join(download.streaming_content).splitlines()), 3)
+
+            ExportJob.objects.filter(pk=job_id).update(expires_at=timezone.now())
+            self.assertEqual(export_jobs.evict(), 1)
+            self.assertEqual(ExportJob.objects.get(pk=job_id).status, ExportJob.Status.EXPIRED)
+            self.assertEqual(self.client_class().get(data["downloadUrl"]).status_code, 404)
+
+
+    @override_settings(EXPORT_POLL_MAX_WAIT_SECONDS=0.5)
+    def test_status_poll_wait_is_capped(self):
+        with self.captureOnCommitCallbacks():  # never picked up: stays pending
+            job = export_jobs.create(User.objects.get(email="admin@example.com"), "admin_orders", "csv")
+
+        started = time.monotonic()
+        data = self.client.get(f"/api/orders/exports/{job.pk}/?wait=60").json()
+        self.assertEqual(data["status"], "pending")
+        self.assertLess(time.monotonic() - started, 3)
+
+
+    def test_worker_that_lost_its_lease_does_not_overwrite_the_job(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        admin = User.objects.get(email="admin@example.com")
+        body = export_jobs.export_body
+
+        def taken_over(*args, **kwargs):
+            # another worker re-claims the job while this one is still writing
+            ExportJob.objects.filter(status=ExportJob.Status.RUNNING).update(
+                lease_until=timezone.now() + timedelta(minutes=5)
+            )
+            yield from body(*args, **kwargs)
+
+        with override_settings(MEDIA_ROOT=media), mock.patch.object(export_jobs, "export_body", taken_over):
+            for progress_every in (export_jobs.PROGRESS_EVERY_ROWS, 1):  # caught at the end / mid-way
+                with mock.patch.object(export_jobs, "PROGRESS_EVERY_ROWS", progress_every):
+                    with self.captureOnCommitCallbacks():
+                        job = export_jobs.create(admin, "admin_orders", "csv")
+                    self.assertFalse(export_jobs.run(job.pk))
+
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.file), (ExportJob.Status.RUNNING, ""))
+            self.assertEqual([f for _, _, files in os.walk(media) for f in files], [])  # stale file dropped
+
+
+    def test_vendor_sales_export_honours_the_date_range(self):
+        vendor = User.objects.create_user(email="vendor@example.com", password="x", role="vendor")
+        lamp = Product.objects.create(name="Lamp", price=10, stock=5, vendor=vendor)
+        for order, day in zip(Order.objects.order_by("id"), ("2026-03-01", "2026-03-05")):
+            OrderItem.objects.create(order=order, product=lamp, vendor=vendor, name="Lamp", price=10,
+                                     quantity=1, line_total=10)
+            Order.objects.filter(pk=order.pk).update(created_at=f"{day}T12:00:00Z")
+        self.client.force_login(vendor)
+
+        url = "/api/orders/vendor/reports/sales.xlsx?format=csv"
+        everything = b"".join(self.client.get(url).streaming_content).decode().splitlines()
+        march_5 = b"".join(self.client.get(f"{url}&start=2026-03-05").streaming_content).decode().splitlines()
+        self.assertEqual(len(everything), 3)
+        self.assertEqual(len(march_5), 2)
+        self.assertIn("2026-03-05", march_5[1])
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com", password="x")
+
+    def _order(self, total):
+        return Order.objects.create(
+            user=self.user, shipping_name="n", phone="1", address="a", city="c", total=total
+        )
+
+    def _rows(self):
+        return sorted(
+            DailySalesRollup.objects.filter(orders__gt=0)
+            .values_list("day", "status", "payment_status", "orders", "revenue")
+        )
+
+    def test_incremental_matches_rebuild(self):
+        a, b, c = self._order(10), self._order(20), self._order(30)
+        a.payment_status = Order.PaymentStatus.PAID
+        a.save()
+        b.status = Order.Status.CANCELLED
+        b.save()
+        Order.objects.get(pk=c.pk).delete()
+        partial = Order.objects.only("id", "total").get(pk=a.pk)
+        partial.total = 15
+        partial.save(update_fields=["total"])
+
+        incremental = self._rows()
+        rollups.rebuild()
+        self.assertEqual(incremental, self._rows())
+
+        self.client.force_login(User.objects.create_user(email="admin@example.com", password="x", is_staff=True))
+        day = a.created_at.date().isoformat()
+        data = self.client.get(f"/api/admin/orders/analytics/?start={day}&end={day}").json()
+        self.assertEqual(data["today"], {"orders": 2, "revenue_all": "15.00", "revenue_paid": "15.00"})
+        self.assertEqual(data["range"]["daily_breakdown"][0]["orders"], 1)
+
+    def test_analytics_and_dashboard_are_one_query_each(self):
+        a, b = self._order(10), self._order(20)
+        a.status = Order.Status.DELIVERED
+        a.save()
+        b.status = Order.Status.CANCELLED
+        b.save()
+        self.client.force_login(User.objects.create_user(email="admin@example.com", password="x", is_staff=True))
+        day = a.created_at.date().isoformat()
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(f"/api/admin/orders/analytics/?start={day}&end={day}").json()
+        self.assertEqual(sum("dailysalesrollup" in q["sql"] for q in ctx.captured_queries), 1)
+        self.assertEqual(data["range"]["orders"], 2)
+        self.assertEqual(data["this_month"]["revenue_all"], "10.00")
+        self.assertEqual(data["range"]["daily_breakdown"], [
+            {"date": day, "orders": 1, "revenue_all": "10.00", "revenue_paid": "0.00"},
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/admin/dashboard/summary/").json()
+        self.assertEqual(sum('"orders_order"' in q["sql"] for q in ctx.captured_queries), 1)
+        self.assertEqual(data, {"totalOrders": 2, "deliveredOrders": 1, "pendingOrders": 0, "revenue": 10.0})
+
+
+class VendorRollupTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(email="buyer@example.com", password="x")
+        self.vendor = User.objects.create_user(email="vendor@example.com", password="x", role="vendor")
+        other = User.objects.create_user(email="other@example.com", password="x", role="vendor")
+        self.p1 = Product.objects.create(name="Lamp", price=10, stock=50, vendor=self.vendor)
+        self.p2 = Product.objects.create(name="Rug", price=25, stock=50, vendor=self.vendor)
+        self.p3 = Product.objects.create(name="Vase", price=5, stock=50, vendor=other)
+
+    def _order(self):
+        return Order.objects.create(user=self.buyer, shipping_name="n", phone="1", address="a", city="c")
+
+    def _item(self, product, qty):
+        return OrderItem(product=product, vendor=product.vendor, name=product.name, price=product.price,
+                         quantity=qty, line_total=product.price * qty)
+
+    def _rows(self):
+        return (
+            sorted(VendorSalesRollup.objects.filter(units__gt=0)
+                   .values_list("vendor_id", "month", "status", "product_id", "units", "revenue")),
+            sorted(VendorOrderRollup.objects.filter(orders__gt=0)
+                   .values_list("vendor_id", "month", "status", "orders")),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        a = self._order()
+        for product, qty in ((self.p1, 2), (self.p2, 1), (self.p3, 4)):
+            item = self._item(product, qty)
+            item.order = a
+            item.save()
+        b = self._order()
+        items = [self._item(self.p1, 1), self._item(self.p3, 1)]
+        for item in items:
+            item.order = b
+        OrderItem.objects.bulk_create(items)
+        vendor_rollups.items_created(b.pk, items)
+
+        a.status = Order.Status.CONFIRMED
+        a.save()
+        line = OrderItem.objects.get(order=a, product=self.p1)
+        line.quantity, line.line_total = 3, 30
+        line.save()
+        OrderItem.objects.get(order=a, product=self.p2).delete()
+        c = self._order()
+        item = self._item(self.p2, 1)
+        item.order = c
+        item.save()
+        Order.objects.get(pk=c.pk).delete()
+
+        incremental = self._rows()
+        vendor_rollups.rebuild()
+        self.assertEqual(incremental, self._rows())
+
+        self.client.force_login(self.vendor)
+        data = self.client.get("/api/orders/vendor/dashboard/summary/").json()
+        self.assertEqual(data["totalOrders"], 2)
+        self.assertEqual(data["byStatus"], {"confirmed": 1, "pending": 1})
+        self.assertEqual(data["revenueTotal"], 40.0)
+        self.assertEqual(data["monthlySales"][-1], {"month": a.created_at.strftime("%Y-%m"), "revenue": 40.0, "orders": 2})
+        self.assertEqual([(p["name"], p["units"]) for p in data["topProducts"]], [("Lamp", 4)])
+
+    def test_backfill_and_vendor_order_scoping(self):
+        mine, theirs = self._order(), self._order()
+        legacy = self._item(self.p1, 1)
+        legacy.order, legacy.vendor = mine, None
+        legacy.save()
+        for order, product in ((mine, self.p3), (theirs, self.p3)):
+            item = self._item(product, 1)
+            item.order = order
+            item.save()
+
+        self.assertEqual(vendor_scope.backfill(batch_size=1), 1)
+        self.assertEqual(OrderItem.objects.get(pk=legacy.pk).vendor_id, self.vendor.pk)
+        self.assertEqual(vendor_scope.backfill(), 0)
+
+        self.client.force_login(self.vendor)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/orders/vendor/orders/").json()
+        self.assertEqual([o["id"] for o in data], [mine.pk])
+        self.assertEqual([i["product_title"] for i in data[0]["items"]], ["Lamp"])
+        item_queries = [q["sql"] for q in ctx.captured_queries if '"orders_orderitem"' in q["sql"]]
+        self.assertEqual(len(item_queries), 2)  # EXISTS in the order query + one prefetch
+        self.assertNotIn("GROUP BY", " ".join(item_queries))
+
+
+class _CountingView(APIView):
+    """
+    Test endpoint behind @idempotent: counts its runs, can fail on demand or
+    re-enter itself with the same key (a duplicate arriving mid-request).
+    """
+    runs = 0
+    fail_with = None
+    nested = None
+
+    @idempotent
+    def post(self, request):
+        type(self).runs += 1
+        if self.fail_with == "raise":
+            raise RuntimeError("boom")
+        if self.fail_with == "400":
+            return Response({"detail": "bad"}, status=400)
+        if self.nested:
+            type(self).nested = _idempotent_post(request.user, request.data, request.headers[HEADER])
+        return Response({"run": self.runs}, status=201)
+
+
+def _idempotent_post(user, data, key):
+    request = APIRequestFactory().post("/api/test/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+    force_authenticate(request, user=user)
+    return _CountingView.as_view()(request)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com", password="x")
+        _CountingView.runs = 0
+        _CountingView.fail_with = None
+        _CountingView.nested = None
+
+    def _post(self, data=None, key="k-1"):
+        return _idempotent_post(self.user, data or {"items": [1]}, key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self._post()
+        again = self._post()
+
+        self.assertEqual((first.status_code, first.data), (201, {"run": 1}))
+        self.assertEqual((again.status_code, again.data), (201, {"run": 1}))
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(_CountingView.runs, 1)
+        self.assertEqual(self._post(key="k-2").data, {"run": 2})
+
+    def test_same_key_with_another_body_is_rejected(self):
+        self._post({"items": [1]})
+        response = self._post({"items": [2]})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(_CountingView.runs, 1)
+
+    def test_duplicate_while_first_is_running_gets_409(self):
+        _CountingView.nested = True
+        first = self._post()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(_CountingView.nested.status_code, 409)
+        self.assertEqual(_CountingView.nested["Retry-After"], "1")
+        self.assertEqual(_CountingView.runs, 1)
+
+    def test_abandoned_claim_is_taken_over_after_the_lock(self):
+        self._post()
+        # as if the first request died mid-way: claimed, never finished
+        IdempotencyKey.objects.update(
+            status_code=None, response_body=None, locked_until=timezone.now() + timedelta(seconds=30)
+        )
+        self.assertEqual(self._post().status_code, 409)
+
+        IdempotencyKey.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._post().status_code, 201)
+        self.assertEqual(_CountingView.runs, 2)
+
+    def test_failed_first_request_releases_the_key(self):
+        for failure in ("raise", "400"):
+            _CountingView.fail_with = failure
+            if failure == "raise":
+                with self.assertRaises(RuntimeError):
+                    self._post()
+            else:
+                self.assertEqual(self._post().status_code, 400)
+            self.assertFalse(IdempotencyKey.objects.exists())
+
+        _CountingView.fail_with = None
+        response = self._post()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(_CountingView.runs, 3)
@@ -10,6 +10,7 @@ from .vendor_reports_views import (
     VendorSalesReportMonthlyXlsx,
 )
 
+from .export_views import ExportJobListCreateView, ExportJobDetailView, ExportDownloadView
 from .vendor_views import VendorOrdersList, VendorOrderDetail
 from .vendor_dashboard_views import VendorDashboardSummaryView
 from .views import DemoSendOtpView, DemoVerifyOtpView
@@ -26,6 +27,11 @@ urlpatterns = [
     path("my/<int:id>/", MyOrderDetailView.as_view()),
     path("my/<int:id>/invoice/", MyOrderInvoiceView.as_view()),
 
+    # Background exports (admin / vendor reports)
+    path("exports/", ExportJobListCreateView.as_view(), name="export-jobs"),
+    path("exports/<int:pk>/", ExportJobDetailView.as_view(), name="export-job-detail"),
+    path("exports/download/<str:token>/", ExportDownloadView.as_view(), name="export-download"),
+
     # =====================
     # Vendor
     # =====================
@@ -1,17 +1,4 @@
-from datetime import timedelta
-from decimal import Decimal
-
 from django.conf import settings
-from django.db.models import (
-    Count,
-    Q,
-    Sum,
-    Value,
-    DecimalField,
-    F,
-    ExpressionWrapper,
-)
-from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 
 from rest_framework.permissions import IsAuthenticated
@@ -19,10 +6,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.permissions import IsVendorRole
-from .models import Order, OrderItem
-
-
-DECIMAL_0 = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+from . import vendor_rollups
 
 
 def _abs_media_url(request, stored_path):
@@ -56,46 +40,11 @@ class VendorDashboardSummaryView(APIView):
         except Exception:
             products_count = 0
 
-        # ---------- Orders containing vendor items (multi-vendor safe) ----------
-        vendor_order_qs = (
-            Order.objects.annotate(
-                vendor_items=Count(
-                    "items",
-                    filter=Q(items__product__vendor=vendor),
-                    distinct=True
-                )
-            )
-            .filter(vendor_items__gt=0)
-        )
-
-        total_orders = vendor_order_qs.count()
-
-        by_status_rows = vendor_order_qs.values("status").annotate(c=Count("id"))
-        by_status = {row["status"]: row["c"] for row in by_status_rows}
-
-        # ---------- Revenue expression (works even if line_total not set) ----------
-        revenue_expr = ExpressionWrapper(
-            F("quantity") * F("price"),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        )
-
-        # ---------- Revenue total (vendor-only) ----------
-        revenue_total = (
-            OrderItem.objects
-            .filter(product__vendor=vendor)
-            .aggregate(
-                total=Coalesce(
-                    Sum(revenue_expr),
-                    DECIMAL_0,
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                )
-            )
-            .get("total")
-        )
+        # ---------- Orders / revenue (maintained rollups, see orders/vendor_rollups.py) ----------
+        total_orders, by_status, revenue_total = vendor_rollups.totals(vendor)
 
         # ---------- Monthly sales (ALWAYS last 12 months, fill missing months with 0) ----------
-        now = timezone.now()
-        end_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_month = vendor_rollups.month_start(timezone.now())
 
         # list of last 12 months as YYYY-MM
         months = []
@@ -117,24 +66,8 @@ class VendorDashboardSummaryView(APIView):
                 cur = cur.replace(month=cur.month - 1)
         start = cur
 
-        monthly_rows = (
-            OrderItem.objects
-            .filter(product__vendor=vendor, order__created_at__gte=start)
-            .annotate(month=TruncMonth("order__created_at"))
-            .values("month")
-            .annotate(
-                revenue=Coalesce(
-                    Sum(revenue_expr),
-                    DECIMAL_0,
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                ),
-                orders=Count("order_id", distinct=True),
-            )
-            .order_by("month")
-        )
-
         row_map = {}
-        for r in monthly_rows:
+        for r in vendor_rollups.monthly(vendor, start):
             k = r["month"].strftime("%Y-%m") if r["month"] else ""
             row_map[k] = {
                 "revenue": float(r["revenue"] or 0),
@@ -147,20 +80,7 @@ class VendorDashboardSummaryView(APIView):
             monthly_sales.append({"month": k, "revenue": v["revenue"], "orders": v["orders"]})
 
         # ---------- Top-selling products ----------
-        top_rows = (
-            OrderItem.objects
-            .filter(product__vendor=vendor)
-            .values("product_id", "product__name")
-            .annotate(
-                units=Coalesce(Sum("quantity"), Value(0)),
-                revenue=Coalesce(
-                    Sum(revenue_expr),
-                    DECIMAL_0,
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                ),
-            )
-            .order_by("-units", "-revenue")[:8]
-        )
+        top_rows = vendor_rollups.top_products(vendor, limit=8)
 
         # attach first image per product (absolute URL)
         image_map = {}
@@ -0,0 +1,310 @@
+"""
+Maintained per-vendor sales for the vendor dashboards and monthly report.
+
+VendorSalesRollup keeps units and revenue per (vendor, month, order status,
+product); VendorOrderRollup keeps how many orders per (vendor, month, order
+status) contain at least one of the vendor's products (an order with two of
+them counts once, which product rows can't express). Months are the first
+day of the local month in the default TIME_ZONE, vendors are the vendor
+recorded on the order item (OrderItem.vendor, set at checkout).
+
+orders.signals keeps both in step:
+  - OrderItem save()/delete() moves that one line,
+  - Order save() that changes created_at/status moves all of its lines,
+  - Order delete() takes the whole order out before its items go,
+  - checkout's bulk_create calls items_created() itself.
+
+Queryset updates/deletes of items aren't tracked; after those (e.g.
+`manage.py backfill_orderitem_vendors`) run `manage.py rebuild_vendor_rollups`.
+"""
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+# Fields that decide an order's / an item's bucket
+ORDER_FIELDS = {"created_at", "status"}
+ITEM_FIELDS = {"vendor_id", "product_id", "quantity", "line_total"}
+
+
+def month_start(dt):
+    return timezone.localtime(dt, timezone.get_default_timezone()).date().replace(day=1)
+
+
+def order_key(order):
+    """
+    (month, status) of an order, or None before it was saved.
+    """
+    if not order.created_at:
+        return None
+    return (month_start(order.created_at), order.status)
+
+
+def line_key(item):
+    """
+    (vendor_id, product_id, quantity, line_total) of an order item.
+    """
+    return (item.vendor_id, item.product_id, item.quantity, Decimal(str(item.line_total or 0)))
+
+
+def _bump(model, key, **deltas):
+    qs = model.objects.filter(**key)
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if qs.update(**changes):
+        return
+    if any(value < 0 for value in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        qs.update(**changes)
+
+
+def _add_lines(okey, lines, sign):
+    from .models import VendorSalesRollup
+
+    month, status = okey
+    for (vendor_id, product_id), (units, revenue) in lines.items():
+        _bump(
+            VendorSalesRollup,
+            {"vendor_id": vendor_id, "month": month, "status": status, "product_id": product_id},
+            units=sign * units, revenue=sign * revenue,
+        )
+
+
+def _add_orders(okey, vendor_ids, sign):
+    from .models import VendorOrderRollup
+
+    month, status = okey
+    for vendor_id in vendor_ids:
+        _bump(VendorOrderRollup, {"vendor_id": vendor_id, "month": month, "status": status}, orders=sign)
+
+
+def _lines(line_keys):
+    """
+    {(vendor_id, product_id): (units, revenue)} for line keys; lines
+    without a vendor are left out.
+    """
+    out = {}
+    for vendor_id, product_id, quantity, total in line_keys:
+        if vendor_id is None:
+            continue
+        units, revenue = out.get((vendor_id, product_id), (0, Decimal("0.00")))
+        out[(vendor_id, product_id)] = (units + quantity, revenue + total)
+    return out
+
+
+def _stored_order_key(order_id):
+    from .models import Order
+
+    row = Order.objects.filter(pk=order_id).values_list("created_at", "status").first()
+    return (month_start(row[0]), row[1]) if row else None
+
+
+def _sync_orders(order_id, okey, added, removed):
+    """
+    Count the order for vendors whose lines in it were all just written
+    (`added`: vendor -> lines written) and uncount it for vendors that have
+    none left (`removed`). Runs after the item rows changed.
+    """
+    from .models import OrderItem
+
+    vendors = set(added) | set(removed)
+    if not vendors:
+        return
+    now = dict(
+        OrderItem.objects
+        .filter(order_id=order_id, vendor_id__in=vendors)
+        .values("vendor_id")
+        .annotate(n=Count("id"))
+        .values_list("vendor_id", "n")
+    )
+    _add_orders(okey, [v for v, n in added.items() if now.get(v, 0) == n], +1)
+    _add_orders(okey, [v for v in removed if not now.get(v)], -1)
+
+
+# ======================
+# Maintenance
+# ======================
+def items_created(order_id, items):
+    """
+    Count order items written without save() (bulk_create).
+    """
+    okey = _stored_order_key(order_id)
+    if okey is None or not items:
+        return
+    lines = _lines([line_key(i) for i in items])
+    _add_lines(okey, lines, +1)
+    _sync_orders(order_id, okey, Counter(v for v, _ in lines), set())
+
+
+def apply_change(order_id, old_line, new_line):
+    """
+    Move one order item from its old line to its new one (either may be None).
+    """
+    if old_line == new_line:
+        return
+    okey = _stored_order_key(order_id)
+    if okey is None:
+        return
+    old = _lines([old_line]) if old_line else {}
+    new = _lines([new_line]) if new_line else {}
+    _add_lines(okey, old, -1)
+    _add_lines(okey, new, +1)
+
+    old_vendors = {v for v, _ in old}
+    new_vendors = {v for v, _ in new}
+    _sync_orders(order_id, okey, {v: 1 for v in new_vendors - old_vendors}, old_vendors - new_vendors)
+
+
+def move_order(order_id, old_key, new_key):
+    """
+    Move every line of an order from its old (month, status) to its new one.
+    """
+    from .models import OrderItem
+
+    if old_key == new_key:
+        return
+    rows = (
+        OrderItem.objects
+        .filter(order_id=order_id, vendor__isnull=False)
+        .values("vendor_id", "product_id")
+        .annotate(units=Sum("quantity"), revenue=Sum("line_total"))
+        .order_by()
+    )
+    lines = {
+        (r["vendor_id"], r["product_id"]): (r["units"] or 0, r["revenue"] or Decimal("0.00"))
+        for r in rows
+    }
+    vendors = {v for v, _ in lines}
+    if old_key:
+        _add_lines(old_key, lines, -1)
+        _add_orders(old_key, vendors, -1)
+    if new_key:
+        _add_lines(new_key, lines, +1)
+        _add_orders(new_key, vendors, +1)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def rebuild(item_model=None, sales_model=None, orders_model=None):
+    """
+    Recompute both vendor rollups from order items. Returns number of rows.
+    """
+    if item_model is None or sales_model is None or orders_model is None:
+        from .models import OrderItem, VendorOrderRollup, VendorSalesRollup
+
+        item_model = item_model or OrderItem
+        sales_model = sales_model or VendorSalesRollup
+        orders_model = orders_model or VendorOrderRollup
+
+    items = (
+        item_model.objects
+        .filter(vendor__isnull=False)
+        .annotate(month=TruncMonth("order__created_at", tzinfo=timezone.get_default_timezone()))
+    )
+    sales = [
+        sales_model(
+            vendor_id=r["vendor_id"], month=_as_date(r["month"]), status=r["order__status"],
+            product_id=r["product_id"], units=r["units"] or 0, revenue=r["revenue"] or Decimal("0.00"),
+        )
+        for r in (
+            items.values("vendor_id", "month", "order__status", "product_id")
+            .annotate(units=Sum("quantity"), revenue=Sum("line_total"))
+            .order_by()
+        )
+    ]
+    orders = [
+        orders_model(
+            vendor_id=r["vendor_id"], month=_as_date(r["month"]), status=r["order__status"],
+            orders=r["n"],
+        )
+        for r in (
+            items.values("vendor_id", "month", "order__status")
+            .annotate(n=Count("order_id", distinct=True))
+            .order_by()
+        )
+    ]
+    with transaction.atomic():
+        sales_model.objects.all().delete()
+        orders_model.objects.all().delete()
+        sales_model.objects.bulk_create(sales, batch_size=1000)
+        orders_model.objects.bulk_create(orders, batch_size=1000)
+    return len(sales) + len(orders)
+
+
+# ======================
+# Reads
+# ======================
+def totals(vendor):
+    """
+    (orders, {status: orders}, revenue) over all of a vendor's history.
+    """
+    from .models import VendorOrderRollup, VendorSalesRollup
+
+    by_status = {
+        status: n
+        for status, n in (
+            VendorOrderRollup.objects
+            .filter(vendor=vendor)
+            .values("status")
+            .annotate(n=Sum("orders"))
+            .values_list("status", "n")
+        )
+        if n
+    }
+    revenue = (
+        VendorSalesRollup.objects.filter(vendor=vendor).aggregate(v=Sum("revenue"))["v"]
+        or Decimal("0.00")
+    )
+    return sum(by_status.values()), by_status, revenue
+
+
+def monthly(vendor, since):
+    """
+    Per-month rows {month, orders, units, revenue} from month `since` on,
+    oldest first (a queryset, so exports can stream it).
+    """
+    from .models import VendorOrderRollup, VendorSalesRollup
+
+    orders = (
+        VendorOrderRollup.objects
+        .filter(vendor=vendor, month=OuterRef("month"))
+        .values("month")
+        .annotate(n=Sum("orders"))
+        .values("n")
+    )
+    return (
+        VendorSalesRollup.objects
+        .filter(vendor=vendor, month__gte=since, units__gt=0)
+        .values("month")
+        .annotate(
+            units=Sum("units"),
+            revenue=Sum("revenue"),
+            orders=Coalesce(Subquery(orders), Value(0)),
+        )
+        .order_by("month")
+    )
+
+
+def top_products(vendor, limit=8):
+    """
+    A vendor's best sellers by units, then revenue: {product_id, product__name, units, revenue}.
+    """
+    from .models import VendorSalesRollup
+
+    return list(
+        VendorSalesRollup.objects
+        .filter(vendor=vendor)
+        .values("product_id", "product__name")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .filter(units__gt=0)
+        .order_by("-units", "-revenue")[:limit]
+    )
@@ -0,0 +1,72 @@
+"""
+Vendor scoping for orders.
+
+An order belongs to a vendor when it has at least one item with
+OrderItem.vendor == that vendor. The column is written at checkout (the
+product's vendor at sale time) and indexed on (vendor, created_at) and
+(vendor, order), so vendor queries never join through catalog.Product:
+
+    vendor_orders(vendor)      orders with an EXISTS over the vendor's items
+    with_vendor_items(qs, v)   prefetch only the vendor's items as `vendor_items`
+
+Rows written before the column was filled are fixed by
+`manage.py backfill_orderitem_vendors`.
+"""
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def vendor_items(vendor):
+    from .models import OrderItem
+
+    return OrderItem.objects.filter(vendor=vendor)
+
+
+def vendor_orders(vendor):
+    """
+    Orders containing at least one of the vendor's items.
+    """
+    from .models import Order
+
+    return Order.objects.filter(Exists(vendor_items(vendor).filter(order=OuterRef("pk"))))
+
+
+def with_vendor_items(qs, vendor):
+    """
+    Prefetch just the vendor's items of each order into `order.vendor_items`.
+    """
+    return qs.prefetch_related(
+        Prefetch(
+            "items",
+            queryset=vendor_items(vendor).select_related("product").order_by("id"),
+            to_attr="vendor_items",
+        )
+    )
+
+
+def backfill(batch_size=BACKFILL_BATCH_SIZE, item_model=None, product_model=None):
+    """
+    Copy the product's vendor onto order items that have none, in
+    batches of `batch_size` ids (each its own UPDATE). Returns rows updated.
+    """
+    if item_model is None or product_model is None:
+        from catalog.models import Product
+
+        from .models import OrderItem
+
+        item_model = item_model or OrderItem
+        product_model = product_model or Product
+
+    missing = item_model.objects.filter(vendor__isnull=True, product__vendor__isnull=False)
+    vendor_of_product = Subquery(
+        product_model.objects.filter(pk=OuterRef("product_id")).values("vendor_id")[:1]
+    )
+    updated = 0
+    last = 0
+    while True:
+        ids = list(missing.filter(pk__gt=last).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return updated
+        updated += item_model.objects.filter(pk__in=ids).update(vendor_id=vendor_of_product)
+        last = ids[-1]
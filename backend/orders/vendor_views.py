@@ -1,7 +1,5 @@
 from datetime import timedelta
 
-from django.db.models import Count, Q, Sum, Value
-from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 
 from rest_framework.permissions import IsAuthenticated
@@ -9,7 +7,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from accounts.permissions import IsVendorRole
-from .models import Order, OrderItem
+from core.pagination import KeysetPagination
+from . import vendor_rollups, vendor_scope
 from .serializers_vendor import VendorOrderSerializer, VendorOrderDetailSerializer
 
 # ✅ Optional: If your project has OrderStatusHistory (it exists in serializers.py)
@@ -25,19 +24,15 @@ class VendorOrdersList(APIView):
     def get(self, request):
         vendor = request.user
 
-        qs = (
-            Order.objects
-            .annotate(
-                vendor_items=Count(
-                    "items",
-                    filter=Q(items__product__vendor=vendor),
-                    distinct=True
-                ),
-            )
-            .filter(vendor_items__gt=0)
-            .order_by("-id")
-            .prefetch_related("items__product")
-        )
+        # EXISTS on the indexed OrderItem.vendor instead of a GROUP BY over all orders
+        qs = vendor_scope.with_vendor_items(vendor_scope.vendor_orders(vendor).order_by("-id"), vendor)
+
+        # ✅ Opt-in keyset paging (?cursor=); plain list stays the default
+        if "cursor" in request.query_params:
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(qs, request, view=self)
+            data = VendorOrderSerializer(page, many=True, context={"request": request}).data
+            return paginator.get_paginated_response(data)
 
         data = VendorOrderSerializer(qs, many=True, context={"request": request}).data
         return Response(data)
@@ -47,19 +42,7 @@ class VendorOrderDetail(APIView):
     permission_classes = [IsAuthenticated, IsVendorRole]
 
     def _get_vendor_order(self, vendor, pk):
-        return (
-            Order.objects
-            .annotate(
-                vendor_items=Count(
-                    "items",
-                    filter=Q(items__product__vendor=vendor),
-                    distinct=True
-                ),
-            )
-            .filter(id=pk, vendor_items__gt=0)
-            .prefetch_related("items__product")
-            .first()
-        )
+        return vendor_scope.with_vendor_items(vendor_scope.vendor_orders(vendor).filter(id=pk), vendor).first()
 
     def get(self, request, pk):
         vendor = request.user
@@ -134,68 +117,22 @@ class VendorDashboardSummary(APIView):
         except Exception:
             products = 0
 
-        vendor_order_qs = (
-            Order.objects
-            .annotate(
-                vendor_items=Count(
-                    "items",
-                    filter=Q(items__product__vendor=vendor),
-                    distinct=True
-                )
-            )
-            .filter(vendor_items__gt=0)
-        )
-
-        total_orders = vendor_order_qs.count()
-
-        by_status_rows = (
-            vendor_order_qs
-            .values("status")
-            .annotate(c=Count("id"))
-        )
-        by_status = {row["status"]: row["c"] for row in by_status_rows}
-
-        revenue_total = (
-            OrderItem.objects
-            .filter(product__vendor=vendor)
-            .aggregate(total=Coalesce(Sum("line_total"), Value(0)))
-            .get("total", 0)
-        )
+        # Maintained rollups (orders/vendor_rollups.py): cost doesn't grow with sales history
+        total_orders, by_status, revenue_total = vendor_rollups.totals(vendor)
 
         now = timezone.now()
         start = (now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365))
 
-        monthly_rows = (
-            OrderItem.objects
-            .filter(product__vendor=vendor, order__created_at__gte=start)
-            .annotate(month=TruncMonth("order__created_at"))
-            .values("month")
-            .annotate(
-                revenue=Coalesce(Sum("line_total"), Value(0)),
-                orders=Count("order_id", distinct=True),
-            )
-            .order_by("month")
-        )
-
         monthly_sales = [
             {
                 "month": row["month"].strftime("%Y-%m") if row["month"] else "",
                 "revenue": float(row["revenue"] or 0),
                 "orders": int(row["orders"] or 0),
             }
-            for row in monthly_rows
+            for row in vendor_rollups.monthly(vendor, vendor_rollups.month_start(start))
         ]
 
-        top_rows = (
-            OrderItem.objects
-            .filter(product__vendor=vendor)
-            .values("product_id", "product__name")
-            .annotate(
-                units=Coalesce(Sum("quantity"), Value(0)),
-                revenue=Coalesce(Sum("line_total"), Value(0)),
-            )
-            .order_by("-units", "-revenue")[:8]
-        )
+        top_rows = vendor_rollups.top_products(vendor, limit=8)
 
         top_products = []
         try:
@@ -1,13 +1,9 @@
 from decimal import Decimal
-from io import BytesIO
 import random
 from datetime import timedelta
 from django.db import transaction
-from django.db.models import F
-from django.http import HttpResponse, FileResponse
 from django.utils import timezone
 from django.conf import settings
-from django.core.mail import send_mail
 from django.core.mail import EmailMultiAlternatives
 from django.utils.html import strip_tags
 from rest_framework import status
@@ -15,12 +11,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from cart.models import CartItem
+from catalog import reservations, stock
 from catalog.models import Product
+from core.mail import dispatcher as mail_dispatcher
+from core.pagination import HybridPagination
+
+from . import invoices, vendor_rollups
+from .idempotency import idempotent
 from .models import Order, OrderItem, OrderStatusHistory
 from .serializers import CheckoutSerializer, OrderDetailSerializer
 from django.utils.decorators import method_decorator
@@ -46,9 +44,7 @@ class QueryParamJWTAuthentication(JWTAuthentication):
 
         return None
 
-# -------------------------
-# PDF Invoice helpers (NEW)
-# -------------------------
+
 def _money(val):
     try:
         return f"{Decimal(val):,.2f}"
@@ -59,263 +55,13 @@ def _money(val):
             return "0.00"
 
 
-def build_invoice_pdf(order: Order) -> bytes:
-    """
-    Generates a clean PDF invoice for an Order and returns raw PDF bytes.
-    Fixes long product names overflowing into next column by wrapping text.
-    """
-    from xml.sax.saxutils import escape  # safe HTML escape for Paragraph
-
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=36,
-        bottomMargin=36,
-        title=f"Invoice {order.order_number}",
-        author="Urban Cart",
-    )
-
-    styles = getSampleStyleSheet()
-
-    # ✅ Wrap style for long product names
-    item_name_style = ParagraphStyle(
-        "ItemName",
-        parent=styles["BodyText"],
-        fontName="Helvetica",
-        fontSize=9,
-        leading=11,
-        wordWrap="CJK",   # ✅ strong wrapping behavior
-    )
-
-    story = []
-
-    # Header
-    story.append(Paragraph("<b>Urban Cart</b>", styles["Title"]))
-    story.append(Paragraph(f"<b>Invoice:</b> {order.order_number}", styles["BodyText"]))
-    story.append(Spacer(1, 10))
-
-    # Order meta
-    meta_lines = [
-        f"<b>Order ID:</b> {order.id}",
-        f"<b>Date:</b> {order.created_at.strftime('%Y-%m-%d %H:%M') if getattr(order, 'created_at', None) else ''}",
-        f"<b>Status:</b> {order.status}",
-        f"<b>Payment:</b> {order.payment_method} ({order.payment_status})",
-    ]
-    for line in meta_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 12))
-
-    # Shipping / Customer info
-    story.append(Paragraph("<b>Shipping Details</b>", styles["Heading3"]))
-    ship_lines = [
-        f"<b>Name:</b> {order.shipping_name}",
-        f"<b>Phone:</b> {order.phone}",
-        f"<b>City:</b> {order.city}",
-        f"<b>Address:</b> {order.address}",
-    ]
-    if order.note:
-        ship_lines.append(f"<b>Note:</b> {order.note}")
-
-    for line in ship_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 14))
-
-    # Items table
-    story.append(Paragraph("<b>Items</b>", styles["Heading3"]))
-    data = [["#", "Product", "SKU", "Qty", "Unit Price", "Line Total"]]
-
-    for idx, it in enumerate(order.items.all(), start=1):
-        # ✅ Wrap product name safely
-        pname_raw = (
-            getattr(it, "product_title", None)
-            or getattr(it, "name", None)
-            or getattr(getattr(it, "product", None), "name", None)
-            or getattr(getattr(it, "product", None), "title", None)
-            or "Item"
-        )
-        pname = Paragraph(escape(str(pname_raw)), item_name_style)
-
-        sku_raw = getattr(it, "sku", None) or getattr(getattr(it, "product", None), "sku", None) or ""
-        sku = str(sku_raw)
-
-        data.append([
-            str(idx),
-            pname,                 # ✅ Paragraph instead of string (wraps)
-            sku,
-            str(it.quantity),
-            _money(it.price),
-            _money(it.line_total),
-        ])
-
-    # ✅ Keep fixed widths; wrapping happens inside Product column
-    table = Table(data, colWidths=[24, 220, 90, 40, 80, 80])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 1), (-1, -1), 9),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-
-        # ✅ TOP alignment looks best when product wraps into multiple lines
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-
-        # ✅ Extra padding so wrapped lines look clean
-        ("TOPPADDING", (0, 1), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 1), (-1, -1), 6),
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 14))
-
-    # Totals table
-    totals = [
-        ["Subtotal", _money(order.subtotal)],
-        ["Discount", f"-{_money(order.discount_total)}"],
-        ["Shipping", _money(order.shipping_fee)],
-        ["Total", _money(order.total)],
-    ]
-    totals_table = Table(totals, colWidths=[120, 120])
-    totals_table.setStyle(TableStyle([
-        ("FONTNAME", (0, 0), (-1, -2), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -2), 10),
-        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-        ("FONTSIZE", (0, -1), (-1, -1), 11),
-        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-        ("BACKGROUND", (0, -1), (-1, -1), colors.whitesmoke),
-        ("TOPPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]))
-    story.append(totals_table)
-
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
-
-    """
-    Generates a clean PDF invoice for an Order and returns raw PDF bytes.
-    """
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=36,
-        bottomMargin=36,
-        title=f"Invoice {order.order_number}",
-        author="Urban Cart",
-    )
-
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Header
-    story.append(Paragraph("<b>Urban Cart</b>", styles["Title"]))
-    story.append(Paragraph("Invoice", styles["Heading2"]))
-    story.append(Spacer(1, 10))
-
-    # Meta block
-    created = order.created_at.astimezone(timezone.get_current_timezone()).strftime("%Y-%m-%d %H:%M")
-    meta_lines = [
-        f"<b>Invoice for:</b> {order.order_number}",
-        f"<b>Order ID:</b> {order.id}",
-        f"<b>Order Date:</b> {created}",
-        f"<b>Status:</b> {order.status}",
-        f"<b>Payment:</b> {order.payment_method} ({order.payment_status})",
-    ]
-    for line in meta_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 12))
-
-    # Shipping / Customer info
-    story.append(Paragraph("<b>Shipping Details</b>", styles["Heading3"]))
-    ship_lines = [
-        f"<b>Name:</b> {order.shipping_name}",
-        f"<b>Phone:</b> {order.phone}",
-        f"<b>City:</b> {order.city}",
-        f"<b>Address:</b> {order.address}",
-    ]
-    if order.note:
-        ship_lines.append(f"<b>Note:</b> {order.note}")
-    for line in ship_lines:
-        story.append(Paragraph(line, styles["BodyText"]))
-    story.append(Spacer(1, 14))
-
-    # Items table
-    story.append(Paragraph("<b>Items</b>", styles["Heading3"]))
-
-    data = [["#", "Product", "SKU", "Qty", "Unit Price", "Line Total"]]
-    items = list(order.items.all())
-    for idx, it in enumerate(items, start=1):
-        data.append([
-            str(idx),
-            (it.name or ""),
-            (it.sku or ""),
-            str(it.quantity),
-            _money(it.price),
-            _money(it.line_total),
-        ])
-
-    table = Table(data, colWidths=[24, 220, 90, 40, 80, 80])
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 1), (-1, -1), 9),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 14))
-
-    # Totals table
-    totals = [
-        ["Subtotal", _money(order.subtotal)],
-        ["Discount", f"-{_money(order.discount_total)}"],
-        ["Shipping", _money(order.shipping_fee)],
-        ["Total", _money(order.total)],
-    ]
-    totals_table = Table(totals, colWidths=[120, 120])
-    totals_table.setStyle(TableStyle([
-        ("FONTNAME", (0, 0), (-1, -2), "Helvetica"),
-        ("FONTSIZE", (0, 0), (-1, -2), 10),
-
-        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-        ("FONTSIZE", (0, -1), (-1, -1), 11),
-
-        ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-        ("LINEABOVE", (0, -1), (-1, -1), 0.75, colors.black),
-        ("TOPPADDING", (0, -1), (-1, -1), 8),
-    ]))
-    story.append(totals_table)
-    story.append(Spacer(1, 16))
-
-    # Footer
-    story.append(Paragraph("Thank you for shopping with Urban Cart.", styles["Italic"]))
-
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
-
-
 # -------------------------
 # Demo OTP Email Template (NEW)
 # -------------------------
 def _send_demo_otp_email(*, order: Order, user, otp: str, channel: str, expires_minutes: int = 3) -> None:
     """
     Sends a nicer looking HTML OTP email + plain text fallback.
-    Keeps architecture: still uses Django email backend.
+    Keeps architecture: still uses Django email backend (via core.mail).
     """
     user_email = (getattr(user, "email", "") or "").strip()
     if not user_email:
@@ -386,7 +132,15 @@ def _send_demo_otp_email(*, order: Order, user, otp: str, channel: str, expires_
     text = strip_tags(html).replace("\n\n", "\n").strip()
     msg = EmailMultiAlternatives(subject=subject, body=text, from_email=from_email, to=[user_email])
     msg.attach_alternative(html, "text/html")
-    msg.send(fail_silently=False)
+    # Pooled connection (core.mail); waits so the view can still report failures
+    mail_dispatcher.send(msg)
+
+
+def _stock_error(result):
+    return Response(
+        {"detail": result.detail, "lines": result.failures},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
 
 
 # -------------------------
@@ -395,6 +149,7 @@ def _send_demo_otp_email(*, order: Order, user, otp: str, channel: str, expires_
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     @transaction.atomic
     def post(self, request):
         ser = CheckoutSerializer(data=request.data)
@@ -408,11 +163,9 @@ class CheckoutView(APIView):
         if not cart_items.exists():
             return Response({"detail": "Your cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Lock products to prevent overselling (at least at checkout time)
+        # No row locks here: the conditional UPDATE in catalog.stock is the oversell guard
         product_ids = list(cart_items.values_list("product_id", flat=True))
-        products = (
-            Product.objects.select_for_update().filter(id__in=product_ids, is_active=True)
-        )
+        products = reservations.with_available(Product.objects.filter(id__in=product_ids, is_active=True))
         product_map = {p.id: p for p in products}
 
         subtotal = Decimal("0.00")
@@ -431,9 +184,10 @@ class CheckoutView(APIView):
             if ci.qty <= 0:
                 return Response({"detail": "Invalid cart quantity."}, status=status.HTTP_400_BAD_REQUEST)
 
-            if p.stock < ci.qty:
+            # stock minus quantities held for other unpaid online orders
+            if p.available_stock < ci.qty:
                 return Response(
-                    {"detail": f"Not enough stock for {p.name}. Available: {p.stock}"},
+                    {"detail": f"Not enough stock for {p.name}. Available: {max(p.available_stock, 0)}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
@@ -447,6 +201,12 @@ class CheckoutView(APIView):
 
         payment_method = data["payment_method"]
 
+        # ✅ COD: take the stock first, in one conditional UPDATE for every line
+        if payment_method != "sslcommerz":
+            result = stock.decrement([(p.id, ci.qty) for ci, p, price, line_total in lines])
+            if not result:
+                return _stock_error(result)
+
         # Create order (always)
         order = Order.objects.create(
             user=request.user,
@@ -487,12 +247,10 @@ class CheckoutView(APIView):
                 )
             )
         OrderItem.objects.bulk_create(bulk_items)
+        vendor_rollups.items_created(order.pk, bulk_items)  # bulk_create skips the item signals
 
-        # ✅ COD: finalize immediately (reduce stock + clear cart)
+        # ✅ COD: finalize immediately (stock already taken above, clear cart)
         if payment_method != "sslcommerz":
-            for ci, p, price, line_total in lines:
-                p.stock = F("stock") - ci.qty
-                p.save(update_fields=["stock"])
             cart_items.delete()
 
             order.status = Order.Status.CONFIRMED
@@ -506,7 +264,14 @@ class CheckoutView(APIView):
                 note="Order confirmed (COD)",
             )
 
-        # ✅ SSLCommerz demo: do NOT reduce stock, do NOT clear cart yet
+        # ✅ SSLCommerz: hold the stock until payment is confirmed (or the hold expires),
+        # do NOT clear cart yet
+        if payment_method == "sslcommerz":
+            result = reservations.reserve(order, [(p.id, ci.qty) for ci, p, price, line_total in lines])
+            if not result:
+                transaction.set_rollback(True)
+                return _stock_error(result)
+
         return Response(
             OrderDetailSerializer(order, context={"request": request}).data,
             status=status.HTTP_201_CREATED,
@@ -594,6 +359,7 @@ class DemoVerifyOtpView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     @transaction.atomic
     def post(self, request):
         order_id = request.data.get("order_id")
@@ -635,26 +401,10 @@ class DemoVerifyOtpView(APIView):
         if otp != order.demo_otp_code:
             return Response({"detail": "Invalid OTP."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Finalize: reduce stock using order items
-        item_list = list(order.items.all())
-        product_ids = [it.product_id for it in item_list]
-        products = Product.objects.select_for_update().filter(id__in=product_ids, is_active=True)
-        product_map = {p.id: p for p in products}
-
-        for it in item_list:
-            p = product_map.get(it.product_id)
-            if not p:
-                return Response({"detail": f"Product not available (id={it.product_id})."},
-                                status=status.HTTP_400_BAD_REQUEST)
-            if p.stock < it.quantity:
-                return Response({"detail": f"Not enough stock for {p.name}. Available: {p.stock}"},
-                                status=status.HTTP_400_BAD_REQUEST)
-
-        # Decrement after validation
-        for it in item_list:
-            p = product_map[it.product_id]
-            p.stock = F("stock") - it.quantity
-            p.save(update_fields=["stock"])
+        # Finalize: turn the checkout hold into a stock decrement (one conditional UPDATE)
+        result = reservations.commit(order, [(it.product_id, it.quantity) for it in order.items.all()])
+        if not result:
+            return _stock_error(result)
 
         # Clear cart now (payment succeeded)
         CartItem.objects.filter(cart__user=request.user).delete()
@@ -685,6 +435,7 @@ class DemoVerifyOtpView(APIView):
 class MyOrdersListView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderDetailSerializer
+    pagination_class = HybridPagination
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).order_by("-created_at")
@@ -717,15 +468,7 @@ class MyOrderInvoiceView(APIView):
         except Order.DoesNotExist:
             return Response({"detail": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        pdf_bytes = build_invoice_pdf(order)
-        filename = f"invoice-{order.order_number}.pdf"
-
-        bio = BytesIO(pdf_bytes)
-        resp = FileResponse(
-            bio,
-            content_type="application/pdf",
-            as_attachment=True,
-            filename=filename,
-        )
-        resp["Access-Control-Expose-Headers"] = "Content-Disposition"
+        # ✅ rendered once per order version, then served from storage (ETag / 304)
+        resp = invoices.invoice_response(request, order)
+        resp["Access-Control-Expose-Headers"] = "Content-Disposition, ETag"
         return resp
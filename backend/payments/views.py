@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework.decorators import api_view, permission_classes
@@ -6,7 +7,10 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 
-from orders.models import Order
+from cart.models import CartItem
+from catalog import reservations
+from orders.idempotency import idempotent
+from orders.models import Order, OrderStatusHistory
 from .models import Payment
 from .serializers import PaymentSerializer, InitiatePaymentSerializer
 from .sslcommerz import create_sslcommerz_session, SSLCommerzError
@@ -18,6 +22,7 @@ def _get_my_order(user, order_id: int):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def initiate_payment(request):
     ser = InitiatePaymentSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
@@ -170,15 +175,34 @@ def sslcommerz_ipn(request):
     payment.raw_ipn = payload
 
     if posted_status == "VALID":
-        payment.status = "paid"
-        payment.save(update_fields=["status", "raw_ipn", "updated_at"])
+        with transaction.atomic():
+            payment.status = "paid"
+            payment.save(update_fields=["status", "raw_ipn", "updated_at"])
+
+            order = Order.objects.select_for_update().get(pk=payment.order_id)
+            first_confirmation = order.payment_status != Order.PaymentStatus.PAID
 
-        order = payment.order
-        if order.payment_method != "sslcommerz":
             order.payment_method = "sslcommerz"
-        if order.payment_status != Order.PaymentStatus.PAID:
             order.payment_status = Order.PaymentStatus.PAID
-        order.save(update_fields=["payment_method", "payment_status", "updated_at"])
+            update_fields = ["payment_method", "payment_status", "updated_at"]
+
+            # ✅ Take the stock once, when the gateway first confirms payment
+            if first_confirmation:
+                result = reservations.commit(order, [(it.product_id, it.quantity) for it in order.items.all()])
+                if result:
+                    CartItem.objects.filter(cart__user_id=order.user_id).delete()
+                    if order.status == Order.Status.PENDING:
+                        order.status = Order.Status.CONFIRMED
+                        update_fields.append("status")
+                    note = "Payment confirmed (SSLCommerz IPN)"
+                else:
+                    # Paid but cannot be fulfilled: keep it pending for a manual refund/restock
+                    note = f"Paid but out of stock: {result.detail}"
+
+            order.save(update_fields=update_fields)
+
+            if first_confirmation:
+                OrderStatusHistory.objects.create(order=order, status=order.status, note=note)
 
         return Response({"ok": True})
 
@@ -7,17 +7,16 @@ const API_BASE = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
 export default function CategoryDropdown() {
   const [open, setOpen] = useState(false);
   const [categories, setCategories] = useState([]);
-  const [subcategories, setSubcategories] = useState([]);
   const [activeCat, setActiveCat] = useState(null);
 
   const wrapRef = useRef(null);
 
-  // Load categories (public)
+  // Load the whole category tree (categories + nested subcategories) once
   useEffect(() => {
     axios
-      .get(`${API_BASE}/api/catalog/categories/`)
+      .get(`${API_BASE}/api/catalog/tree/`)
       .then((res) => {
-        const data = res.data?.results || res.data || [];
+        const data = res.data || [];
         setCategories(data);
         if (data.length > 0 && !activeCat) setActiveCat(data[0]); // nice default
       })
@@ -25,14 +24,6 @@ export default function CategoryDropdown() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
-  // Load ALL subcategories once
-  useEffect(() => {
-    axios
-      .get(`${API_BASE}/api/catalog/subcategories/`)
-      .then((res) => setSubcategories(res.data?.results || res.data || []))
-      .catch(() => setSubcategories([]));
-  }, []);
-
   // Close on outside click
   useEffect(() => {
     function onDocClick(e) {
@@ -44,12 +35,10 @@ export default function CategoryDropdown() {
     return () => document.removeEventListener("mousedown", onDocClick);
   }, []);
 
-  const filteredSubcategories = useMemo(() => {
-    if (!activeCat) return [];
-    return subcategories.filter(
-      (s) => Number(s.categoryId) === Number(activeCat.id)
-    );
-  }, [subcategories, activeCat]);
+  const filteredSubcategories = useMemo(
+    () => activeCat?.subcategories || [],
+    [activeCat]
+  );
 
   return (
     <div className="relative" ref={wrapRef}>
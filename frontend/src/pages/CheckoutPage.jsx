@@ -1,7 +1,8 @@
-import { useMemo, useState } from "react";
+import { useMemo, useRef, useState } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import { useCart } from "../hooks/useCart.js";
+import { newIdempotencyKey } from "../utils/idempotency.js";
 
 function getToken() {
   // try direct keys
@@ -59,8 +60,12 @@ export default function CheckoutPage() {
     payment_method: "cod", // "cod" | "sslcommerz"
   });
 
+  // ✅ Same key for retries of this submit -> backend never creates a 2nd order
+  const idempotencyKey = useRef(null);
+
   function handleChange(e) {
     setForm({ ...form, [e.target.name]: e.target.value });
+    idempotencyKey.current = null;
   }
 
   async function handleSubmit(e) {
@@ -76,11 +81,18 @@ export default function CheckoutPage() {
     try {
       setLoading(true);
 
+      if (!idempotencyKey.current) idempotencyKey.current = newIdempotencyKey();
+
       // 1) Create order (same as your architecture)
       const res = await axios.post(
         "http://127.0.0.1:8000/api/orders/checkout/",
         form,
-        { headers: { Authorization: `Bearer ${token}` } }
+        {
+          headers: {
+            Authorization: `Bearer ${token}`,
+            "Idempotency-Key": idempotencyKey.current,
+          },
+        }
       );
 
       // ✅ support different backend response keys
@@ -106,6 +118,8 @@ export default function CheckoutPage() {
       // ✅ Redirect to success page
       navigate(`/order-success/${orderId}`, { replace: true });
     } catch (err) {
+      // Server answered (not a timeout): the next submit is a new request
+      if (err?.response && err.response.status !== 409) idempotencyKey.current = null;
       const apiMsg =
         err?.response?.data?.detail ||
         err?.response?.data?.error ||
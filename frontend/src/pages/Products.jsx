@@ -74,9 +74,9 @@ export default function Products() {
         // Backend supports category slug filter: ?category=<slug> :contentReference[oaicite:5]{index=5}
         if (categoryFilter !== "all") params.category = categoryFilter;
 
-        // Backend supports ordering=price or -price (OrderingFilter) :contentReference[oaicite:6]{index=6}
-        if (sort === "price-asc") params.ordering = "price";
-        if (sort === "price-desc") params.ordering = "-price";
+        // Backend supports ordering=effective_price (price after active discount)
+        if (sort === "price-asc") params.ordering = "effective_price";
+        if (sort === "price-desc") params.ordering = "-effective_price";
 
         const res = await api.get("/catalog/products/", { params });
         const data = Array.isArray(res.data) ? res.data : res.data?.results || [];
@@ -1,6 +1,7 @@
-import { useState } from "react";
+import { useRef, useState } from "react";
 import { useNavigate, useSearchParams } from "react-router-dom";
 import api from "../../api/client";
+import { newIdempotencyKey } from "../../utils/idempotency.js";
 
 export default function BkashDemo() {
   const nav = useNavigate();
@@ -13,6 +14,7 @@ export default function BkashDemo() {
   const [loading, setLoading] = useState(false);
   const [msg, setMsg] = useState("");
   const [err, setErr] = useState("");
+  const verifyKey = useRef(null); // reused when retrying the same OTP submit
 
   async function sendOtp() {
     setErr("");
@@ -46,14 +48,17 @@ export default function BkashDemo() {
 
     try {
       setLoading(true);
-      const res = await api.post("/orders/demo/verify-otp/", {
-        order_id: Number(orderId),
-        otp,
-      });
+      if (!verifyKey.current) verifyKey.current = newIdempotencyKey();
+      const res = await api.post(
+        "/orders/demo/verify-otp/",
+        { order_id: Number(orderId), otp },
+        { headers: { "Idempotency-Key": verifyKey.current } }
+      );
 
       const paidOrderId = res?.data?.id || orderId;
       nav(`/order-success/${paidOrderId}`, { replace: true });
     } catch (e) {
+      if (e?.response && e.response.status !== 409) verifyKey.current = null;
       setErr(e?.response?.data?.detail || "OTP verification failed.");
     } finally {
       setLoading(false);
@@ -116,7 +121,10 @@ export default function BkashDemo() {
             <label className="block text-sm mb-1">Enter OTP *</label>
             <input
               value={otp}
-              onChange={(e) => setOtp(e.target.value)}
+              onChange={(e) => {
+                setOtp(e.target.value);
+                verifyKey.current = null;
+              }}
               className="w-full border rounded-lg px-3 py-2"
               placeholder="6-digit OTP"
               inputMode="numeric"
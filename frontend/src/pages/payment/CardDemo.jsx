@@ -1,6 +1,7 @@
-import { useState } from "react";
+import { useRef, useState } from "react";
 import { useNavigate, useSearchParams } from "react-router-dom";
 import api from "../../api/client";
+import { newIdempotencyKey } from "../../utils/idempotency.js";
 
 export default function CardDemo() {
   const nav = useNavigate();
@@ -17,6 +18,7 @@ export default function CardDemo() {
   const [loading, setLoading] = useState(false);
   const [msg, setMsg] = useState("");
   const [err, setErr] = useState("");
+  const verifyKey = useRef(null); // reused when retrying the same OTP submit
 
   async function sendOtp() {
     setErr("");
@@ -49,14 +51,17 @@ export default function CardDemo() {
 
     try {
       setLoading(true);
-      const res = await api.post("/orders/demo/verify-otp/", {
-        order_id: Number(orderId),
-        otp,
-      });
+      if (!verifyKey.current) verifyKey.current = newIdempotencyKey();
+      const res = await api.post(
+        "/orders/demo/verify-otp/",
+        { order_id: Number(orderId), otp },
+        { headers: { "Idempotency-Key": verifyKey.current } }
+      );
 
       const paidOrderId = res?.data?.id || orderId;
       nav(`/order-success/${paidOrderId}`, { replace: true });
     } catch (e) {
+      if (e?.response && e.response.status !== 409) verifyKey.current = null;
       setErr(e?.response?.data?.detail || "OTP verification failed.");
     } finally {
       setLoading(false);
@@ -154,7 +159,10 @@ export default function CardDemo() {
             <label className="block text-sm mb-1">Enter OTP *</label>
             <input
               value={otp}
-              onChange={(e) => setOtp(e.target.value)}
+              onChange={(e) => {
+                setOtp(e.target.value);
+                verifyKey.current = null;
+              }}
               className="w-full border rounded-lg px-3 py-2"
               placeholder="6-digit OTP"
               inputMode="numeric"
@@ -0,0 +1,6 @@
+// One key per logical submit: reuse it when retrying the same request
+// (double-click, timeout) so the backend replays instead of redoing it.
+export function newIdempotencyKey() {
+  if (typeof crypto !== "undefined" && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}